@@ -1,16 +1,53 @@
+from typing import Callable, Dict, List, Optional
+
 from animals.other_animals import Lion, Shark
 from animals.simple_animal import Animal
 from pets.pets import Bird, Cat, Dog
 from utils.constants import Constants
 
+AnimalConstructor = Callable[[str, int], Animal]
+
 
 class AnimalFactory:
     """
     Factory to create an animal based on the type.
+
+    Species are looked up in a registry, so creating an animal is one
+    dictionary lookup. New species can be added with
+    AnimalFactory.register without changing this class.
     """
+    _registry: Dict[str, AnimalConstructor] = {}
+
     def __init__(self) -> None:
         pass
 
+    @classmethod
+    def register(cls, species: str, constructor: AnimalConstructor) -> None:
+        """
+        Register a constructor for a species. Species are case-insensitive,
+        and registering a species again replaces its constructor.
+
+        @param species - str: The species name, i.e. "DOG".
+        @param constructor - AnimalConstructor: Called with (name, age) to create the animal.
+        """
+        cls._registry[species.upper()] = constructor
+
+    @classmethod
+    def unregister(cls, species: str) -> None:
+        """
+        Remove a species from the registry, if it is registered.
+
+        @param species - str: The species name.
+        """
+        cls._registry.pop(species.upper(), None)
+
+    @classmethod
+    def registered_species(cls) -> List[str]:
+        """
+        Get the names of every registered species.
+        """
+        return list(cls._registry)
+
     def create_animal(
             self,
             name: str,
@@ -26,16 +63,15 @@ class AnimalFactory:
 
         @return Animal: The animal object.
         """
-        match species.upper():
-            case Constants.DOG:
-                return Dog(name, age)
-            case Constants.CAT:
-                return Cat(name, age)
-            case Constants.BIRD:
-                return Bird(name, age)
-            case Constants.SHARK:
-                return Shark(name, age)
-            case Constants.LION:
-                return Lion(name, age)
-            case _:
-                raise ValueError(f"Unknown animal type: {species.name}")
+        constructor: Optional[AnimalConstructor] = self._registry.get(species.upper())
+        if constructor is None:
+            raise ValueError(f"Unknown animal type: {species}")
+
+        return constructor(name, age)
+
+
+AnimalFactory.register(Constants.DOG, Dog)
+AnimalFactory.register(Constants.CAT, Cat)
+AnimalFactory.register(Constants.BIRD, Bird)
+AnimalFactory.register(Constants.SHARK, Shark)
+AnimalFactory.register(Constants.LION, Lion)
@@ -6,6 +6,8 @@ class Shark(Animal):
     """
     Class to create a shark object.
     """
+    __slots__ = ()
+
     def __init__(self, name: str, age: int):
         super().__init__(name, age, AnimalType.SHARK)
 
@@ -23,6 +25,8 @@ class Lion(Animal):
     """
     Class to create a lion object.
     """
+    __slots__ = ()
+
     def __init__(self, name: str, age: int):
         super().__init__(name, age, AnimalType.LION)
 
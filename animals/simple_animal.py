@@ -9,7 +9,13 @@ class Animal(ABC):
 
     NOTE: Anything with @abstractmethod needs to be implemented
     in the child class, otherwise an error will be thrown.
+
+    NOTE: Animals use __slots__ instead of a per-instance __dict__, which makes
+    them smaller and faster to create. Child classes must set __slots__ too
+    (to () if they add no attributes), or they get a __dict__ back.
     """
+    __slots__ = ("name", "age", "species")
+
     def __init__(self, name: str, age: int, species: AnimalType):
         self.name: str = name
         self.age: int = age
@@ -1,83 +1,396 @@
 import logging
-import sys
 
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 from http import HTTPStatus
 from logging import Logger
-from typing import Dict, List, Union
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+import click
 
 from dotenv import load_dotenv
-from flask import Flask, jsonify, request
+from flask import Blueprint, Flask, Response, current_app, jsonify, request, stream_with_context
+from flask.cli import with_appcontext
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 from animals.animal_factory import AnimalFactory
 from animals.simple_animal import Animal
-from pets.models import Pet, connect_db
-from utils.helpers import configure_app, validate_json
-
-
-logging.basicConfig(
-   format='%(levelname)s - %(asctime)s: %(message)s ',
-   level=logging.INFO,
-   stream=sys.stdout
+from pets.idempotency import IDEMPOTENCY_KEY_HEADER, complete_later, idempotent, init_idempotency
+from pets.models import Pet, connect_db, db, get_pet_cache, init_warmup
+from pets.writer import GroupCommitWriter, init_group_commit
+from utils.admission import AdmissionController, init_admission
+from utils.cache import LRUCache
+from utils.compression import init_compression
+from utils.constants import Constants
+from utils.errors import InvalidQueryParameterError
+from utils.json_provider import init_json_provider
+from utils.loadtest import loadtest
+from utils.logging_config import configure_logging, init_request_ids
+from utils.metrics import MetricsRegistry, gauges, init_metrics
+from utils.pool import pool_metrics
+from utils.query_stats import QueryStats, init_query_headers
+from utils.helpers import (
+    PET_SCHEMA,
+    configure_app,
+    encode_cursor,
+    make_etag,
+    parse_fields,
+    parse_filters,
+    parse_page_args,
+    parse_positive_int,
+    validate_json
 )
 
+
 logger: Logger = logging.getLogger(__name__)
 
-app: Flask = Flask(__name__)
-load_dotenv()
-configure_app(app)
-connect_db(app)
+pets_api: Blueprint = Blueprint('pets', __name__)
 
 factory: AnimalFactory = AnimalFactory()
 
-@app.route('/pets/<int:id>', methods=['GET'])
+def conditional_response(etag: str, build: Callable[[], Response]) -> Response:
+    """
+    Answer with 304 Not Modified when the client's If-None-Match
+    already has the given ETag. Otherwise call build() to make the
+    response and tag it, so unchanged data is never serialized.
+
+    @param etag - str: The ETag of the current representation.
+    @param build - Callable[[], Response]: Makes the full response.
+
+    @return Response: The 304 or the full response, with the ETag set.
+    """
+    if request.if_none_match.contains_weak(etag):
+        response: Response = Response(status=HTTPStatus.NOT_MODIFIED)
+    else:
+        response = build()
+
+    response.set_etag(etag)
+    return response
+
+def wants_ndjson() -> bool:
+    """
+    Check whether the client prefers application/x-ndjson over application/json.
+    """
+    best_match: Optional[str] = request.accept_mimetypes.best_match(
+        [Constants.JSON_MIMETYPE, Constants.NDJSON_MIMETYPE]
+    )
+    return best_match == Constants.NDJSON_MIMETYPE
+
+def generate_pets_stream(
+        ndjson: bool,
+        fields: Tuple[str, ...],
+        filters: Dict[str, int]
+) -> Iterator[str]:
+    """
+    Yield every pet in the database that matches the filters as it
+    is read, one chunk per batch, with only the given fields.
+
+    With ndjson=True each pet is its own line of JSON. Otherwise the
+    chunks add up to the same {"pets": [...]} document as a normal
+    response, just without building it in memory first.
+    """
+    dumps = current_app.json.dumps
+    separator: str = ""
+
+    if not ndjson:
+        yield '{"pets": ['
+
+    try:
+        for batch in Pet.iter_pet_batches(fields=fields, **filters):
+            if ndjson:
+                yield "".join(f"{dumps(pet)}\n" for pet in batch)
+            else:
+                yield separator + ",".join(dumps(pet) for pet in batch)
+                separator = ","
+    except Exception as e:
+        # The status line is already sent, so all we can do is log and cut the stream short.
+        logger.error("app.py::generate_pets_stream: Error while streaming pets: %s", e, exc_info=True)
+        raise
+
+    if not ndjson:
+        yield ']}'
+
+@pets_api.route('/pets/<int:id>', methods=['GET'])
 def get_pet(id: int):
     """
     Get a pet from the database
     with the given id as a key.
     """
     try:
-        pet: Pet = Pet.get_one_pet(id)
-        return jsonify(pet=pet.to_dict()), HTTPStatus.OK
+        pet: Optional[Dict[str, Union[int, str]]] = Pet.get_one_pet_dict(id)
+        if pet is None:
+            return jsonify(error="Pet not found"), HTTPStatus.NOT_FOUND
+
+        etag: str = make_etag("pet", *pet.items())
+        return conditional_response(etag, lambda: jsonify(pet=pet))
     except Exception as e:
-        logger.error(f"app.py::get_pet: Error trying to get one pet: {e}", exc_info=True)
+        logger.error("app.py::get_pet: Error trying to get one pet: %s", e, exc_info=True)
         return jsonify(error="An error occurred when getting your pet"), HTTPStatus.INTERNAL_SERVER_ERROR
 
-@app.route('/pets', methods=['GET'])
+@pets_api.route('/pets', methods=['GET'])
 def get_pets():
     """
-    Get a list of pet objects from the database.
+    Get a page of pet objects from the database.
+
+    Accepts ?limit= for the page size and ?after= with the "next"
+    cursor from the previous page. "next" is null on the last page.
+
+    With ?stream=1 or "Accept: application/x-ndjson", the whole table
+    is streamed instead of a single page.
+
+    With ?fields=name,age only those fields are read and returned.
+
+    ?species=dog, ?min_age= and ?max_age= (inclusive) filter the pets
+    in the database, for pages and streams alike.
     """
     try:
-        pets: List[Animal] = Pet.get_all_pets()
-        return jsonify(pets=[p.to_dict() for p in pets]), HTTPStatus.OK
+        limit, after = parse_page_args(request.args)
+        fields: Tuple[str, ...] = parse_fields(request.args)
+        filters: Dict[str, int] = parse_filters(request.args)
+    except InvalidQueryParameterError as e:
+        return jsonify(error=str(e)), HTTPStatus.BAD_REQUEST
+
+    try:
+        ndjson: bool = wants_ndjson()
+        etag: str = make_etag("pets", request.query_string, ndjson, *Pet.get_table_version())
+
+        if ndjson or request.args.get('stream') == '1':
+            mimetype: str = Constants.NDJSON_MIMETYPE if ndjson else Constants.JSON_MIMETYPE
+            response: Response = conditional_response(
+                etag,
+                lambda: Response(stream_with_context(generate_pets_stream(ndjson, fields, filters)), mimetype=mimetype)
+            )
+        else:
+            def build_page() -> Response:
+                pets, last_id = Pet.get_pet_rows_page(limit, after, fields, **filters)
+                next_cursor: Optional[str] = encode_cursor(last_id) if last_id is not None else None
+                return jsonify(pets=pets, next=next_cursor)
+
+            response = conditional_response(etag, build_page)
+
+        response.vary.add("Accept")
+        return response
     except Exception as e:
-        logger.error(f"app.py::get_pets: Error trying to get all pets: {e}", exc_info=True)
+        logger.error("app.py::get_pets: Error trying to get all pets: %s", e, exc_info=True)
         return jsonify(error="An error occurred when getting all pets"), HTTPStatus.INTERNAL_SERVER_ERROR
 
-@app.route('/pets', methods=['POST'])
+def created_pet_response(animal: Animal, id: int) -> Tuple[Response, HTTPStatus]:
+    """
+    Make the 201 for a pet written by group commit.
+    """
+    pet: Pet = Pet(id=id, name=animal.name, age=animal.age, species=animal.species.value)
+    return jsonify(pet=pet.to_dict()), HTTPStatus.CREATED
+
+@pets_api.route('/pets', methods=['POST'])
+@idempotent
 def create_pet():
     """
     Create a pet and write it to the database.
+    With group commit on, the pet is written in a batch with
+    other requests' pets, and this waits for that commit.
+    A retry with the same Idempotency-Key gets the first response back.
     """
     try:
         data: Dict[str, Union[int, str]] = request.json
         validate_json(data, logger)
 
         animal: Animal = factory.create_animal(**data)
-        pet: Animal = Pet.create_pet(animal)  # stores in db and returns pet object
+        writer: Optional[GroupCommitWriter] = current_app.extensions.get('group_commit')
+        if writer is not None:
+            future: Future = writer.submit(animal)
+            try:
+                id: int = future.result(current_app.config['GROUP_COMMIT_TIMEOUT_SECONDS'])
+            except FutureTimeoutError:
+                # Keep the Idempotency-Key claimed until the pet is written, so a retry
+                # gets this pet instead of queueing a second one.
+                complete_later(future, lambda id: created_pet_response(animal, id))
+                raise
+            return created_pet_response(animal, id)
+
+        pet: Pet = Pet.create_pet(animal)  # stores in db and returns pet object
         return jsonify(pet=pet.to_dict()), HTTPStatus.CREATED
+    except FutureTimeoutError:
+        logger.error("app.py::create_pet: Timed out waiting for the pet to be committed")
+        return jsonify(
+            error="Timed out waiting for your pet to be saved. It may still be saved, so retry "
+                  f"with the same {IDEMPOTENCY_KEY_HEADER} header to avoid creating it twice."
+        ), HTTPStatus.SERVICE_UNAVAILABLE
     except Exception as e:
-        logger.error(f"app.py::create_pet: Error trying to create a pet: {e}", exc_info=True)
+        logger.error("app.py::create_pet: Error trying to create a pet: %s", e, exc_info=True)
         return jsonify(error="An error occurred when creating your pet"), HTTPStatus.BAD_REQUEST
     
-@app.route('/pets/oldest', methods=['GET'])
+@pets_api.route('/pets/stats', methods=['GET'])
+def get_pet_stats():
+    """
+    Get pet counts and age statistics, overall and per species,
+    plus an age histogram. ?bucket_width= sets how many years each
+    histogram bucket covers (5 by default).
+    """
+    try:
+        bucket_width: int = parse_positive_int(
+            request.args, 'bucket_width', Constants.DEFAULT_AGE_BUCKET_WIDTH, Constants.MAX_AGE_BUCKET_WIDTH
+        )
+    except InvalidQueryParameterError as e:
+        return jsonify(error=str(e)), HTTPStatus.BAD_REQUEST
+
+    try:
+        return jsonify(stats=Pet.get_stats(bucket_width)), HTTPStatus.OK
+    except Exception as e:
+        logger.error("app.py::get_pet_stats: Error trying to get pet stats: %s", e, exc_info=True)
+        return jsonify(error="An error occurred when getting pet stats"), HTTPStatus.INTERNAL_SERVER_ERROR
+
+@pets_api.route('/pets/bulk', methods=['POST'])
+def create_pets():
+    """
+    Create many pets from a JSON array in one transaction.
+
+    Every item is validated first, in one pass. Invalid items are reported
+    in "errors" with their index and every problem found, and the valid
+    ones are written.
+    The ids of the created pets are returned in "ids".
+    """
+    data: Any = request.json
+    if not isinstance(data, list) or not 1 <= len(data) <= Constants.MAX_BULK_PETS:
+        return jsonify(
+            error=f"Expected a JSON array of 1 to {Constants.MAX_BULK_PETS} pets."
+        ), HTTPStatus.BAD_REQUEST
+
+    animals: List[Animal] = []
+    errors: List[Dict[str, Any]] = []
+
+    for index, (item, item_errors) in enumerate(zip(data, PET_SCHEMA.validate_many(data))):
+        if not item_errors:
+            try:
+                animal: Animal = factory.create_animal(**item)
+                Pet._validate(animal)
+                animals.append(animal)
+                continue
+            except Exception as e:
+                item_errors = [{"field": "species", "code": "invalid", "message": str(e)}]
+
+        errors.append({"index": index, "errors": item_errors})
+
+    if not animals:
+        return jsonify(ids=[], errors=errors), HTTPStatus.BAD_REQUEST
+
+    try:
+        ids: List[int] = Pet.create_pets(animals)
+        return jsonify(ids=ids, errors=errors), HTTPStatus.CREATED
+    except Exception as e:
+        logger.error("app.py::create_pets: Error trying to create pets: %s", e, exc_info=True)
+        return jsonify(error="An error occurred when creating your pets"), HTTPStatus.INTERNAL_SERVER_ERROR
+
+@pets_api.route('/pets/oldest', methods=['GET'])
 def get_oldest_pet():
     """
     Get the oldest pet from the database.
+
+    With ?k=N, get the N oldest pets instead, oldest first,
+    with pets of the same age ordered by id.
     """
+    k: Optional[int] = None
+    try:
+        if 'k' in request.args:
+            k = parse_positive_int(request.args, 'k', 1, Constants.MAX_PAGE_SIZE)
+    except InvalidQueryParameterError as e:
+        return jsonify(error=str(e)), HTTPStatus.BAD_REQUEST
+
     try:
-        pet: Animal = Pet.get_oldest_pet()
-        return jsonify(pet=pet.to_dict()), HTTPStatus.OK
+        etag: str = make_etag("oldest", k, *Pet.get_table_version())
+
+        if k is not None:
+            return conditional_response(
+                etag, lambda: jsonify(pets=[p.to_dict() for p in Pet.get_oldest_pets(k)])
+            )
+
+        return conditional_response(etag, lambda: jsonify(pet=Pet.get_oldest_pet().to_dict()))
     except Exception as e:
-        logger.error(f"app.py::get_oldest_pet: Error trying to get oldest pet: {e}", exc_info=True)
+        logger.error("app.py::get_oldest_pet: Error trying to get oldest pet: %s", e, exc_info=True)
         return jsonify(error="An error occurred when getting the oldest pet"), HTTPStatus.INTERNAL_SERVER_ERROR
+
+@pets_api.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """
+    Get the size and hit/miss/eviction counters of the pet cache.
+    """
+    return jsonify(pet_cache=get_pet_cache().stats()), HTTPStatus.OK
+
+@pets_api.route('/pool/stats', methods=['GET'])
+def get_pool_stats():
+    """
+    Get the database connection pool's live status and counters
+    for this worker: checked out connections, overflow and wait times.
+    """
+    return jsonify(pool=pool_metrics.snapshot(db.engine.pool)), HTTPStatus.OK
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command() -> None:
+    """
+    Create the database tables if they do not already exist.
+    """
+    db.create_all()
+    click.echo("The database tables are ready.")
+
+def create_app(config: Optional[Dict[str, Any]] = None) -> Flask:
+    """
+    Build the app from the environment (and .env).
+
+    Nothing here talks to the database: the first query opens the first
+    connection, `flask init-db` creates the tables, and DB_WARMUP_CONNECTIONS
+    pre-opens connections in each forked worker (see init_warmup). So
+    importing the app is cheap and does not fail while the database is down.
+
+    @param config - Optional[Dict[str, Any]]: Settings that override the environment's.
+
+    @return Flask: The app.
+    """
+    app: Flask = Flask(__name__)
+    load_dotenv()
+    configure_app(app)
+    app.config.update(config or {})
+
+    if app.config.get('TRUSTED_PROXIES', 0) > 0:
+        # Take the client's address from X-Forwarded-For, as set by this many proxies in
+        # front of the app, so request.remote_addr is not the same proxy for everyone.
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXIES'])
+
+    configure_logging(app.config)
+    init_request_ids(app)
+    init_json_provider(app)
+    metrics: MetricsRegistry = init_metrics(app)
+    # After init_metrics, so requests that are turned away are timed and counted too.
+    admission: Optional[AdmissionController] = init_admission(app)
+    init_query_headers(app)
+    init_compression(app)
+    connect_db(app)
+    init_warmup(app)
+    writer: Optional[GroupCommitWriter] = init_group_commit(app)
+    init_idempotency(app)
+
+    pet_cache: LRUCache = app.extensions['pet_cache']
+    query_stats: QueryStats = app.extensions['query_stats']
+    metrics.register_collector(lambda: gauges(
+        "pet_cache", pet_cache.stats(), ("hits", "misses", "evictions", "expirations")
+    ))
+    metrics.register_collector(lambda: gauges(
+        "db_pool", pool_metrics.snapshot(db.engine.pool),
+        ("checkouts", "checkins", "connects", "invalidations", "timeouts", "wait_seconds_total")
+    ))
+    metrics.register_collector(lambda: gauges("db", query_stats.snapshot(), ("queries", "slow_queries", "seconds_total")))
+    if writer is not None:
+        metrics.register_collector(lambda: gauges("group_commit", writer.stats(), ("batches", "pets")))
+    if admission is not None:
+        metrics.register_collector(lambda: gauges("admission", admission.stats(), (
+            "reads_admitted", "reads_rejected", "reads_timed_out",
+            "writes_admitted", "writes_rejected", "writes_timed_out", "rate_limited"
+        )))
+
+    app.register_blueprint(pets_api)
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(loadtest)
+
+    return app
+
+
+# For `flask --app app run`, WSGI servers (`app:app`) and the tests.
+app: Flask = create_app()
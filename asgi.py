@@ -0,0 +1,130 @@
+import logging
+
+from http import HTTPStatus
+from logging import Logger
+from typing import Dict, Optional, Union
+
+from dotenv import load_dotenv
+from quart import Quart, jsonify, request
+
+from animals.animal_factory import AnimalFactory
+from animals.simple_animal import Animal
+from pets.async_models import (
+    AsyncPet,
+    connect_async_db,
+    dispose_async_db
+)
+from pets.models import Pet, create_pet_cache
+from utils.constants import Constants
+from utils.errors import InvalidQueryParameterError
+from utils.logging_config import configure_logging
+from utils.helpers import (
+    configure_app,
+    encode_cursor,
+    get_async_database_uri,
+    parse_page_args,
+    parse_positive_int,
+    validate_json
+)
+
+
+logger: Logger = logging.getLogger(__name__)
+
+# The same pets API as app.py, served over ASGI, i.e. `hypercorn asgi:app`.
+# Requests await the database instead of holding a worker thread.
+app: Quart = Quart(__name__)
+load_dotenv()
+configure_app(app)
+configure_logging(app.config)
+app.config['SQLALCHEMY_ASYNC_DATABASE_URI']: str = get_async_database_uri(
+    app.config['SQLALCHEMY_DATABASE_URI']
+)
+connect_async_db(app.config)
+app.extensions['pet_cache'] = create_pet_cache(app.config)
+
+factory: AnimalFactory = AnimalFactory()
+
+@app.after_serving
+async def shutdown() -> None:
+    """
+    Close the pooled connections before the event loop stops.
+    """
+    await dispose_async_db()
+
+@app.route('/pets/<int:id>', methods=['GET'])
+async def get_pet(id: int):
+    """
+    Get a pet from the database
+    with the given id as a key.
+    """
+    try:
+        pet: Optional[Dict[str, Union[int, str]]] = await AsyncPet.get_one_pet_dict(id)
+        if pet is None:
+            return jsonify(error="Pet not found"), HTTPStatus.NOT_FOUND
+
+        return jsonify(pet=pet), HTTPStatus.OK
+    except Exception as e:
+        logger.error("asgi.py::get_pet: Error trying to get one pet: %s", e, exc_info=True)
+        return jsonify(error="An error occurred when getting your pet"), HTTPStatus.INTERNAL_SERVER_ERROR
+
+@app.route('/pets', methods=['GET'])
+async def get_pets():
+    """
+    Get a page of pet objects from the database.
+
+    Accepts ?limit= for the page size and ?after= with the "next"
+    cursor from the previous page. "next" is null on the last page.
+    """
+    try:
+        limit, after = parse_page_args(request.args)
+    except InvalidQueryParameterError as e:
+        return jsonify(error=str(e)), HTTPStatus.BAD_REQUEST
+
+    try:
+        pets, last_id = await AsyncPet.get_pets_page(limit, after)
+        next_cursor: Optional[str] = encode_cursor(last_id) if last_id is not None else None
+        return jsonify(pets=[p.to_dict() for p in pets], next=next_cursor), HTTPStatus.OK
+    except Exception as e:
+        logger.error("asgi.py::get_pets: Error trying to get all pets: %s", e, exc_info=True)
+        return jsonify(error="An error occurred when getting all pets"), HTTPStatus.INTERNAL_SERVER_ERROR
+
+@app.route('/pets', methods=['POST'])
+async def create_pet():
+    """
+    Create a pet and write it to the database.
+    """
+    try:
+        data: Dict[str, Union[int, str]] = await request.get_json()
+        validate_json(data, logger)
+
+        animal: Animal = factory.create_animal(**data)
+        pet: Pet = await AsyncPet.create_pet(animal)  # stores in db and returns pet object
+        return jsonify(pet=pet.to_dict()), HTTPStatus.CREATED
+    except Exception as e:
+        logger.error("asgi.py::create_pet: Error trying to create a pet: %s", e, exc_info=True)
+        return jsonify(error="An error occurred when creating your pet"), HTTPStatus.BAD_REQUEST
+
+@app.route('/pets/oldest', methods=['GET'])
+async def get_oldest_pet():
+    """
+    Get the oldest pet from the database.
+
+    With ?k=N, get the N oldest pets instead, oldest first,
+    with pets of the same age ordered by id.
+    """
+    k: Optional[int] = None
+    try:
+        if 'k' in request.args:
+            k = parse_positive_int(request.args, 'k', 1, Constants.MAX_PAGE_SIZE)
+    except InvalidQueryParameterError as e:
+        return jsonify(error=str(e)), HTTPStatus.BAD_REQUEST
+
+    try:
+        if k is not None:
+            return jsonify(pets=[p.to_dict() for p in await AsyncPet.get_oldest_pets(k)]), HTTPStatus.OK
+
+        pet: Pet = await AsyncPet.get_oldest_pet()
+        return jsonify(pet=pet.to_dict()), HTTPStatus.OK
+    except Exception as e:
+        logger.error("asgi.py::get_oldest_pet: Error trying to get oldest pet: %s", e, exc_info=True)
+        return jsonify(error="An error occurred when getting the oldest pet"), HTTPStatus.INTERNAL_SERVER_ERROR
@@ -0,0 +1,122 @@
+"""
+Micro-benchmark for AnimalFactory.create_animal and the size of Animal objects,
+over every species in upper, lower and capitalized case.
+
+Compares the registry-based factory and __slots__ animals with the previous
+design (a match statement over species names, animals with a __dict__),
+which is reproduced here as the Legacy* classes and legacy_create_animal.
+
+    python benchmarks/animal_factory.py --iterations 1000000
+"""
+import argparse
+import itertools
+import os
+import sys
+import timeit
+import tracemalloc
+
+from typing import Callable, Dict, Iterator, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from animals.animal_factory import AnimalFactory
+from animals.animal_types import AnimalType
+from animals.simple_animal import Animal
+from utils.constants import Constants
+
+
+class LegacyAnimal:
+    """The Animal base class as it was before __slots__."""
+    def __init__(self, name: str, age: int, species: AnimalType):
+        self.name: str = name
+        self.age: int = age
+        self.species: AnimalType = species
+
+
+class LegacyDog(LegacyAnimal):
+    def __init__(self, name: str, age: int):
+        super().__init__(name, age, AnimalType.DOG)
+
+
+class LegacyCat(LegacyAnimal):
+    def __init__(self, name: str, age: int):
+        super().__init__(name, age, AnimalType.CAT)
+
+
+class LegacyBird(LegacyAnimal):
+    def __init__(self, name: str, age: int):
+        super().__init__(name, age, AnimalType.BIRD)
+
+
+class LegacyShark(LegacyAnimal):
+    def __init__(self, name: str, age: int):
+        super().__init__(name, age, AnimalType.SHARK)
+
+
+class LegacyLion(LegacyAnimal):
+    def __init__(self, name: str, age: int):
+        super().__init__(name, age, AnimalType.LION)
+
+
+def legacy_create_animal(name: str, age: int, species: str) -> LegacyAnimal:
+    """The factory as it was before the registry."""
+    match species.upper():
+        case Constants.DOG:
+            return LegacyDog(name, age)
+        case Constants.CAT:
+            return LegacyCat(name, age)
+        case Constants.BIRD:
+            return LegacyBird(name, age)
+        case Constants.SHARK:
+            return LegacyShark(name, age)
+        case Constants.LION:
+            return LegacyLion(name, age)
+        case _:
+            raise ValueError(f"Unknown animal type: {species}")
+
+def bytes_per_object(create: Callable[[], object], count: int = 100_000) -> float:
+    """
+    Measure the average memory held by one object, using tracemalloc.
+    """
+    tracemalloc.start()
+    before: int = tracemalloc.get_traced_memory()[0]
+    objects: List[object] = [create() for _ in range(count)]
+    after: int = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    del objects
+    return (after - before) / count
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=500_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    factory: AnimalFactory = AnimalFactory()
+    # Clients send species in any case, so every species is tried in a few.
+    species: Iterator[str] = itertools.cycle([
+        variant
+        for name in (Constants.DOG, Constants.CAT, Constants.BIRD, Constants.SHARK, Constants.LION)
+        for variant in (name, name.lower(), name.capitalize())
+    ])
+
+    def legacy() -> LegacyAnimal:
+        return legacy_create_animal("Fido", 5, next(species))
+
+    def registry() -> Animal:
+        return factory.create_animal("Fido", 5, next(species))
+
+    # The two are timed in alternating rounds, so a noisy machine slows both alike.
+    creators = {"legacy": legacy, "registry": registry}
+    best: Dict[str, float] = {name: float("inf") for name in creators}
+    for _ in range(args.repeat):
+        for name, create in creators.items():
+            best[name] = min(best[name], timeit.timeit(create, number=args.iterations))
+
+    print(f"{'factory':<10}{'creates/s':>14}{'bytes/object':>15}")
+    for name, create in creators.items():
+        print(f"{name:<10}{args.iterations / best[name]:>14,.0f}{bytes_per_object(create):>15.1f}")
+
+if __name__ == "__main__":
+    main()
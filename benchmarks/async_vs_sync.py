@@ -0,0 +1,105 @@
+"""
+Compare the sync Flask app (app.py) with the async ASGI app (asgi.py)
+at high concurrency.
+
+Start both against the same database, for example:
+
+    flask --app app init-db
+    flask --app app run --port 5000
+    hypercorn --bind 127.0.0.1:8000 asgi:app
+
+then run:
+
+    python benchmarks/async_vs_sync.py --sync-url http://127.0.0.1:5000 \\
+        --async-url http://127.0.0.1:8000 --concurrency 200 --requests 5000
+
+Each app gets the same number of GET /pets/<id> requests from the
+same number of concurrent clients, and throughput and latency
+percentiles are printed side by side.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import urllib.request
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.helpers import percentile
+
+
+def seed(base_url: str, count: int) -> List[int]:
+    """
+    Create some pets through the API and return their ids.
+    """
+    ids: List[int] = []
+    for i in range(count):
+        body: bytes = json.dumps({"name": f"Bench{i}", "age": i % 20, "species": "dog"}).encode()
+        request = urllib.request.Request(
+            f"{base_url}/pets", data=body, headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(request) as response:
+            ids.append(json.load(response)["pet"]["id"])
+
+    return ids
+
+def fetch(url: str) -> Tuple[float, bool]:
+    """
+    GET a URL and return how long it took and whether it succeeded.
+    """
+    start: float = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=30) as response:
+            response.read()
+            ok: bool = response.status == 200
+    except Exception:
+        ok = False
+
+    return time.perf_counter() - start, ok
+
+def run(base_url: str, ids: List[int], requests: int, concurrency: int) -> Dict[str, float]:
+    """
+    Send `requests` GET /pets/<id> requests from `concurrency` threads.
+    """
+    urls: List[str] = [f"{base_url}/pets/{ids[i % len(ids)]}" for i in range(requests)]
+
+    start: float = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results: List[Tuple[float, bool]] = list(pool.map(fetch, urls))
+    elapsed: float = time.perf_counter() - start
+
+    latencies: List[float] = [latency for latency, _ in results]
+    return {
+        "rps": requests / elapsed,
+        "errors": sum(1 for _, ok in results if not ok),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sync-url", default="http://127.0.0.1:5000")
+    parser.add_argument("--async-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=100, help="Pets to create before the run.")
+    args = parser.parse_args()
+
+    ids: List[int] = seed(args.sync_url, args.seed)
+
+    print(f"{'app':<8}{'req/s':>10}{'errors':>8}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, url in (("sync", args.sync_url), ("async", args.async_url)):
+        run(url, ids, min(args.requests, 500), args.concurrency)  # warm up
+        result: Dict[str, float] = run(url, ids, args.requests, args.concurrency)
+        print(
+            f"{name:<8}{result['rps']:>10.1f}{result['errors']:>8}"
+            f"{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+Benchmark every pets route through the Flask test client against seeded
+datasets, and catch regressions by comparing with a saved baseline.
+
+The database is dropped and seeded with the same pets on every run:
+pet n always has the same name, age and species, so results are
+comparable between runs and machines. Sizes are seeded smallest first,
+topping up the table each time.
+
+    python benchmarks/endpoints.py --sizes 1000 100000 1000000 \\
+        --output benchmarks/results.json
+
+Save a baseline once, then compare later runs with it. The script exits
+with status 1 when a route's median latency is more than --threshold
+(a fraction, 0.2 = 20%) slower than the baseline:
+
+    python benchmarks/endpoints.py --save-baseline benchmarks/baseline.json
+    python benchmarks/endpoints.py --baseline benchmarks/baseline.json --threshold 0.2
+
+SQLite in a temporary directory is used by default. Set
+BENCHMARK_DATABASE_URI to run against Postgres instead. Its pets
+table is dropped, so point it at a throwaway database.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# app.py reads its settings when it is imported, so they are set first.
+# load_dotenv() does not override them, so a .env file cannot point the
+# benchmark at a real database.
+os.environ['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
+    'BENCHMARK_DATABASE_URI',
+    f"sqlite:///{os.path.join(tempfile.gettempdir(), 'pets_benchmark.db')}"
+)
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+import sqlalchemy
+
+from flask.testing import FlaskClient
+
+from app import app
+from pets.models import Pet, db
+from utils.helpers import percentile
+
+SEED_CHUNK_SIZE: int = 10000
+
+# Routes that read every pet are only run up to this many pets by default.
+FULL_SCAN_LIMIT: int = 100000
+
+
+@dataclass
+class Case:
+    """
+    One route to benchmark.
+
+    Attributes:
+        name - str: How the case is reported, i.e. "GET /pets/<id>".
+        request - Callable[[FlaskClient, random.Random, int], Any]: Sends one request,
+        given the client, a seeded random generator and the number of pets.
+        full_scan - bool: Whether the route reads every pet.
+        writes - bool: Whether the route adds pets, which are removed afterwards.
+    """
+    name: str
+    request: Callable[[FlaskClient, random.Random, int], Any]
+    full_scan: bool = False
+    writes: bool = False
+
+
+CASES: List[Case] = [
+    Case("GET /pets/<id>", lambda client, rng, size: client.get(f"/pets/{rng.randint(1, size)}")),
+    Case("GET /pets?limit=100", lambda client, rng, size: client.get("/pets?limit=100")),
+    Case("GET /pets?limit=1000", lambda client, rng, size: client.get("/pets?limit=1000")),
+    Case("GET /pets?species=dog&min_age=5&max_age=9",
+         lambda client, rng, size: client.get("/pets?species=dog&min_age=5&max_age=9")),
+    Case("GET /pets/oldest", lambda client, rng, size: client.get("/pets/oldest")),
+    Case("GET /pets/oldest?k=10", lambda client, rng, size: client.get("/pets/oldest?k=10")),
+    Case("GET /pets/stats", lambda client, rng, size: client.get("/pets/stats"), full_scan=True),
+    Case("GET /pets?stream=1", lambda client, rng, size: client.get("/pets?stream=1").get_data(),
+         full_scan=True),
+    Case("POST /pets", lambda client, rng, size: client.post(
+        "/pets", json={"name": f"Bench {rng.random()}", "age": rng.randint(0, 30), "species": "cat"}
+    ), writes=True),
+]
+
+
+def make_pet(n: int) -> Dict[str, Any]:
+    """
+    Build the n-th seeded pet. The same n always gives the same pet.
+    """
+    return {"id": n, "name": f"Pet number {n}", "age": (n * 7919) % 31, "species": n % 3 + 1}
+
+def seed(size: int) -> None:
+    """
+    Top the pets table up to `size` pets.
+    """
+    current: int = db.session.execute(db.select(db.func.count(Pet.id))).scalar_one()
+    for start in range(current + 1, size + 1, SEED_CHUNK_SIZE):
+        end: int = min(start + SEED_CHUNK_SIZE, size + 1)
+        db.session.execute(db.insert(Pet), [make_pet(n) for n in range(start, end)])
+        db.session.commit()
+
+def measure(client: FlaskClient, case: Case, size: int, iterations: int, warmup: int) -> Dict[str, float]:
+    """
+    Send one case's requests one after another and time each of them.
+
+    @return Dict[str, float]: Requests per second, errors and latency percentiles.
+    """
+    rng: random.Random = random.Random(size)
+    for _ in range(warmup):
+        case.request(client, rng, size)
+
+    latencies: List[float] = []
+    errors: int = 0
+    start: float = time.perf_counter()
+    for _ in range(iterations):
+        request_start: float = time.perf_counter()
+        response = case.request(client, rng, size)
+        latencies.append(time.perf_counter() - request_start)
+        if hasattr(response, "status_code") and response.status_code >= 400:
+            errors += 1
+    elapsed: float = time.perf_counter() - start
+
+    return {
+        "rps": iterations / elapsed,
+        "errors": errors,
+        "mean_ms": sum(latencies) / len(latencies) * 1000,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p90_ms": percentile(latencies, 90) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+def run(sizes: List[int], iterations: int, warmup: int, full_scan_limit: int) -> Dict[str, Any]:
+    """
+    Seed each size and measure every case against it.
+
+    @return Dict[str, Any]: The results by size and case, with details of the run.
+    """
+    results: Dict[str, Dict[str, Dict[str, float]]] = {}
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+        for size in sorted(sizes):
+            start: float = time.perf_counter()
+            seed(size)
+            print(f"seeded {size} pets in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+            results[str(size)] = {}
+            with app.test_client() as client:
+                for case in CASES:
+                    if case.full_scan and size > full_scan_limit:
+                        continue
+
+                    results[str(size)][case.name] = measure(client, case, size, iterations, warmup)
+
+                    if case.writes:
+                        db.session.execute(db.delete(Pet).where(Pet.id > size))
+                        db.session.commit()
+
+        dialect: str = db.engine.dialect.name
+
+    return {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "sqlalchemy": sqlalchemy.__version__,
+            "database": dialect,
+            "iterations": iterations,
+        },
+        "results": results,
+    }
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], metric: str, threshold: float) -> List[str]:
+    """
+    Find the cases whose metric got worse than the baseline by more than the threshold.
+    Cases missing from either side are skipped.
+
+    @param results - Dict[str, Any]: This run, as returned by run().
+    @param baseline - Dict[str, Any]: A saved run.
+    @param metric - str: A latency metric, i.e. "p50_ms". Higher is worse.
+    @param threshold - float: The allowed slowdown, as a fraction.
+
+    @return List[str]: One line per regression.
+    """
+    regressions: List[str] = []
+    for size, cases in results["results"].items():
+        for name, current in cases.items():
+            previous: Optional[Dict[str, float]] = baseline["results"].get(size, {}).get(name)
+            if previous is None or previous[metric] <= 0:
+                continue
+
+            change: float = current[metric] / previous[metric] - 1
+            if change > threshold:
+                regressions.append(
+                    f"{name} with {size} pets: {metric} {previous[metric]:.2f} -> "
+                    f"{current[metric]:.2f} ({change:+.0%})"
+                )
+
+    return regressions
+
+def print_results(results: Dict[str, Any]) -> None:
+    print(f"{'pets':>8}  {'case':<44}{'req/s':>10}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for size, cases in results["results"].items():
+        for name, result in cases.items():
+            print(
+                f"{size:>8}  {name:<44}{result['rps']:>10.1f}{result['p50_ms']:>10.2f}"
+                f"{result['p90_ms']:>10.2f}{result['p99_ms']:>10.2f}{result['errors']:>8}"
+            )
+
+def write_json(path: str, data: Dict[str, Any]) -> None:
+    with open(path, "w") as file:
+        json.dump(data, file, indent=2)
+        file.write("\n")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000, 1000000])
+    parser.add_argument("--iterations", type=int, default=200, help="Timed requests per case.")
+    parser.add_argument("--warmup", type=int, default=20, help="Untimed requests per case.")
+    parser.add_argument("--full-scan-limit", type=int, default=FULL_SCAN_LIMIT,
+                        help="Skip routes that read every pet above this many pets.")
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument("--save-baseline", help="Write the results to this JSON file as the new baseline.")
+    parser.add_argument("--baseline", help="Compare with this saved JSON file.")
+    parser.add_argument("--metric", default="p50_ms", choices=["mean_ms", "p50_ms", "p90_ms", "p99_ms"])
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown, 0.2 = 20%%.")
+    args = parser.parse_args()
+
+    results: Dict[str, Any] = run(args.sizes, args.iterations, args.warmup, args.full_scan_limit)
+    print_results(results)
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            write_json(path, results)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline: Dict[str, Any] = json.load(file)
+
+        regressions: List[str] = compare(results, baseline, args.metric, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION: {line}")
+        if regressions:
+            sys.exit(1)
+
+        print(f"No case is more than {args.threshold:.0%} slower than {args.baseline} ({args.metric}).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Benchmark the Flask JSON providers over large pet lists.
+
+Times app.json.response(pets=[...]), which is what jsonify does for
+GET /pets, and app.json.loads on the same document, for the stdlib
+provider and the orjson one.
+
+    python benchmarks/json_provider.py --pets 1000 10000 100000
+"""
+import argparse
+import os
+import sys
+import timeit
+
+from typing import Dict, List, Union
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from utils.json_provider import init_json_provider
+
+
+def make_pets(count: int) -> List[Dict[str, Union[int, str]]]:
+    """
+    Build pet dictionaries shaped like Pet.to_dict().
+    """
+    return [
+        {"id": i, "name": f"Pet number {i}", "age": i % 25, "species": i % 3 + 1}
+        for i in range(1, count + 1)
+    ]
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pets", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    apps: Dict[str, Flask] = {}
+    for choice in ("std", "orjson"):
+        app: Flask = Flask(__name__)
+        app.config['JSON_PROVIDER'] = choice
+        init_json_provider(app)
+        apps[choice] = app
+
+    print(f"{'pets':>8}{'provider':>10}{'encode ms':>12}{'decode ms':>12}")
+    for count in args.pets:
+        pets: List[Dict[str, Union[int, str]]] = make_pets(count)
+
+        for choice, app in apps.items():
+            with app.app_context():
+                body: bytes = app.json.response(pets=pets).get_data()
+                encode: float = min(timeit.repeat(lambda: app.json.response(pets=pets), number=1, repeat=args.repeat))
+                decode: float = min(timeit.repeat(lambda: app.json.loads(body), number=1, repeat=args.repeat))
+
+            print(f"{count:>8}{choice:>10}{encode * 1000:>12.2f}{decode * 1000:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,9 @@
-from functools import wraps
-from typing import Callable
-
 import pytest
 
 from animals.animal_types import AnimalType
 from animals.other_animals import Lion, Shark
 from animals.simple_animal import Animal
-from app import app
 from pets.pets import Bird, Cat, Dog
-from pets.models import Pet, db
-
-@pytest.fixture
-def use_database(func: Callable) -> Callable:
-    """Decorator that clears the database before each test."""
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        with app.app_context():
-            db.drop_all()
-            db.create_all()
-            func(*args, **kwargs)
-    return wrapper
 
 @pytest.fixture
 def valid_pets():
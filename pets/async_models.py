@@ -0,0 +1,200 @@
+import logging
+
+from logging import Logger
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Union
+
+from quart import current_app, has_app_context
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine
+)
+
+from animals.simple_animal import Animal
+from pets.models import Pet, db
+from utils.cache import LRUCache
+from utils.errors import DatabaseNotConnectedError
+
+
+logger: Logger = logging.getLogger(__name__)
+
+async_engine: Optional[AsyncEngine] = None
+async_session_factory: Optional[async_sessionmaker[AsyncSession]] = None
+
+# Stands in for the pet cache outside an app context. Stores nothing.
+_no_cache: LRUCache = LRUCache()
+
+def connect_async_db(config: Mapping[str, Any]) -> None:
+    """
+    Create the async engine and session factory from an app's
+    SQLALCHEMY_ASYNC_DATABASE_URI and SQLALCHEMY_ENGINE_OPTIONS.
+    No connection is opened until the first query.
+
+    @param config - Mapping[str, Any]: The app's config.
+    """
+    global async_engine, async_session_factory
+
+    # The sync pool class cannot be used by an async engine; SQLAlchemy
+    # picks its async-adapted pool when none is given.
+    options: Dict[str, Any] = {
+        key: value
+        for key, value in config.get('SQLALCHEMY_ENGINE_OPTIONS', {}).items()
+        if key != 'poolclass'
+    }
+
+    try:
+        async_engine = create_async_engine(config['SQLALCHEMY_ASYNC_DATABASE_URI'], **options)
+        async_session_factory = async_sessionmaker(async_engine, expire_on_commit=False)
+    except Exception as e:
+        message: str = (
+            "async_models.py::connect_async_db - Failed to set up the async database: "
+            f"{e}"
+        )
+        logger.error(message, exc_info=True)
+
+        raise DatabaseNotConnectedError(message)
+
+def get_pet_cache() -> LRUCache:
+    """
+    Get the current Quart app's pet cache, set up by asgi.py with
+    pets.models.create_pet_cache. Flask's has_app_context() is always
+    False inside a Quart app, so pets.models.get_pet_cache cannot find it.
+    """
+    return current_app.extensions.get('pet_cache', _no_cache) if has_app_context() else _no_cache
+
+async def create_async_tables() -> None:
+    """
+    Create the tables if they do not already exist.
+    """
+    async with get_async_engine().begin() as connection:
+        await connection.run_sync(db.metadata.create_all)
+
+async def dispose_async_db() -> None:
+    """
+    Close every pooled connection. Call this before the event loop shuts down.
+    """
+    if async_engine is not None:
+        await async_engine.dispose()
+
+def get_async_engine() -> AsyncEngine:
+    """
+    Get the async engine, or raise a DatabaseNotConnectedError
+    if connect_async_db has not been called.
+    """
+    if async_engine is None:
+        raise DatabaseNotConnectedError("connect_async_db has not been called.")
+
+    return async_engine
+
+def new_async_session() -> AsyncSession:
+    """
+    Get a new async session, or raise a DatabaseNotConnectedError
+    if connect_async_db has not been called.
+    """
+    if async_session_factory is None:
+        raise DatabaseNotConnectedError("connect_async_db has not been called.")
+
+    return async_session_factory()
+
+
+class AsyncPet:
+    """
+    Async versions of the Pet data-access methods, for the ASGI app in asgi.py.
+    They read and write the same pets table through the same Pet model, but
+    await the database instead of blocking a worker thread on it.
+    """
+
+    @staticmethod
+    async def create_pet(pet: Animal) -> Pet:
+        """
+        Create a pet in the database.
+
+        @param pet - Animal: The pet to create. Must be a DOG, CAT or BIRD.
+
+        @return - Pet: The pet object that was created and added to the database.
+        """
+        Pet._validate(pet)  # will log and throw if not valid
+
+        async with new_async_session() as session:
+            row: Pet = Pet(name=pet.name, age=pet.age, species=pet.species.value)
+            session.add(row)
+            await session.commit()
+
+        get_pet_cache().delete(row.id)  # drop a cached "not found" for the new id
+        return row
+
+    @staticmethod
+    async def get_pets_page(limit: int, after: Optional[int] = None) -> Tuple[List[Pet], Optional[int]]:
+        """
+        Get one page of pets, ordered by id. See Pet.get_pets_page.
+
+        @param limit - int: The maximum number of pets to return.
+        @param after - Optional[int]: Only return pets with an id greater than this.
+
+        @return - Tuple[List[Pet], Optional[int]]: The pets on the page, and the id
+        to continue after for the next page, or None if this is the last page.
+        """
+        statement = select(Pet).order_by(Pet.id).limit(limit + 1)
+        if after is not None:
+            statement = statement.where(Pet.id > after)
+
+        async with new_async_session() as session:
+            pets: List[Pet] = list(await session.scalars(statement))
+
+        if len(pets) > limit:
+            return pets[:limit], pets[limit - 1].id
+
+        return pets, None
+
+    @staticmethod
+    async def get_one_pet_dict(id: int) -> Optional[Dict[str, Union[int, str]]]:
+        """
+        Get a single pet as a dictionary, going through the pet cache
+        when it is enabled. See Pet.get_one_pet_dict.
+
+        @param id - int: The id of the pet to get.
+
+        @return - Dict[str, Union[int, str]]: The pet's to_dict() payload, or None
+        if there is no pet with that id.
+        """
+        cache: LRUCache = get_pet_cache()
+        found, payload = cache.get(id)
+        if found:
+            return payload
+
+        generation: int = cache.generation
+        async with new_async_session() as session:
+            pet: Optional[Pet] = await session.get(Pet, id)
+
+        payload = pet.to_dict() if pet is not None else None
+        cache.set(id, payload, generation)
+
+        return payload
+
+    @staticmethod
+    async def get_oldest_pets(k: int) -> List[Pet]:
+        """
+        Get the k oldest pets, oldest first, ties ordered by id.
+        See Pet.get_oldest_pets.
+
+        @param k - int: The number of pets to return.
+
+        @return - List[Pet]: Up to k pets, oldest first.
+        """
+        statement = select(Pet).order_by(Pet.age.desc(), Pet.id).limit(k)
+
+        async with new_async_session() as session:
+            return list(await session.scalars(statement))
+
+    @staticmethod
+    async def get_oldest_pet() -> Pet:
+        """
+        Get the oldest pet.
+        """
+        pets: List[Pet] = await AsyncPet.get_oldest_pets(1)
+        if not pets:
+            raise ValueError("No pets in the database.")
+
+        return pets[0]
@@ -0,0 +1,415 @@
+import hashlib
+import threading
+import time
+
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from functools import wraps
+from http import HTTPStatus
+from typing import Any, Callable, Optional, Tuple
+
+from flask import Flask, Response, current_app, g, jsonify, make_response, request
+from sqlalchemy.exc import IntegrityError
+
+from pets.models import db
+from utils.constants import Constants
+from utils.errors import InvalidConfigurationError
+
+IDEMPOTENCY_KEY_HEADER: str = 'Idempotency-Key'
+REPLAYED_HEADER: str = 'Idempotent-Replayed'
+
+# What begin() and wait() found for a key.
+OWNER: str = "owner"          # nobody has the key: the caller runs the request and must complete() or release() it
+REPLAY: str = "replay"        # the request already succeeded: send the stored response
+IN_FLIGHT: str = "in_flight"  # the same request is still running elsewhere
+MISMATCH: str = "mismatch"    # the key was used for a different request
+FULL: str = "full"            # the store is full of requests still running, so the key cannot be kept
+
+
+@dataclass
+class StoredResponse:
+    """
+    A response kept so that retries get exactly the same one.
+    """
+    status: int
+    body: bytes
+    content_type: str
+
+    def to_response(self) -> Response:
+        response: Response = Response(self.body, status=self.status, content_type=self.content_type)
+        response.headers[REPLAYED_HEADER] = 'true'
+        return response
+
+
+@dataclass
+class _Entry:
+    fingerprint: str
+    expires_at: float
+    response: Optional[StoredResponse] = None
+    done: threading.Event = field(default_factory=threading.Event)
+
+
+class MemoryIdempotencyStore:
+    """
+    A thread-safe, bounded, in-process store of idempotency keys.
+
+    Keys of requests that are still running are never evicted. Once the
+    store is full, the oldest finished key is dropped for each new one,
+    and if every key is still running, new keys are turned away (FULL)
+    rather than letting the store grow.
+    Requests that find their key in flight wait on an Event, so they
+    wake as soon as the first request finishes.
+
+    NOTE: Each worker process has its own store, so a retry that reaches a
+    different worker is not recognized. Use DatabaseIdempotencyStore then.
+    """
+    def __init__(
+            self,
+            max_entries: int = 10000,
+            ttl_seconds: float = 86400.0,
+            clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.max_entries: int = max_entries
+        self.ttl_seconds: float = ttl_seconds
+        self._clock: Callable[[], float] = clock
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+
+    def begin(self, key: str, fingerprint: str) -> Tuple[str, Optional[StoredResponse]]:
+        """
+        Look up a key, claiming it for the caller if nobody has it.
+
+        @param key - str: The idempotency key.
+        @param fingerprint - str: Identifies the request, so a reused key can be caught.
+
+        @return Tuple[str, Optional[StoredResponse]]: OWNER, REPLAY (with the
+        stored response), IN_FLIGHT, MISMATCH, or FULL when there is no room for a new key.
+        """
+        with self._lock:
+            now: float = self._clock()
+            entry: Optional[_Entry] = self._entries.get(key)
+            if entry is not None and entry.expires_at <= now and entry.done.is_set():
+                del self._entries[key]
+                entry = None
+
+            if entry is None:
+                if not self._make_room():
+                    return FULL, None
+                self._entries[key] = _Entry(fingerprint, now + self.ttl_seconds)
+                return OWNER, None
+
+            if entry.fingerprint != fingerprint:
+                return MISMATCH, None
+            if not entry.done.is_set():
+                return IN_FLIGHT, None
+            return REPLAY, entry.response
+
+    def wait(self, key: str, fingerprint: str, timeout: float) -> Tuple[str, Optional[StoredResponse]]:
+        """
+        Wait up to `timeout` seconds for an in-flight request with the
+        same key to finish, then look the key up again as begin() does.
+        """
+        with self._lock:
+            entry: Optional[_Entry] = self._entries.get(key)
+
+        if entry is not None:
+            entry.done.wait(timeout)
+
+        return self.begin(key, fingerprint)
+
+    def complete(self, key: str, response: StoredResponse) -> None:
+        """
+        Store the response of a request that succeeded and wake anyone waiting for it.
+        """
+        with self._lock:
+            entry: Optional[_Entry] = self._entries.get(key)
+            if entry is not None:
+                entry.response = response
+                entry.done.set()
+
+    def release(self, key: str) -> None:
+        """
+        Forget a request that failed, so a retry runs it again,
+        and wake anyone waiting for it.
+        """
+        with self._lock:
+            entry: Optional[_Entry] = self._entries.pop(key, None)
+
+        if entry is not None:
+            entry.done.set()
+
+    def _make_room(self) -> bool:
+        # Called with the lock held. Returns whether there is room for one more key.
+        while len(self._entries) >= self.max_entries:
+            oldest: Optional[str] = next(
+                (key for key, entry in self._entries.items() if entry.done.is_set()), None
+            )
+            if oldest is None:
+                return False
+            del self._entries[oldest]
+
+        return True
+
+
+class IdempotencyKey(db.Model):
+    """
+    An idempotency key and the response it was first answered with,
+    for DatabaseIdempotencyStore. A row with no status is still running.
+
+    Attributes:
+        key - str: The idempotency key, prefixed with the request's path.
+        fingerprint - str: Identifies the request the key was first used for.
+        status - Optional[int]: The stored response's status, or None while in flight.
+        body - Optional[bytes]: The stored response's body.
+        content_type - Optional[str]: The stored response's Content-Type.
+        created_at - float: When the key was claimed, in seconds since the epoch.
+    """
+
+    __tablename__ = "idempotency_keys"
+
+    key = db.Column(db.String(Constants.MAX_IDEMPOTENCY_KEY_LENGTH + 100), primary_key=True)
+    fingerprint = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.Integer, nullable=True)
+    body = db.Column(db.LargeBinary, nullable=True)
+    content_type = db.Column(db.String(100), nullable=True)
+    created_at = db.Column(db.Float, nullable=False, index=True)
+
+
+class DatabaseIdempotencyStore:
+    """
+    An idempotency store shared by every worker, in the idempotency_keys table.
+    A key is claimed by inserting its row, so only one request can win it.
+    Requests that find it in flight poll the row until it is finished.
+
+    A claim older than in_flight_seconds is treated as abandoned, i.e. by a
+    worker that died, and taken over by an UPDATE conditional on the old
+    claim's created_at, so only one request can take it over. Expired rows are deleted every
+    `prune_every` claims, which keeps the table bounded.
+    """
+    def __init__(
+            self,
+            ttl_seconds: float = 86400.0,
+            in_flight_seconds: float = 60.0,
+            poll_seconds: float = 0.05,
+            prune_every: int = 100,
+            clock: Callable[[], float] = time.time
+    ) -> None:
+        self.ttl_seconds: float = ttl_seconds
+        self.in_flight_seconds: float = in_flight_seconds
+        self.poll_seconds: float = poll_seconds
+        self.prune_every: int = prune_every
+        self._clock: Callable[[], float] = clock
+        self._claims: int = 0
+
+    def begin(self, key: str, fingerprint: str) -> Tuple[str, Optional[StoredResponse]]:
+        """
+        Look up a key, claiming it for the caller if nobody has it.
+        See MemoryIdempotencyStore.begin.
+        """
+        now: float = self._clock()
+        row: Optional[IdempotencyKey] = db.session.get(IdempotencyKey, key, populate_existing=True)
+
+        if row is not None:
+            expired: bool = row.created_at + self.ttl_seconds <= now
+            abandoned: bool = row.status is None and row.created_at + self.in_flight_seconds <= now
+            if not expired and not abandoned:
+                if row.fingerprint != fingerprint:
+                    return MISMATCH, None
+                if row.status is None:
+                    return IN_FLIGHT, None
+                return REPLAY, StoredResponse(row.status, row.body, row.content_type)
+
+            # Take the key over with a conditional UPDATE, so that when several
+            # requests find the same stale row, only the first one's matches.
+            old_created_at: float = row.created_at
+            db.session.rollback()
+            claimed = db.session.execute(
+                db.update(IdempotencyKey)
+                .where(IdempotencyKey.key == key, IdempotencyKey.created_at == old_created_at)
+                .values(fingerprint=fingerprint, status=None, body=None, content_type=None, created_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            if claimed.rowcount != 1:
+                return self.begin(key, fingerprint)
+            return self._claimed()
+
+        try:
+            db.session.add(IdempotencyKey(key=key, fingerprint=fingerprint, created_at=now))
+            db.session.commit()
+        except IntegrityError:
+            # Another request claimed it first.
+            db.session.rollback()
+            return self.begin(key, fingerprint)
+
+        return self._claimed()
+
+    def _claimed(self) -> Tuple[str, Optional[StoredResponse]]:
+        self._claims += 1
+        if self._claims % self.prune_every == 0:
+            self.prune()
+
+        return OWNER, None
+
+    def wait(self, key: str, fingerprint: str, timeout: float) -> Tuple[str, Optional[StoredResponse]]:
+        """
+        Poll for up to `timeout` seconds until an in-flight request with the
+        same key finishes. See MemoryIdempotencyStore.wait.
+        """
+        deadline: float = time.monotonic() + timeout
+        while True:
+            db.session.rollback()  # end the transaction, so the next read sees new commits
+            state, response = self.begin(key, fingerprint)
+            if state != IN_FLIGHT or time.monotonic() >= deadline:
+                return state, response
+            time.sleep(self.poll_seconds)
+
+    def complete(self, key: str, response: StoredResponse) -> None:
+        db.session.execute(
+            db.update(IdempotencyKey)
+            .where(IdempotencyKey.key == key)
+            .values(status=response.status, body=response.body, content_type=response.content_type)
+        )
+        db.session.commit()
+
+    def release(self, key: str) -> None:
+        db.session.rollback()  # the request may have left the session failed
+        db.session.execute(db.delete(IdempotencyKey).where(IdempotencyKey.key == key))
+        db.session.commit()
+
+    def prune(self) -> None:
+        """
+        Delete every expired key.
+        """
+        db.session.execute(
+            db.delete(IdempotencyKey).where(IdempotencyKey.created_at <= self._clock() - self.ttl_seconds)
+        )
+        db.session.commit()
+
+
+def fingerprint_request() -> str:
+    """
+    Identify the current request by its method, path and body.
+    """
+    digest = hashlib.sha256(f"{request.method} {request.path}\n".encode())
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+def complete_later(future: Future, build: Callable[[Any], Any]) -> None:
+    """
+    Called by an idempotent view that gives up waiting for work that goes
+    on without it, i.e. a pet queued for group commit, before it returns an
+    error. The key is then not forgotten with that error, but kept claimed
+    until `future` resolves: if it succeeds, build(result) becomes the
+    response retries get, and if it fails, the key is forgotten. So a retry
+    in the meantime waits for the work instead of doing it a second time.
+
+    @param future - Future: The work the view stopped waiting for.
+    @param build - Callable[[Any], Any]: Makes the view's response from the future's result.
+    """
+    g.idempotency_pending = (future, build)
+
+def _settle_when_done(app: Flask, store: Any, key: str, future: Future, build: Callable[[Any], Any]) -> None:
+    def settle(done: Future) -> None:
+        # Runs in whichever thread resolves the future, so it needs its own app context.
+        with app.app_context():
+            try:
+                response: Response = make_response(build(done.result()))
+            except BaseException:
+                store.release(key)
+                return
+
+            if 200 <= response.status_code < 300:
+                store.complete(key, StoredResponse(response.status_code, response.get_data(), response.content_type))
+            else:
+                store.release(key)
+
+    future.add_done_callback(settle)
+
+def idempotent(view: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Make a view honor the Idempotency-Key header, using the store in
+    app.extensions['idempotency'].
+
+    The first request with a key runs the view. If it succeeds (2xx), its
+    response is stored and every retry with the same key and body gets
+    that response back, with an Idempotent-Replayed header, without
+    running the view again. If it fails, the key is forgotten so a retry
+    runs the view again, unless the view handed its unfinished work to
+    complete_later().
+
+    A retry that arrives while the first request is still running waits up
+    to IDEMPOTENCY_WAIT_SECONDS for it, and gets 409 Conflict if it is still
+    running then. Reusing a key with a different body gets 422. If the
+    store has no room for the key, the request gets 503 without running.
+    """
+    @wraps(view)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        key: Optional[str] = request.headers.get(IDEMPOTENCY_KEY_HEADER)
+        store: Any = current_app.extensions.get('idempotency')
+        if key is None or store is None:
+            return view(*args, **kwargs)
+
+        if not 1 <= len(key) <= Constants.MAX_IDEMPOTENCY_KEY_LENGTH:
+            return jsonify(
+                error=f"{IDEMPOTENCY_KEY_HEADER} must be 1 to {Constants.MAX_IDEMPOTENCY_KEY_LENGTH} characters."
+            ), HTTPStatus.BAD_REQUEST
+
+        key = f"{request.path}:{key}"
+        fingerprint: str = fingerprint_request()
+
+        state, stored = store.begin(key, fingerprint)
+        if state == IN_FLIGHT:
+            state, stored = store.wait(key, fingerprint, current_app.config.get('IDEMPOTENCY_WAIT_SECONDS', 10.0))
+
+        if state == REPLAY:
+            return stored.to_response()
+        if state == MISMATCH:
+            return jsonify(
+                error=f"This {IDEMPOTENCY_KEY_HEADER} was already used for a different request."
+            ), HTTPStatus.UNPROCESSABLE_ENTITY
+        if state == IN_FLIGHT:
+            return jsonify(
+                error=f"A request with this {IDEMPOTENCY_KEY_HEADER} is still being processed."
+            ), HTTPStatus.CONFLICT
+        if state == FULL:
+            return jsonify(
+                error="Too many requests are being processed, try again shortly."
+            ), HTTPStatus.SERVICE_UNAVAILABLE, {"Retry-After": "1"}
+
+        try:
+            response: Response = make_response(view(*args, **kwargs))
+        except BaseException:
+            g.pop('idempotency_pending', None)
+            store.release(key)
+            raise
+
+        pending: Optional[Tuple[Future, Callable[[Any], Any]]] = g.pop('idempotency_pending', None)
+        if 200 <= response.status_code < 300:
+            store.complete(key, StoredResponse(response.status_code, response.get_data(), response.content_type))
+        elif pending is not None:
+            _settle_when_done(current_app._get_current_object(), store, key, *pending)
+        else:
+            store.release(key)
+
+        return response
+
+    return wrapper
+
+def init_idempotency(app: Flask) -> None:
+    """
+    Set up the store for Idempotency-Key headers from app.config['IDEMPOTENCY_STORE']:
+    "memory" (the default), "database", or "off".
+    """
+    choice: str = app.config.get('IDEMPOTENCY_STORE', 'memory')
+    ttl_seconds: float = app.config.get('IDEMPOTENCY_TTL_SECONDS', 86400.0)
+
+    if choice == 'memory':
+        app.extensions['idempotency'] = MemoryIdempotencyStore(
+            app.config.get('IDEMPOTENCY_MAX_ENTRIES', 10000), ttl_seconds
+        )
+    elif choice == 'database':
+        app.extensions['idempotency'] = DatabaseIdempotencyStore(ttl_seconds)
+    elif choice != 'off':
+        raise InvalidConfigurationError(f"IDEMPOTENCY_STORE must be memory, database or off, got {choice!r}.")
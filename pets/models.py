@@ -1,36 +1,73 @@
 import logging
-import sys
+import os
+import weakref
 
 from logging import Logger
-from typing import Dict, List, Optional, Self, Union
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Self, Tuple, Union
 
-from flask import Flask
+from flask import Flask, current_app, has_app_context
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import Connection, Row, Select
+from sqlalchemy.pool import QueuePool
 
 from animals.animal_types import ALL_PETS, AnimalType
 from animals.simple_animal import Animal
+from utils.cache import LRUCache
+from utils.constants import Constants
 from utils.errors import DatabaseNotConnectedError
-
-logging.basicConfig(
-   format='%(levelname)s - %(asctime)s: %(message)s ',
-   level=logging.INFO,
-   stream=sys.stdout
-)
+from utils.query_stats import QueryStats, instrument_engine
 
 logger: Logger = logging.getLogger(__name__)
 
 db: SQLAlchemy = SQLAlchemy()
 
+# Stands in for the caches when there is no app, or its caches were never set up. Stores nothing.
+_no_cache: LRUCache = LRUCache()
+
+# Apps whose pools are replaced in forked children, see init_warmup.
+_apps_to_warm_up: "weakref.WeakSet[Flask]" = weakref.WeakSet()
+
+def get_pet_cache() -> LRUCache:
+    """
+    Get the current app's read-through cache of Pet.to_dict() payloads by id,
+    used by Pet.get_one_pet_dict. connect_db sizes it from PET_CACHE_MAX_ENTRIES.
+    """
+    return current_app.extensions.get('pet_cache', _no_cache) if has_app_context() else _no_cache
+
+def get_stats_cache() -> LRUCache:
+    """
+    Get the current app's short-lived cache of Pet.get_stats() results by bucket
+    width, so dashboards that refresh every few seconds do not rerun the GROUP BY
+    queries each time. connect_db sets it up from STATS_CACHE_TTL_SECONDS.
+    """
+    return current_app.extensions.get('stats_cache', _no_cache) if has_app_context() else _no_cache
+
+def create_pet_cache(config: Mapping[str, Any]) -> LRUCache:
+    """
+    Make a pet cache sized by an app's PET_CACHE_MAX_ENTRIES, PET_CACHE_TTL_SECONDS
+    and, for missing pets, PET_CACHE_NEGATIVE_TTL_SECONDS.
+    """
+    return LRUCache(
+        config.get('PET_CACHE_MAX_ENTRIES', 0),
+        config.get('PET_CACHE_TTL_SECONDS', 30.0),
+        negative_ttl_seconds=config.get('PET_CACHE_NEGATIVE_TTL_SECONDS', 1.0)
+    )
+
 def connect_db(app: Flask) -> None:
     """
-    Connect to database and create tables
-    if they do not already exist.
+    Set up the database for the app without connecting to it:
+    the first query opens the first connection. The tables are
+    created by `flask init-db`, not here.
+
+    The app's caches and SQL statement counters are kept in
+    app.extensions, so apps in the same process do not share them.
     """
+    stats: QueryStats = QueryStats(app.config.get('SLOW_QUERY_THRESHOLD_MS', 500.0) / 1000)
+
     try:
         with app.app_context():
-            db.app = app
             db.init_app(app)
-            db.create_all()
+            instrument_engine(db.engine, stats)
     except Exception as e:
         message: str = (
             "models.py::connect_db - Failed to connect to database: "
@@ -40,6 +77,66 @@ def connect_db(app: Flask) -> None:
 
         raise DatabaseNotConnectedError(message)
 
+    app.extensions['query_stats'] = stats
+    app.extensions['pet_cache'] = create_pet_cache(app.config)
+
+    stats_ttl_seconds: float = app.config.get('STATS_CACHE_TTL_SECONDS', 0.0)
+    app.extensions['stats_cache'] = LRUCache(
+        Constants.STATS_CACHE_MAX_ENTRIES if stats_ttl_seconds > 0 else 0,
+        stats_ttl_seconds
+    )
+
+def warm_up_pool(app: Flask, connections: int) -> int:
+    """
+    Open up to `connections` pool connections now, so the first requests
+    do not wait for them. No more than the pool keeps open are opened.
+    If the database cannot be reached, log a warning and carry on; the
+    connections are then opened on first use as usual.
+
+    @param app - Flask: The app whose engine to warm up.
+    @param connections - int: How many connections to open.
+
+    @return int: How many were opened.
+    """
+    opened: List[Connection] = []
+
+    with app.app_context():
+        if isinstance(db.engine.pool, QueuePool):
+            connections = min(connections, db.engine.pool.size())
+
+        try:
+            # Held at the same time, so each checkout opens a new connection.
+            for _ in range(connections):
+                opened.append(db.engine.connect())
+        except Exception as e:
+            logger.warning(
+                "models.py::warm_up_pool - Opened %s of %s connections: %s", len(opened), connections, e
+            )
+        finally:
+            for connection in opened:
+                connection.close()
+
+    return len(opened)
+
+def init_warmup(app: Flask) -> None:
+    """
+    In every process forked from this one, i.e. pre-forked server workers,
+    drop the app's pool connections copied from the parent, which must not
+    be shared, and open DB_WARMUP_CONNECTIONS new ones so the worker's first
+    requests do not pay for connecting.
+    """
+    _apps_to_warm_up.add(app)
+
+def _after_fork() -> None:
+    # One hook for every app, since hooks cannot be unregistered. Apps that
+    # were garbage collected have already left the WeakSet.
+    for app in list(_apps_to_warm_up):
+        with app.app_context():
+            db.engine.dispose(close=False)
+        warm_up_pool(app, app.config.get('DB_WARMUP_CONNECTIONS', 0))
+
+os.register_at_fork(after_in_child=_after_fork)
+
 
 class Pet(db.Model):
     """
@@ -57,7 +154,7 @@ class Pet(db.Model):
     __tablename__ = "pets"
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    name = db.Column(db.String(50), nullable=False)
+    name = db.Column(db.String(Constants.MAX_NAME_LENGTH), nullable=False)
     age = db.Column(db.Integer, nullable=False)
     species = db.Column(db.Integer, nullable=False)
 
@@ -102,10 +199,57 @@ class Pet(db.Model):
             pet = Pet(name=pet.name, age=pet.age, species=pet.species.value)
             db.session.add(pet)
             db.session.commit()
+            get_pet_cache().delete(pet.id)  # drop a cached "not found" for the new id
             return pet
         except Exception as e:
-            logger.error(f"Pet::create_pet - Failed to create pet: {e}", exc_info=True)
+            logger.error("Pet::create_pet - Failed to create pet: %s", e, exc_info=True)
     
+    @staticmethod
+    def create_pets(
+            pets: List[Animal],
+            chunk_size: int = Constants.BULK_INSERT_CHUNK_SIZE
+    ) -> List[int]:
+        """
+        Create many pets in the database in a single transaction.
+
+        Each chunk of pets is written with one multi-row INSERT ... RETURNING,
+        so thousands of pets cost a handful of round trips and one commit.
+        If any chunk fails, nothing is written.
+
+        @param pets - List[Animal]: The pets to create. Each must be a DOG, CAT or BIRD.
+        @param chunk_size - int: The number of rows to insert per statement.
+
+        @return - List[int]: The ids of the created pets, in the same order as the input.
+        """
+        for pet in pets:
+            Pet._validate(pet)  # will log and throw if not valid
+
+        rows: List[Dict[str, Union[int, str]]] = [
+            {"name": pet.name, "age": pet.age, "species": pet.species.value}
+            for pet in pets
+        ]
+        statement = db.insert(Pet).returning(Pet.id)
+        ids: List[int] = []
+
+        try:
+            for start in range(0, len(rows), chunk_size):
+                # Ids are handed out in VALUES order within one statement, but RETURNING
+                # does not promise to give them back in that order, so sort them. Asking
+                # SQLAlchemy to keep parameter order instead makes it fall back to one
+                # INSERT per row on SQLite.
+                ids.extend(sorted(db.session.scalars(statement, rows[start:start + chunk_size])))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error("Pet::create_pets - Failed to create %s pets: %s", len(rows), e, exc_info=True)
+            raise
+
+        cache: LRUCache = get_pet_cache()
+        for id in ids:
+            cache.delete(id)  # drop any cached "not found" for the new ids
+
+        return ids
+
     @staticmethod
     def get_all_pets() -> List[Self]:
         """
@@ -117,9 +261,221 @@ class Pet(db.Model):
         try:
             return Pet.query.all()
         except Exception as e:
-            logger.error(f"Pet::get_all_pets - Failed to get all pets: {e}", exc_info=True)
+            logger.error("Pet::get_all_pets - Failed to get all pets: %s", e, exc_info=True)
             return []
         
+    @staticmethod
+    def get_pets_page(limit: int, after: Optional[int] = None) -> Tuple[List[Self], Optional[int]]:
+        """
+        Get one page of pets, ordered by id.
+
+        This uses keyset pagination on the primary key instead of OFFSET,
+        so every page costs the same no matter how deep into the table it is.
+
+        @param limit - int: The maximum number of pets to return.
+        @param after - Optional[int]: Only return pets with an id greater than this.
+
+        @return - Tuple[List[Pet], Optional[int]]: The pets on the page, and the id
+        to continue after for the next page, or None if this is the last page.
+        """
+        query = Pet.query.order_by(Pet.id)
+        if after is not None:
+            query = query.filter(Pet.id > after)
+
+        # Fetch one extra row to know whether there is a next page.
+        pets: List[Pet] = query.limit(limit + 1).all()
+        if len(pets) > limit:
+            return pets[:limit], pets[limit - 1].id
+
+        return pets, None
+
+    @staticmethod
+    def _select_fields(fields: Tuple[str, ...]) -> Tuple[Select, Callable[[Row], Dict[str, Union[int, str]]]]:
+        """
+        Build a Core SELECT of just the given columns, ordered by id, and a
+        function that turns one of its rows into a dictionary of those fields.
+
+        id is always selected, first, because paging needs it, but it only
+        ends up in the dictionaries if it was asked for.
+        """
+        names: Tuple[str, ...] = ("id",) + tuple(f for f in fields if f != "id")
+        columns = Pet.__table__.c
+        statement: Select = db.select(*(columns[name] for name in names)).order_by(columns.id)
+
+        positions: Tuple[int, ...] = tuple(names.index(f) for f in fields)
+
+        def to_dict(row: Row) -> Dict[str, Union[int, str]]:
+            return {field: row[i] for field, i in zip(fields, positions)}
+
+        return statement, to_dict
+
+    @staticmethod
+    def _apply_filters(
+            statement: Select,
+            species: Optional[int] = None,
+            min_age: Optional[int] = None,
+            max_age: Optional[int] = None
+    ) -> Select:
+        """
+        Add WHERE clauses for the species and age range filters that were given.
+        They are served by the ix_pets_species_age index.
+        """
+        columns = Pet.__table__.c
+
+        if species is not None:
+            statement = statement.where(columns.species == species)
+        if min_age is not None:
+            statement = statement.where(columns.age >= min_age)
+        if max_age is not None:
+            statement = statement.where(columns.age <= max_age)
+
+        return statement
+
+    @staticmethod
+    def get_pet_rows_page(
+            limit: int,
+            after: Optional[int] = None,
+            fields: Tuple[str, ...] = Constants.PET_FIELDS,
+            **filters: int
+    ) -> Tuple[List[Dict[str, Union[int, str]]], Optional[int]]:
+        """
+        Get one page of pets as plain dictionaries, ordered by id.
+
+        Works like get_pets_page, but only the requested columns are selected
+        and rows never become Pet objects, so there is no ORM overhead.
+
+        @param limit - int: The maximum number of pets to return.
+        @param after - Optional[int]: Only return pets with an id greater than this.
+        @param fields - Tuple[str, ...]: The columns to return, from Constants.PET_FIELDS.
+        @param filters - int: Optional species, min_age and max_age filters.
+
+        @return - Tuple[List[Dict[str, Union[int, str]]], Optional[int]]: The pets on
+        the page, and the id to continue after, or None if this is the last page.
+        """
+        statement, to_dict = Pet._select_fields(fields)
+        statement = Pet._apply_filters(statement, **filters)
+        if after is not None:
+            statement = statement.where(Pet.__table__.c.id > after)
+
+        rows: List[Row] = db.session.execute(statement.limit(limit + 1)).all()
+        if len(rows) > limit:
+            return [to_dict(row) for row in rows[:limit]], rows[limit - 1][0]
+
+        return [to_dict(row) for row in rows], None
+
+    @staticmethod
+    def iter_pet_batches(
+            batch_size: int = Constants.STREAM_BATCH_SIZE,
+            fields: Tuple[str, ...] = Constants.PET_FIELDS,
+            **filters: int
+    ) -> Iterator[List[Dict[str, Union[int, str]]]]:
+        """
+        Yield every pet in the database as dictionaries, in batches, ordered by id.
+
+        Rows are read through a server-side cursor (yield_per), so only one
+        batch is held in memory at a time no matter how big the table is.
+        Only the requested columns are selected, and no Pet objects are built.
+
+        @param batch_size - int: The number of rows to fetch per batch.
+        @param fields - Tuple[str, ...]: The columns to return, from Constants.PET_FIELDS.
+        @param filters - int: Optional species, min_age and max_age filters.
+
+        @return - Iterator[List[Dict[str, Union[int, str]]]]: Batches of pet dictionaries.
+        """
+        statement, to_dict = Pet._select_fields(fields)
+        statement = Pet._apply_filters(statement, **filters).execution_options(yield_per=batch_size)
+
+        for partition in db.session.execute(statement).partitions():
+            yield [to_dict(row) for row in partition]
+
+    @staticmethod
+    def get_table_version() -> Tuple[int, Optional[int]]:
+        """
+        Get the number of pets and the highest id, as a cheap way to tell
+        whether the table has changed. Pets are only ever added through
+        the API, and any insert or delete changes one of the two.
+
+        @return - Tuple[int, Optional[int]]: The row count and the max id
+        (None when the table is empty).
+        """
+        count, max_id = db.session.execute(
+            db.select(db.func.count(Pet.id), db.func.max(Pet.id))
+        ).one()
+
+        return count, max_id
+
+    @staticmethod
+    def get_stats(bucket_width: int = Constants.DEFAULT_AGE_BUCKET_WIDTH) -> Dict[str, Any]:
+        """
+        Get counts and age statistics for all pets, computed in the database
+        with GROUP BY queries, going through the stats cache when it is enabled.
+
+        @param bucket_width - int: The number of years covered by each bar of the age histogram.
+
+        @return - Dict[str, Any]: The total count and min/max/avg age, the same per
+        species (keyed by AnimalType name), and the age histogram, i.e.
+        [{"min_age": 0, "max_age": 4, "count": 12}, ...] with empty buckets left out.
+        """
+        cache: LRUCache = get_stats_cache()
+        found, stats = cache.get(bucket_width)
+        if found:
+            return stats
+
+        columns = Pet.__table__.c
+
+        per_species: List[Row] = db.session.execute(
+            db.select(
+                columns.species,
+                db.func.count(),
+                db.func.min(columns.age),
+                db.func.max(columns.age),
+                db.func.avg(columns.age)
+            ).group_by(columns.species).order_by(columns.species)
+        ).all()
+
+        # Rendered inline so SELECT and GROUP BY hold the identical expression.
+        width = db.literal(bucket_width, literal_execute=True)
+        bucket = (columns.age // width) * width
+        histogram: List[Row] = db.session.execute(
+            db.select(bucket, db.func.count()).group_by(bucket).order_by(bucket)
+        ).all()
+
+        total: int = sum(row[1] for row in per_species)
+        age_sum: float = sum(float(row[4]) * row[1] for row in per_species)
+        stats = {
+            "total": total,
+            "min_age": min((row[2] for row in per_species), default=None),
+            "max_age": max((row[3] for row in per_species), default=None),
+            "avg_age": round(age_sum / total, 2) if total else None,
+            "species": {
+                Pet._species_name(species): {
+                    "count": count,
+                    "min_age": min_age,
+                    "max_age": max_age,
+                    "avg_age": round(float(avg_age), 2),
+                }
+                for species, count, min_age, max_age, avg_age in per_species
+            },
+            "bucket_width": bucket_width,
+            "age_histogram": [
+                {"min_age": start, "max_age": start + bucket_width - 1, "count": count}
+                for start, count in histogram
+            ],
+        }
+
+        cache.set(bucket_width, stats)
+        return stats
+
+    @staticmethod
+    def _species_name(species: int) -> str:
+        """
+        Map a stored species value back to its AnimalType name, i.e. 1 -> "DOG".
+        """
+        try:
+            return AnimalType(species).name
+        except ValueError:
+            return str(species)
+
     @staticmethod
     def get_one_pet(id: int) -> Optional[Self]:
         """
@@ -137,19 +493,62 @@ class Pet(db.Model):
         try:
             return db.session.get(Pet, id)
         except Exception as e:
-            logger.error(f"Pet::get_one_pet - Failed to get pet with id {id}: {e}", exc_info=True)
+            logger.error("Pet::get_one_pet - Failed to get pet with id %s: %s", id, e, exc_info=True)
             return None
     
+    @staticmethod
+    def get_one_pet_dict(id: int) -> Optional[Dict[str, Union[int, str]]]:
+        """
+        Get a single pet from the database as a dictionary,
+        going through the pet cache when it is enabled.
+
+        Missing pets are cached too, so repeated lookups of an id that does
+        not exist do not hit the database either. Creating a pet invalidates
+        its id in this worker's cache, but not in other workers', so a miss
+        is only kept for PET_CACHE_NEGATIVE_TTL_SECONDS.
+
+        @param id - int: The id of the pet to get.
+
+        @return - Dict[str, Union[int, str]]: The pet's to_dict() payload, or None
+        if there is no pet with that id. Database errors are raised, not cached.
+        """
+        cache: LRUCache = get_pet_cache()
+        found, payload = cache.get(id)
+        if found:
+            return payload
+
+        generation: int = cache.generation
+        pet: Optional[Pet] = db.session.get(Pet, id)
+        payload = pet.to_dict() if pet is not None else None
+        cache.set(id, payload, generation)
+
+        return payload
+
+    @staticmethod
+    def get_oldest_pets(k: int) -> List[Self]:
+        """
+        Get the k oldest pets, oldest first. Pets of the same age
+        are ordered by id, so the result is always the same.
+
+        This is an ORDER BY age DESC, id LIMIT k, which is served by
+        the ix_pets_age_desc_id index instead of a full table scan.
+
+        @param k - int: The number of pets to return.
+
+        @return - List[Pet]: Up to k pets, oldest first.
+        """
+        return Pet.query.order_by(Pet.age.desc(), Pet.id).limit(k).all()
+
     @staticmethod
     def get_oldest_pet() -> Self:
         """
         Get the oldest pet.
         """
-        pets: Self = Pet.query.all()
+        pets: List[Self] = Pet.get_oldest_pets(1)
         if not pets:
             raise ValueError("No pets in the database.")
         
-        return max(pets, key=lambda pet: pet.age)
+        return pets[0]
 
     def to_dict(self) -> Dict[str, Union[int, str]]:
         """
@@ -195,3 +594,11 @@ class Pet(db.Model):
         Subtract the age of one pet from another.
         """
         return self.age - other.age
+
+
+# Serves Pet.get_oldest_pets: rows come out of the index already in
+# (age DESC, id) order, so the database can stop after k of them.
+db.Index("ix_pets_age_desc_id", Pet.age.desc(), Pet.id)
+
+# Serves the ?species=&min_age=&max_age= filters on GET /pets as an index range scan.
+db.Index("ix_pets_species_age", Pet.species, Pet.age)
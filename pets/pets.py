@@ -6,6 +6,8 @@ class Dog(Animal):
     """
     Class to create a dog object.
     """
+    __slots__ = ()
+
     def __init__(self, name: str, age: int):
         super().__init__(name, age, AnimalType.DOG)
 
@@ -23,6 +25,8 @@ class Cat(Animal):
     """
     Class to create a cat object.
     """
+    __slots__ = ()
+
     def __init__(self, name: str, age: int):
         super().__init__(name, age, AnimalType.CAT)
 
@@ -40,6 +44,8 @@ class Bird(Animal):
     """
     Class to create a bird object.
     """
+    __slots__ = ()
+
     def __init__(self, name: str, age: int):
         super().__init__(name, age, AnimalType.BIRD)
 
@@ -0,0 +1,180 @@
+import atexit
+import queue
+import threading
+import time
+
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+from flask import Flask
+
+from animals.simple_animal import Animal
+from pets.models import Pet
+
+# Tells the writer thread to stop once the queue before it is written.
+_STOP: object = object()
+
+
+class GroupCommitWriter:
+    """
+    Writes pets from many requests in one transaction (a "group commit").
+
+    Requests hand their pet to submit() and wait on the returned Future.
+    A background thread takes pets off the queue until it has max_batch of
+    them or max_delay_seconds have passed since the first one, writes them
+    all with Pet.create_pets, and only then resolves each Future with its
+    pet's id. So a request is still answered only after its pet is
+    committed, but many requests share one commit and one fsync.
+
+    If a batch fails, its pets are written again one at a time, so only
+    the requests whose own pet cannot be written get the error.
+
+    The thread is started by the first submit(), so it is started in the
+    process that serves requests, i.e. after a pre-forking server forks.
+
+    Attributes:
+        max_batch - int: The most pets written in one transaction.
+        max_delay_seconds - float: The longest a pet waits for others to join its batch.
+        batches - int: Transactions committed so far.
+        pets - int: Pets written so far.
+        largest_batch - int: The most pets written in one transaction so far.
+    """
+    def __init__(self, app: Flask, max_batch: int = 100, max_delay_seconds: float = 0.005) -> None:
+        self.app: Flask = app
+        self.max_batch: int = max_batch
+        self.max_delay_seconds: float = max_delay_seconds
+        self.batches: int = 0
+        self.pets: int = 0
+        self.largest_batch: int = 0
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._lock: threading.Lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, pet: Animal) -> Future:
+        """
+        Queue a pet to be written with the next batch.
+        If it is not a valid pet, raise a TypeError straight away.
+
+        @param pet - Animal: The pet to create.
+
+        @return Future: Resolves to the pet's id once it is committed.
+        """
+        Pet._validate(pet)  # will log and throw if not valid
+
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((pet, future))
+        return future
+
+    def create_pet(self, pet: Animal, timeout: Optional[float] = None) -> int:
+        """
+        Write a pet with the next batch and wait until it is committed.
+        If it is not committed within `timeout` seconds, raise a
+        concurrent.futures.TimeoutError; it may still be committed later.
+
+        @param pet - Animal: The pet to create.
+        @param timeout - Optional[float]: Seconds to wait, or None to wait as long as it takes.
+
+        @return int: The new pet's id.
+        """
+        return self.submit(pet).result(timeout)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Write whatever is queued, then stop the thread.
+        """
+        with self._lock:
+            thread: Optional[threading.Thread] = self._thread
+            self._thread = None
+
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the writer's counters, for monitoring.
+        """
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "pets": self.pets,
+                "largest_batch": self.largest_batch,
+                "queued": self._queue.qsize(),
+            }
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="group-commit-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+
+            batch: List[Tuple[Animal, Future]] = [item]
+            deadline: float = time.monotonic() + self.max_delay_seconds
+            stopping: bool = False
+
+            while len(batch) < self.max_batch:
+                remaining: float = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._write(batch)
+            if stopping:
+                return
+
+    def _write(self, batch: List[Tuple[Animal, Future]]) -> None:
+        """
+        Write one batch in one transaction and resolve its Futures.
+        If it fails, write each of its pets on its own.
+        """
+        try:
+            with self.app.app_context():
+                ids: List[int] = Pet.create_pets([pet for pet, _ in batch])
+        except Exception as e:  # already logged by Pet.create_pets
+            if len(batch) > 1:
+                for item in batch:
+                    self._write([item])
+            else:
+                batch[0][1].set_exception(e)
+            return
+
+        with self._lock:
+            self.batches += 1
+            self.pets += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+
+        for (_, future), id in zip(batch, ids):
+            future.set_result(id)
+
+
+def init_group_commit(app: Flask) -> Optional[GroupCommitWriter]:
+    """
+    Set up group commit for POST /pets when app.config['GROUP_COMMIT_ENABLED']
+    is set. The writer is kept in app.extensions['group_commit'].
+
+    @return Optional[GroupCommitWriter]: The writer, or None when it is off.
+    """
+    if not app.config.get('GROUP_COMMIT_ENABLED', False):
+        return None
+
+    writer: GroupCommitWriter = GroupCommitWriter(
+        app,
+        app.config.get('GROUP_COMMIT_MAX_BATCH', 100),
+        app.config.get('GROUP_COMMIT_MAX_DELAY_MS', 5.0) / 1000
+    )
+    app.extensions['group_commit'] = writer
+    atexit.register(writer.stop, 5.0)
+
+    return writer
@@ -0,0 +1,49 @@
+import os
+
+from typing import Iterator
+
+import pytest
+
+from flask import Flask
+from sqlalchemy.orm import scoped_session
+
+# app.py connects when it is imported, so the test database is chosen first:
+# SQLALCHEMY_TEST_DATABASE_URI if it is set, otherwise a fast in-memory SQLite.
+# It is never SQLALCHEMY_DATABASE_URI, so the tests cannot touch real data.
+os.environ['SQLALCHEMY_DATABASE_URI'] = os.environ.get('SQLALCHEMY_TEST_DATABASE_URI') or 'sqlite://'
+os.environ.setdefault('SECRET_KEY', 'test')
+
+from app import app, create_app
+from pets.models import db
+from test_utilities import create_schema, rolled_back_session
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database_schema() -> None:
+    """Create the tables once for the whole test session."""
+    create_schema()
+
+@pytest.fixture
+def db_session() -> Iterator[scoped_session]:
+    """A session whose changes are rolled back after the test. See test_utilities.use_database."""
+    with app.app_context(), rolled_back_session() as session:
+        yield session
+
+@pytest.fixture
+def pooled_app(tmp_path) -> Iterator[Flask]:
+    """
+    An app with its own file-backed SQLite database and a real connection
+    pool, for tests about the pool or exact statement counts, which the
+    shared connection of use_database would hide or add to.
+    """
+    pooled: Flask = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'pooled.db'}",
+    })
+    with pooled.app_context():
+        db.create_all()
+
+    yield pooled
+
+    with pooled.app_context():
+        db.engine.dispose()
+
@@ -0,0 +1,160 @@
+import threading
+
+from http import HTTPStatus
+from unittest import mock
+
+from app import create_app
+from pets.models import db
+from utils.admission import ConcurrencyLimiter, RateLimiter, init_admission
+
+
+def test_concurrency_limiter_turns_away_when_queue_is_full() -> None:
+    """Test that requests beyond the limit and the queue are rejected straight away."""
+    limiter = ConcurrencyLimiter(limit=1, max_queue=0)
+
+    assert limiter.acquire()
+    assert not limiter.acquire()
+
+    limiter.release()
+    assert limiter.acquire()
+
+    stats = limiter.stats()
+    assert stats["admitted"] == 2
+    assert stats["rejected"] == 1
+    assert stats["active"] == 1
+
+
+def test_concurrency_limiter_queued_request_gets_freed_slot() -> None:
+    """Test that a queued request runs as soon as a slot is released."""
+    limiter = ConcurrencyLimiter(limit=1, max_queue=1, timeout_seconds=5)
+    limiter.acquire()
+
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(limiter.acquire()))
+    waiter.start()
+    while limiter.stats()["waiting"] == 0:
+        pass
+    assert not limiter.acquire()  # the queue is full
+
+    limiter.release()
+    waiter.join(5)
+
+    assert results == [True]
+    assert limiter.stats()["active"] == 1
+
+
+def test_concurrency_limiter_queue_timeout() -> None:
+    """Test that a queued request gives up once its wait is over."""
+    limiter = ConcurrencyLimiter(limit=1, max_queue=1, timeout_seconds=0.01)
+    limiter.acquire()
+
+    assert not limiter.acquire()
+    assert limiter.stats()["timed_out"] == 1
+    assert limiter.stats()["waiting"] == 0
+
+
+def test_concurrency_limiter_timed_out_waiter_passes_the_wakeup_on() -> None:
+    """Test that a waiter that gives up wakes the next one, in case it was woken for a freed slot."""
+    limiter = ConcurrencyLimiter(limit=1, max_queue=1, timeout_seconds=0.01)
+    limiter.acquire()
+
+    with mock.patch.object(limiter._condition, "notify", wraps=limiter._condition.notify) as notify:
+        assert not limiter.acquire()
+
+    notify.assert_called_once()
+
+
+def test_rate_limiter_token_bucket() -> None:
+    """Test that a client can burst, is then limited, and recovers at the rate."""
+    now = [0.0]
+    limiter = RateLimiter(rate=2, burst=3, clock=lambda: now[0])
+
+    assert [limiter.acquire("a") for _ in range(3)] == [0, 0, 0]
+    assert limiter.acquire("a") == 0.5
+    assert limiter.acquire("b") == 0  # other clients have their own bucket
+
+    now[0] = 0.5
+    assert limiter.acquire("a") == 0
+    assert limiter.acquire("a") > 0
+    assert limiter.stats() == {"clients": 2, "limited": 2}
+
+
+def test_rate_limiter_forgets_least_recent_clients() -> None:
+    """Test that only max_clients buckets are kept."""
+    limiter = RateLimiter(rate=1, burst=1, max_clients=2, clock=lambda: 0.0)
+    for client in ("a", "b", "c"):
+        limiter.acquire(client)
+
+    assert limiter.stats()["clients"] == 2
+    assert limiter.acquire("a") == 0  # forgotten, so it has a full bucket again
+    assert limiter.acquire("c") > 0
+
+
+def make_app(tmp_path, **config):
+    """Build an app with admission settings and its own database with the tables in it."""
+    limited = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'admission.db'}", **config})
+    with limited.app_context():
+        db.create_all()
+    return limited
+
+
+def test_nothing_is_limited_by_default() -> None:
+    """Test that admission control is off unless a limit is set."""
+    app = create_app()
+
+    assert init_admission(app) is None
+    assert "admission" not in app.extensions
+
+
+def test_rate_limited_client_gets_429(tmp_path) -> None:
+    """Test that a client over its rate limit gets a 429 with Retry-After, and /metrics is exempt."""
+    app = make_app(tmp_path, RATE_LIMIT_PER_SECOND=0.5, RATE_LIMIT_BURST=1, RATE_LIMIT_CLIENT_HEADER="X-API-Key")
+
+    with app.test_client() as client:
+        assert client.get("/pets/stats", headers={"X-API-Key": "a"}).status_code == HTTPStatus.OK
+        response = client.get("/pets/stats", headers={"X-API-Key": "a"})
+        other = client.get("/pets/stats", headers={"X-API-Key": "b"})
+        metrics = client.get("/metrics", headers={"X-API-Key": "a"})
+
+    assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS
+    assert response.headers["Retry-After"] == "2"
+    assert other.status_code == HTTPStatus.OK
+    assert metrics.status_code == HTTPStatus.OK
+    assert "admission_rate_limited 1" in metrics.get_data(as_text=True)
+
+
+def test_saturated_writes_get_503_and_reads_still_run(tmp_path) -> None:
+    """Test that writes are shed when their slots are taken, without holding up reads or leaking slots."""
+    app = make_app(tmp_path, ADMISSION_READ_CONCURRENCY=1, ADMISSION_WRITE_CONCURRENCY=1,
+                   ADMISSION_RETRY_AFTER_SECONDS=3)
+    controller = app.extensions["admission"]
+    controller.writes.acquire()  # a write that is still running
+
+    with app.test_client() as client:
+        response = client.post("/pets", json={"name": "Al", "age": 5, "species": "DOG"})
+        read = client.get("/pets/stats")
+        client.get("/pets/stats")
+
+    assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert response.headers["Retry-After"] == "3"
+    assert read.status_code == HTTPStatus.OK
+    assert controller.reads.stats()["active"] == 0
+    assert controller.reads.stats()["admitted"] == 2
+    assert controller.writes.stats()["rejected"] == 1
+
+
+def test_clients_behind_a_trusted_proxy_get_their_own_bucket(tmp_path) -> None:
+    """Test that with TRUSTED_PROXIES, clients are told apart by X-Forwarded-For, and without it they are not."""
+    proxy = {"REMOTE_ADDR": "10.0.0.1"}
+
+    for trusted, second_status in ((1, HTTPStatus.OK), (0, HTTPStatus.TOO_MANY_REQUESTS)):
+        (tmp_path / str(trusted)).mkdir()
+        app = make_app(tmp_path / str(trusted), RATE_LIMIT_PER_SECOND=0.5, RATE_LIMIT_BURST=1, TRUSTED_PROXIES=trusted)
+
+        with app.test_client() as client:
+            first = client.get("/pets/stats", headers={"X-Forwarded-For": "203.0.113.1"}, environ_base=proxy)
+            second = client.get("/pets/stats", headers={"X-Forwarded-For": "203.0.113.2"}, environ_base=proxy)
+
+        assert first.status_code == HTTPStatus.OK
+        assert second.status_code == second_status
+
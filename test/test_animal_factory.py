@@ -1,6 +1,7 @@
 import pytest
 
 from animals.animal_factory import AnimalFactory
+from animals.animal_types import AnimalType
 from animals.simple_animal import Animal
 from utils.constants import Constants
 from animals.other_animals import Lion, Shark
@@ -22,3 +23,50 @@ def test_animal_factory(name, age, species, expected) -> None:
         assert animal.name == name
         assert animal.age == age
         assert animal.species.name == species
+
+
+def test_animal_factory_accepts_any_case() -> None:
+    factory: AnimalFactory = AnimalFactory()
+    assert isinstance(factory.create_animal("Tom", 5, "dog"), Dog)
+    assert isinstance(factory.create_animal("Tom", 5, "Cat"), Cat)
+
+    with pytest.raises(ValueError) as err:
+        factory.create_animal("Tom", 5, "unicorn")
+
+    assert "Unknown animal type: unicorn" in str(err.value)
+
+
+def test_animal_factory_registration() -> None:
+    class Fish(Animal):
+        __slots__ = ()
+
+        def __init__(self, name: str, age: int):
+            super().__init__(name, age, AnimalType.SHARK)
+
+        def __str__(self) -> str:
+            return f"{self.name} is a fish."
+
+        def speak(self) -> None:
+            print("Blub!")
+
+        def do_stuff(self) -> None:
+            print("I'm swimming!")
+
+    AnimalFactory.register("fish", Fish)
+    try:
+        assert "FISH" in AnimalFactory.registered_species()
+        assert isinstance(AnimalFactory().create_animal("Nemo", 1, "FISH"), Fish)
+    finally:
+        AnimalFactory.unregister("fish")
+
+    with pytest.raises(ValueError):
+        AnimalFactory().create_animal("Nemo", 1, "fish")
+
+
+@pytest.mark.parametrize("animal_class", [Dog, Cat, Bird, Shark, Lion])
+def test_animals_have_no_instance_dict(animal_class) -> None:
+    animal: Animal = animal_class("Tom", 5)
+    assert not hasattr(animal, "__dict__")
+
+    with pytest.raises(AttributeError):
+        animal.color = "brown"
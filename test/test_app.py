@@ -1,11 +1,19 @@
+import gc
+import json
+import weakref
+
 from unittest import mock
 
 import pytest
 
+from sqlalchemy import inspect
+
 from animals.animal_factory import AnimalFactory
-from app import app
-from pets.models import Pet
+from app import app, create_app
+from pets import models
+from pets.models import Pet, db, warm_up_pool
 from test_utilities import use_database
+from utils.pool import pool_metrics
 
 
 @use_database
@@ -78,3 +86,297 @@ def test_get_one_pet_fails(mock_pet, capsys) -> None:
             assert "app.py::get_one_pet: Error trying to get one pet: Test Exception" in capture.out
     except Exception as e:
         pass
+
+
+@use_database
+def test_get_pets_is_paginated() -> None:
+    app.testing = True
+    factory = AnimalFactory()
+    for i in range(5):
+        Pet.create_pet(factory.create_animal(name=f"Pet{i}", age=i, species="dog"))
+
+    with app.test_client() as client:
+        response = client.get("/pets?limit=2")
+        assert response.status_code == 200
+        assert [p["name"] for p in response.json["pets"]] == ["Pet0", "Pet1"]
+
+        names = [p["name"] for p in response.json["pets"]]
+        while response.json["next"] is not None:
+            response = client.get(f"/pets?limit=2&after={response.json['next']}")
+            assert response.status_code == 200
+            names.extend(p["name"] for p in response.json["pets"])
+
+        assert names == [f"Pet{i}" for i in range(5)]
+
+
+@use_database
+@pytest.mark.parametrize("query", ["limit=0", "limit=abc", "limit=100000", "limit=\u00b2", "after=not-a-cursor"])
+def test_get_pets_rejects_bad_pagination(query) -> None:
+    app.testing = True
+
+    with app.test_client() as client:
+        response = client.get(f"/pets?{query}")
+        assert response.status_code == 400
+        assert "error" in response.json
+
+
+@use_database
+def test_get_pets_streams_ndjson() -> None:
+    app.testing = True
+    factory = AnimalFactory()
+    for i in range(3):
+        Pet.create_pet(factory.create_animal(name=f"Pet{i}", age=i, species="cat"))
+
+    with app.test_client() as client:
+        response = client.get("/pets", headers={"Accept": "application/x-ndjson"})
+        assert response.status_code == 200
+        assert response.mimetype == "application/x-ndjson"
+        assert response.is_streamed
+
+        lines = response.get_data(as_text=True).splitlines()
+        assert [json.loads(line)["name"] for line in lines] == ["Pet0", "Pet1", "Pet2"]
+
+
+@use_database
+def test_get_pets_streams_json(monkeypatch) -> None:
+    app.testing = True
+    factory = AnimalFactory()
+    for i in range(5):
+        Pet.create_pet(factory.create_animal(name=f"Pet{i}", age=i, species="bird"))
+
+    # Small batches so the stream is made of several chunks.
+    original = Pet.iter_pet_batches
+    monkeypatch.setattr(Pet, "iter_pet_batches", lambda **kwargs: original(batch_size=2, **kwargs))
+
+    with app.test_client() as client:
+        response = client.get("/pets?stream=1")
+        assert response.status_code == 200
+        assert response.mimetype == "application/json"
+        assert [p["name"] for p in response.json["pets"]] == [f"Pet{i}" for i in range(5)]
+
+
+@use_database
+def test_get_k_oldest_pets() -> None:
+    app.testing = True
+    factory = AnimalFactory()
+    for name, age in (("A", 2), ("B", 9), ("C", 4)):
+        Pet.create_pet(factory.create_animal(name=name, age=age, species="dog"))
+
+    with app.test_client() as client:
+        response = client.get("/pets/oldest?k=2")
+        assert response.status_code == 200
+        assert [p["name"] for p in response.json["pets"]] == ["B", "C"]
+
+        response = client.get("/pets/oldest")
+        assert response.status_code == 200
+        assert response.json["pet"]["name"] == "B"
+
+        for k in ("0", "\u00b2"):
+            response = client.get(f"/pets/oldest?k={k}")
+            assert response.status_code == 400
+
+
+@use_database
+def test_bulk_pet_creation() -> None:
+    app.testing = True
+    data = [
+        {"name": "Tom", "age": 5, "species": "dog"},
+        {"name": "Simba", "age": 3, "species": "lion"},
+        {"name": "Tweety", "age": "1", "species": "bird"},
+        {"name": "Garfield", "age": 7, "species": "cat"},
+    ]
+
+    with app.test_client() as client:
+        response = client.post("/pets/bulk", json=data)
+        assert response.status_code == 201
+        assert len(response.json["ids"]) == 2
+        assert [e["index"] for e in response.json["errors"]] == [1, 2]
+        assert response.json["errors"][1]["errors"][0]["field"] == "age"
+
+        names = [client.get(f"/pets/{i}").json["pet"]["name"] for i in response.json["ids"]]
+        assert names == ["Tom", "Garfield"]
+
+
+@use_database
+def test_bulk_pet_creation_rejects_bad_bodies() -> None:
+    app.testing = True
+
+    with app.test_client() as client:
+        assert client.post("/pets/bulk", json={"name": "Tom"}).status_code == 400
+        assert client.post("/pets/bulk", json=[]).status_code == 400
+
+        response = client.post("/pets/bulk", json=[{"name": "Jaws", "age": 3, "species": "shark"}])
+        assert response.status_code == 400
+        assert response.json["ids"] == []
+        assert response.json["errors"][0]["index"] == 0
+
+
+@use_database
+def test_get_missing_pet() -> None:
+    app.testing = True
+
+    with app.test_client() as client:
+        response = client.get("/pets/1")
+        assert response.status_code == 404
+        assert response.json["error"] == "Pet not found"
+
+
+@use_database
+@pytest.mark.parametrize("url", ["/pets/1", "/pets", "/pets?limit=1", "/pets/oldest", "/pets/oldest?k=2"])
+def test_conditional_get(url) -> None:
+    app.testing = True
+    factory = AnimalFactory()
+    Pet.create_pet(factory.create_animal(name="Tom", age=5, species="dog"))
+
+    with app.test_client() as client:
+        response = client.get(url)
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.data == b""
+        assert response.headers["ETag"] == etag
+
+        response = client.get(url, headers={"If-None-Match": '"something-else"'})
+        assert response.status_code == 200
+
+
+@use_database
+def test_collection_etag_changes_when_a_pet_is_added() -> None:
+    app.testing = True
+    factory = AnimalFactory()
+    Pet.create_pet(factory.create_animal(name="Tom", age=5, species="dog"))
+
+    with app.test_client() as client:
+        etag = client.get("/pets").headers["ETag"]
+        assert client.get("/pets?limit=5").headers["ETag"] != etag
+
+        Pet.create_pet(factory.create_animal(name="Jerry", age=2, species="cat"))
+        response = client.get("/pets", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert len(response.json["pets"]) == 2
+
+
+def test_get_pool_stats(pooled_app) -> None:
+    pooled_app.testing = True
+    pool_metrics.reset()
+
+    with pooled_app.test_client() as client:
+        client.get("/pets")
+        response = client.get("/pool/stats")
+        assert response.status_code == 200
+        assert response.json["pool"]["checkouts"] >= 1
+        assert "wait_seconds_max" in response.json["pool"]
+
+
+@use_database
+def test_get_pets_with_fields() -> None:
+    app.testing = True
+    factory = AnimalFactory()
+    for i in range(3):
+        Pet.create_pet(factory.create_animal(name=f"Pet{i}", age=i, species="dog"))
+
+    with app.test_client() as client:
+        response = client.get("/pets?fields=age,name&limit=2")
+        assert response.status_code == 200
+        assert response.json["pets"] == [{"name": "Pet0", "age": 0}, {"name": "Pet1", "age": 1}]
+
+        response = client.get(f"/pets?fields=name&after={response.json['next']}")
+        assert response.json["pets"] == [{"name": "Pet2"}]
+
+        response = client.get("/pets?fields=id", headers={"Accept": "application/x-ndjson"})
+        assert [json.loads(line) for line in response.get_data(as_text=True).splitlines()] == [
+            {"id": 1}, {"id": 2}, {"id": 3}
+        ]
+
+        assert client.get("/pets?fields=name,password").status_code == 400
+        assert client.get("/pets?fields=").status_code == 400
+
+
+@use_database
+def test_get_pets_with_filters() -> None:
+    app.testing = True
+    factory = AnimalFactory()
+    for name, age, species in (("A", 1, "dog"), ("B", 4, "cat"), ("C", 6, "dog"), ("D", 8, "dog")):
+        Pet.create_pet(factory.create_animal(name=name, age=age, species=species))
+
+    with app.test_client() as client:
+        response = client.get("/pets?species=dog&min_age=2&fields=name")
+        assert response.status_code == 200
+        assert response.json["pets"] == [{"name": "C"}, {"name": "D"}]
+
+        response = client.get("/pets?max_age=4&fields=name", headers={"Accept": "application/x-ndjson"})
+        assert [json.loads(line) for line in response.get_data(as_text=True).splitlines()] == [
+            {"name": "A"}, {"name": "B"}
+        ]
+
+        assert client.get("/pets?species=unicorn").status_code == 400
+        assert client.get("/pets?min_age=9&max_age=1").status_code == 400
+
+
+@use_database
+def test_get_pet_stats() -> None:
+    app.testing = True
+    factory = AnimalFactory()
+    for name, age, species in (("A", 1, "dog"), ("B", 4, "cat"), ("C", 6, "dog")):
+        Pet.create_pet(factory.create_animal(name=name, age=age, species=species))
+
+    with app.test_client() as client:
+        response = client.get("/pets/stats?bucket_width=10")
+        assert response.status_code == 200
+        assert response.json["stats"]["total"] == 3
+        assert response.json["stats"]["species"]["DOG"]["count"] == 2
+        assert response.json["stats"]["age_histogram"] == [{"min_age": 0, "max_age": 9, "count": 3}]
+
+        assert client.get("/pets/stats?bucket_width=0").status_code == 400
+        assert client.get("/pets/stats?bucket_width=\u00b2").status_code == 400
+
+
+def test_create_app_does_not_touch_the_database(tmp_path, monkeypatch) -> None:
+    """Test that the factory leaves the tables to init-db and opens no connections."""
+    database = tmp_path / "factory.db"
+    monkeypatch.setenv("SQLALCHEMY_DATABASE_URI", f"sqlite:///{database}")
+    monkeypatch.setenv("SQLALCHEMY_POOL_SIZE", "2")
+    factory_app = create_app()
+
+    assert not database.exists()
+
+    result = factory_app.test_cli_runner().invoke(args=["init-db"])
+    assert result.exit_code == 0, result.output
+    with factory_app.app_context():
+        assert "pets" in inspect(db.engine).get_table_names()
+
+        assert warm_up_pool(factory_app, 5) == 2
+        assert db.engine.pool.checkedin() == 2
+        db.engine.dispose()
+
+
+def test_apps_do_not_share_settings() -> None:
+    """Test that building a second app leaves the first app's caches and query stats alone."""
+    first = create_app({"PET_CACHE_MAX_ENTRIES": 5, "SLOW_QUERY_THRESHOLD_MS": 100})
+    second = create_app({"PET_CACHE_MAX_ENTRIES": 0, "SLOW_QUERY_THRESHOLD_MS": 900})
+
+    assert first.extensions["pet_cache"].max_entries == 5
+    assert first.extensions["query_stats"].slow_threshold_seconds == 0.1
+    assert second.extensions["pet_cache"] is not first.extensions["pet_cache"]
+    assert second.extensions["query_stats"].slow_threshold_seconds == 0.9
+
+
+def test_only_live_apps_are_warmed_up_after_fork() -> None:
+    """Test that apps are tracked for the one fork hook only while they are alive."""
+    extra = create_app({"DB_WARMUP_CONNECTIONS": 3})
+    gc.collect()  # so that no app leaves the WeakSet while it is being counted
+    tracked = len(models._apps_to_warm_up)
+    assert extra in models._apps_to_warm_up
+
+    with mock.patch.object(models, "db") as mock_db, mock.patch.object(models, "warm_up_pool") as warm_up:
+        models._after_fork()
+    assert mock.call(extra, 3) in warm_up.call_args_list
+    assert mock_db.engine.dispose.call_count == tracked
+
+    extra_ref = weakref.ref(extra)
+    del extra, warm_up  # the mock's call list refers to the app too
+    gc.collect()
+    assert extra_ref() is None
+    assert len(models._apps_to_warm_up) <= tracked - 1
@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("quart")
+pytest.importorskip("aiosqlite")
+
+from asgi import app as async_app
+from pets.async_models import connect_async_db, create_async_tables
+from utils.cache import LRUCache
+from utils.errors import InvalidConfigurationError
+from utils.helpers import get_async_database_uri
+
+
+@pytest.fixture
+def fresh_async_app(tmp_path):
+    """Point the async app at an empty SQLite database."""
+    original_uri = async_app.config['SQLALCHEMY_ASYNC_DATABASE_URI']
+    async_app.config['SQLALCHEMY_ASYNC_DATABASE_URI'] = f"sqlite+aiosqlite:///{tmp_path / 'pets.db'}"
+    connect_async_db(async_app.config)
+
+    yield async_app
+
+    async_app.config['SQLALCHEMY_ASYNC_DATABASE_URI'] = original_uri
+    connect_async_db(async_app.config)
+
+
+def test_async_pet_routes(fresh_async_app) -> None:
+    """Test that the async app serves the same routes as the sync one."""
+    async def scenario() -> None:
+        async with fresh_async_app.test_app() as test_app:  # runs startup/shutdown
+            await create_async_tables()  # the app does not create them itself
+            client = test_app.test_client()
+
+            for name, age in (("Tom", 5), ("Jerry", 9), ("Spike", 9)):
+                response = await client.post("/pets", json={"name": name, "age": age, "species": "dog"})
+                assert response.status_code == 201
+
+            response = await client.post("/pets", json={"name": "Jaws", "age": 3, "species": "shark"})
+            assert response.status_code == 400
+
+            response = await client.get("/pets/1")
+            assert response.status_code == 200
+            assert (await response.get_json())["pet"]["name"] == "Tom"
+
+            response = await client.get("/pets/100")
+            assert response.status_code == 404
+
+            response = await client.get("/pets?limit=2")
+            body = await response.get_json()
+            assert [p["name"] for p in body["pets"]] == ["Tom", "Jerry"]
+
+            response = await client.get(f"/pets?limit=2&after={body['next']}")
+            body = await response.get_json()
+            assert [p["name"] for p in body["pets"]] == ["Spike"]
+            assert body["next"] is None
+
+            response = await client.get("/pets/oldest")
+            assert (await response.get_json())["pet"]["name"] == "Jerry"
+
+            response = await client.get("/pets/oldest?k=2")
+            assert [p["name"] for p in (await response.get_json())["pets"]] == ["Jerry", "Spike"]
+
+    asyncio.run(scenario())
+
+
+def test_async_app_reads_through_the_pet_cache(fresh_async_app, monkeypatch) -> None:
+    """Test that the async app uses its own pet cache, so a second fetch is a cache hit."""
+    pet_cache = LRUCache(max_entries=10, ttl_seconds=60)
+    monkeypatch.setitem(fresh_async_app.extensions, "pet_cache", pet_cache)
+
+    async def scenario() -> None:
+        async with fresh_async_app.test_app() as test_app:
+            await create_async_tables()
+            client = test_app.test_client()
+            await client.post("/pets", json={"name": "Tom", "age": 5, "species": "dog"})
+
+            for _ in range(3):
+                response = await client.get("/pets/1")
+                assert (await response.get_json())["pet"]["name"] == "Tom"
+
+    asyncio.run(scenario())
+
+    assert pet_cache.stats()["misses"] == 1
+    assert pet_cache.stats()["hits"] == 2
+
+
+def test_get_async_database_uri(monkeypatch) -> None:
+    """Test that sync database URIs are switched to their async drivers."""
+    monkeypatch.delenv("SQLALCHEMY_ASYNC_DATABASE_URI", raising=False)
+
+    assert get_async_database_uri("sqlite:///pets.db") == "sqlite+aiosqlite:///pets.db"
+    assert get_async_database_uri("postgresql:///pets_demo") == "postgresql+asyncpg:///pets_demo"
+    assert (
+        get_async_database_uri("postgresql+psycopg2://user:pw@host/pets")
+        == "postgresql+asyncpg://user:pw@host/pets"
+    )
+
+    with pytest.raises(InvalidConfigurationError):
+        get_async_database_uri("oracle://host/pets")
+
+    monkeypatch.setenv("SQLALCHEMY_ASYNC_DATABASE_URI", "sqlite+aiosqlite:///other.db")
+    assert get_async_database_uri("sqlite:///pets.db") == "sqlite+aiosqlite:///other.db"
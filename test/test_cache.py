@@ -0,0 +1,83 @@
+from utils.cache import LRUCache
+
+
+class FakeClock:
+    """A clock that only moves when told to."""
+    def __init__(self) -> None:
+        self.now: float = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_cache_hits_and_misses() -> None:
+    """Test that stored values are returned, including None."""
+    cache = LRUCache(max_entries=10)
+
+    assert cache.get(1) == (False, None)
+    cache.set(1, {"name": "Fido"})
+    cache.set(2, None)
+
+    assert cache.get(1) == (True, {"name": "Fido"})
+    assert cache.get(2) == (True, None)
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 1
+
+
+def test_cache_evicts_least_recently_used() -> None:
+    """Test that the least recently used entry is evicted when full."""
+    cache = LRUCache(max_entries=2)
+    cache.set(1, "a")
+    cache.set(2, "b")
+    cache.get(1)
+    cache.set(3, "c")
+
+    assert cache.get(2) == (False, None)
+    assert cache.get(1) == (True, "a")
+    assert cache.get(3) == (True, "c")
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cache_entries_expire() -> None:
+    """Test that entries are not served after their time-to-live."""
+    clock = FakeClock()
+    cache = LRUCache(max_entries=10, ttl_seconds=5, clock=clock)
+    cache.set(1, "a")
+
+    clock.now = 4.9
+    assert cache.get(1) == (True, "a")
+
+    clock.now = 5.0
+    assert cache.get(1) == (False, None)
+    assert cache.stats()["expirations"] == 1
+
+
+def test_cached_none_expires_after_negative_ttl() -> None:
+    """Test that a cached None expires after negative_ttl_seconds, and other values after ttl_seconds."""
+    clock = FakeClock()
+    cache = LRUCache(max_entries=10, ttl_seconds=5, clock=clock, negative_ttl_seconds=1)
+    cache.set(1, "a")
+    cache.set(2, None)
+
+    clock.now = 1.0
+    assert cache.get(1) == (True, "a")
+    assert cache.get(2) == (False, None)
+
+
+def test_cache_ignores_values_loaded_before_invalidation() -> None:
+    """Test that a value loaded before a delete is not stored after it."""
+    cache = LRUCache(max_entries=10)
+    generation = cache.generation
+    cache.delete(1)
+    cache.set(1, None, generation)
+
+    assert cache.get(1) == (False, None)
+
+
+def test_disabled_cache_stores_nothing() -> None:
+    """Test that a cache with no room is a no-op."""
+    cache = LRUCache(max_entries=0)
+    cache.set(1, "a")
+
+    assert cache.get(1) == (False, None)
+    assert cache.stats()["misses"] == 0
@@ -0,0 +1,112 @@
+import gzip
+import json
+
+import pytest
+
+from animals.animal_factory import AnimalFactory
+from app import app
+from pets.models import Pet
+from test_utilities import use_database
+
+
+@pytest.fixture
+def compression():
+    app.testing = True
+    app.config['COMPRESSION_ENABLED'] = True
+    app.config['COMPRESSION_MIN_SIZE'] = 200
+    yield
+    app.config['COMPRESSION_ENABLED'] = False
+    app.config['COMPRESSION_MIN_SIZE'] = 1024
+
+
+def create_pets(count: int) -> None:
+    Pet.create_pets([AnimalFactory().create_animal(f"Pet{i}", i, "dog") for i in range(count)])
+
+
+@use_database
+def test_large_responses_are_gzipped(compression) -> None:
+    create_pets(20)
+
+    with app.test_client() as client:
+        response = client.get("/pets", headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == 200
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in response.headers["Vary"]
+        assert response.headers["ETag"].startswith("W/")
+        assert len(json.loads(gzip.decompress(response.data))["pets"]) == 20
+
+        # The weak ETag still gets a 304, which carries the same weak ETag.
+        etag = response.headers["ETag"]
+        response = client.get("/pets", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+        assert "Accept-Encoding" in response.headers["Vary"]
+
+
+@use_database
+def test_small_responses_are_not_compressed(compression) -> None:
+    create_pets(1)
+
+    with app.test_client() as client:
+        response = client.get("/pets/1", headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == 200
+        assert "Content-Encoding" not in response.headers
+        assert response.json["pet"]["name"] == "Pet0"
+
+        # Its ETag is weak all the same, so that it matches the one on its 304.
+        etag = response.headers["ETag"]
+        assert etag.startswith("W/")
+        response = client.get("/pets/1", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+
+
+@use_database
+def test_nothing_is_compressed_when_disabled() -> None:
+    app.testing = True
+    create_pets(20)
+
+    with app.test_client() as client:
+        response = client.get("/pets", headers={"Accept-Encoding": "gzip"})
+        assert "Content-Encoding" not in response.headers
+
+
+@use_database
+def test_streamed_responses_are_compressed_per_chunk(compression, monkeypatch) -> None:
+    create_pets(10)
+    original = Pet.iter_pet_batches
+    monkeypatch.setattr(Pet, "iter_pet_batches", lambda **kwargs: original(batch_size=3, **kwargs))
+
+    with app.test_client() as client:
+        response = client.get(
+            "/pets",
+            headers={"Accept": "application/x-ndjson", "Accept-Encoding": "gzip"},
+            buffered=False
+        )
+        assert response.is_streamed
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert "Content-Length" not in response.headers
+
+        chunks = list(response.response)
+        assert len(chunks) > 2
+
+        lines = gzip.decompress(b"".join(chunks)).decode().splitlines()
+        assert [json.loads(line)["name"] for line in lines] == [f"Pet{i}" for i in range(10)]
+
+
+@use_database
+@pytest.mark.parametrize("encoding, module", [("zstd", "zstandard"), ("br", "brotli")])
+def test_optional_encodings(compression, encoding, module) -> None:
+    library = pytest.importorskip(module)
+    create_pets(20)
+
+    with app.test_client() as client:
+        response = client.get("/pets", headers={"Accept-Encoding": f"gzip;q=0.5, {encoding}"})
+        assert response.headers["Content-Encoding"] == encoding
+
+        if encoding == "zstd":
+            body = library.ZstdDecompressor().decompressobj().decompress(response.data)
+        else:
+            body = library.decompress(response.data)
+
+        assert len(json.loads(body)["pets"]) == 20
@@ -1,3 +1,4 @@
+import base64
 import logging
 import sys
 
@@ -5,8 +6,24 @@ from logging import Logger
 
 import pytest
 
-from utils.errors import InvalidRequestBodyError, InvalidTypesError
-from utils.helpers import check_for_correct_types, validate_json
+from utils.constants import Constants
+from utils.errors import (
+    InvalidConfigurationError,
+    InvalidQueryParameterError,
+    InvalidRequestBodyError,
+    InvalidTypesError
+)
+from utils.helpers import (
+    check_for_correct_types,
+    decode_cursor,
+    encode_cursor,
+    get_engine_options,
+    parse_filters,
+    parse_page_args,
+    percentile,
+    validate_json
+)
+from utils.pool import MeteredQueuePool
 
 
 logging.basicConfig(
@@ -41,4 +58,96 @@ def test_validate_json(types_to_validate) -> None:
     with pytest.raises(InvalidRequestBodyError) as err:
         validate_json(types_to_validate[5], logger)
     
-    assert "One or more of the following values are missing: " in str(err.value)
\ No newline at end of file
+    assert "One or more of the following values are missing: " in str(err.value)
+
+def test_cursor_round_trip() -> None:
+    """Test that a cursor decodes back to the id it was made from."""
+    for last_id in (1, 42, 2 ** 40):
+        assert decode_cursor(encode_cursor(last_id)) == last_id
+
+
+@pytest.mark.parametrize("raw", ["id:\u00b2", "id:" + "9" * 30, "id:", "pk:1"])
+def test_decode_cursor_rejects_forged_cursors(raw) -> None:
+    """Test that cursors with non-ASCII digits or out-of-range ids are rejected, not passed to int() or the database."""
+    cursor = base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    with pytest.raises(InvalidQueryParameterError):
+        decode_cursor(cursor)
+
+
+def test_parse_page_args() -> None:
+    """Test that pagination parameters are parsed and validated."""
+    assert parse_page_args({}) == (Constants.DEFAULT_PAGE_SIZE, None)
+    assert parse_page_args({"limit": "5", "after": encode_cursor(7)}) == (5, 7)
+
+    for args in ({"limit": "0"}, {"limit": "-1"}, {"after": "garbage!"}):
+        with pytest.raises(InvalidQueryParameterError):
+            parse_page_args(args)
+
+
+def test_get_engine_options(monkeypatch) -> None:
+    """Test that pool settings are read from the environment only when set."""
+    for name in ("SQLALCHEMY_POOL_SIZE", "SQLALCHEMY_MAX_OVERFLOW", "SQLALCHEMY_POOL_TIMEOUT",
+                 "SQLALCHEMY_POOL_RECYCLE", "SQLALCHEMY_POOL_PRE_PING"):
+        monkeypatch.delenv(name, raising=False)
+
+    assert get_engine_options() == {"poolclass": MeteredQueuePool}
+
+    monkeypatch.setenv("SQLALCHEMY_POOL_SIZE", "20")
+    monkeypatch.setenv("SQLALCHEMY_POOL_TIMEOUT", "2.5")
+    monkeypatch.setenv("SQLALCHEMY_POOL_PRE_PING", "true")
+    assert get_engine_options() == {
+        "poolclass": MeteredQueuePool,
+        "pool_size": 20,
+        "pool_timeout": 2.5,
+        "pool_pre_ping": True,
+    }
+
+    monkeypatch.setenv("SQLALCHEMY_MAX_OVERFLOW", "lots")
+    with pytest.raises(InvalidConfigurationError):
+        get_engine_options()
+
+
+def test_validate_json_rejects_oversized_and_unknown_fields() -> None:
+    """Test that long names and extra fields are rejected before reaching the database."""
+    with pytest.raises(InvalidRequestBodyError) as err:
+        validate_json({"name": "x" * 51, "age": 1, "species": "dog", "color": "red"}, logger)
+
+    assert "name must be at most 50 characters" in str(err.value)
+    assert "color is not allowed" in str(err.value)
+
+
+def test_parse_filters() -> None:
+    """Test that list filters are parsed and validated."""
+    assert parse_filters({}) == {}
+    assert parse_filters({"species": "Dog", "min_age": "2", "max_age": "5"}) == {
+        "species": 1, "min_age": 2, "max_age": 5
+    }
+
+    for args in ({"species": "unicorn"}, {"min_age": "-1"}, {"max_age": "old"},
+                 {"min_age": "6", "max_age": "5"}):
+        with pytest.raises(InvalidQueryParameterError):
+            parse_filters(args)
+
+
+@pytest.mark.parametrize("args", [
+    {"min_age": "\u00b2"},
+    {"max_age": "99999999999999999999999"},
+    {"min_age": str(Constants.MAX_AGE + 1)},
+])
+def test_parse_filters_rejects_ages_out_of_range(args) -> None:
+    """Test that ages int() or the database cannot handle get a range error instead of a 500."""
+    with pytest.raises(InvalidQueryParameterError) as err:
+        parse_filters(args)
+
+    assert f"between 0 and {Constants.MAX_AGE}" in str(err.value)
+
+
+def test_percentile() -> None:
+    """Test nearest-rank percentiles, in any sample order."""
+    samples = [5.0, 1.0, 4.0, 2.0, 3.0]
+
+    assert percentile(samples, 50) == 3.0
+    assert percentile(samples, 99) == 5.0
+    assert percentile(samples, 0) == 1.0
+    assert percentile([], 50) == 0.0
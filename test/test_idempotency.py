@@ -0,0 +1,229 @@
+import threading
+import uuid
+
+from http import HTTPStatus
+from unittest import mock
+
+from app import app
+from pets.idempotency import (
+    FULL,
+    IN_FLIGHT,
+    MISMATCH,
+    OWNER,
+    REPLAY,
+    DatabaseIdempotencyStore,
+    IdempotencyKey,
+    MemoryIdempotencyStore,
+    StoredResponse,
+)
+from pets.models import Pet, db
+from test_utilities import use_database
+
+PET = {"name": "Al", "age": 5, "species": "DOG"}
+
+
+def post_pet(client, key, body=PET):
+    return client.post("/pets", json=body, headers={"Idempotency-Key": key})
+
+
+@use_database
+def test_retry_gets_the_first_response() -> None:
+    """Test that a retry with the same key gets the first 201 back without creating another pet."""
+    key = str(uuid.uuid4())
+    with app.test_client() as client:
+        first = post_pet(client, key)
+        with mock.patch.object(Pet, "create_pet", side_effect=AssertionError("ran twice")):
+            retry = post_pet(client, key)
+
+    assert first.status_code == HTTPStatus.CREATED
+    assert retry.status_code == HTTPStatus.CREATED
+    assert retry.get_json() == first.get_json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert "Idempotent-Replayed" not in first.headers
+    assert db.session.query(Pet).count() == 1
+
+
+@use_database
+def test_key_reused_for_a_different_pet() -> None:
+    """Test that reusing a key with a different body gets a 422."""
+    key = str(uuid.uuid4())
+    with app.test_client() as client:
+        assert post_pet(client, key).status_code == HTTPStatus.CREATED
+        response = post_pet(client, key, {**PET, "name": "Bo"})
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+    assert db.session.query(Pet).count() == 1
+
+
+@use_database
+def test_failed_request_can_be_retried() -> None:
+    """Test that the key of a request that failed is forgotten, so a retry runs again."""
+    key = str(uuid.uuid4())
+    with app.test_client() as client:
+        with mock.patch.object(Pet, "create_pet", side_effect=RuntimeError("database is down")):
+            assert post_pet(client, key).status_code == HTTPStatus.BAD_REQUEST
+        response = post_pet(client, key)
+
+    assert response.status_code == HTTPStatus.CREATED
+    assert "Idempotent-Replayed" not in response.headers
+
+
+@use_database
+def test_requests_without_a_key_are_not_deduplicated() -> None:
+    """Test that without the header, every request creates a pet."""
+    with app.test_client() as client:
+        client.post("/pets", json=PET)
+        client.post("/pets", json=PET)
+
+    assert db.session.query(Pet).count() == 2
+
+
+def test_key_too_long() -> None:
+    """Test that an over-long key gets a 400."""
+    with app.test_client() as client:
+        response = post_pet(client, "k" * 256)
+
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+def test_memory_store_in_flight_duplicate_waits() -> None:
+    """Test that a duplicate of a running request waits for it and gets its response."""
+    store = MemoryIdempotencyStore()
+    stored = StoredResponse(201, b'{"pet": {}}', "application/json")
+
+    assert store.begin("k", "f") == (OWNER, None)
+    assert store.begin("k", "f") == (IN_FLIGHT, None)
+
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(store.wait("k", "f", timeout=5)))
+    waiter.start()
+    store.complete("k", stored)
+    waiter.join(5)
+
+    assert results == [(REPLAY, stored)]
+
+
+def test_memory_store_in_flight_duplicate_times_out() -> None:
+    """Test that a duplicate gives up once the wait is over, and a release lets the next one run."""
+    store = MemoryIdempotencyStore()
+    store.begin("k", "f")
+
+    assert store.wait("k", "f", timeout=0.01) == (IN_FLIGHT, None)
+
+    store.release("k")
+    assert store.begin("k", "f") == (OWNER, None)
+
+
+def test_memory_store_expiry_and_eviction() -> None:
+    """Test that keys expire after the TTL, and the oldest finished key makes room for a new one."""
+    now = [0.0]
+    store = MemoryIdempotencyStore(max_entries=2, ttl_seconds=10, clock=lambda: now[0])
+    stored = StoredResponse(201, b"{}", "application/json")
+
+    for key in ("a", "b"):
+        store.begin(key, "f")
+        store.complete(key, stored)
+    store.begin("c", "f")  # evicts "a"
+
+    assert store.begin("a", "f") == (OWNER, None)  # evicts "b"
+    store.complete("a", stored)
+    assert store.begin("b", "g") == (OWNER, None)  # evicts "a"
+
+    store.complete("b", stored)
+    assert store.begin("b", "other") == (MISMATCH, None)
+    now[0] = 11
+    assert store.begin("b", "other") == (OWNER, None)
+
+
+def test_memory_store_keeps_in_flight_keys_when_full() -> None:
+    """Test that running requests' keys are never evicted, and new keys are turned away instead of growing the store."""
+    store = MemoryIdempotencyStore(max_entries=1)
+    store.begin("a", "f")
+
+    assert store.begin("b", "f") == (FULL, None)
+    assert store.begin("a", "f") == (IN_FLIGHT, None)
+    assert len(store._entries) == 1
+
+    store.release("a")
+    assert store.begin("b", "f") == (OWNER, None)
+
+
+@use_database
+def test_full_store_gets_503() -> None:
+    """Test that POST /pets gets a 503, without creating a pet, when the store has no room for its key."""
+    store = MemoryIdempotencyStore(max_entries=1)
+    store.begin("/pets:running", "f")
+
+    with mock.patch.dict(app.extensions, {"idempotency": store}), app.test_client() as client:
+        response = post_pet(client, str(uuid.uuid4()))
+
+    assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert response.headers["Retry-After"] == "1"
+    assert db.session.query(Pet).count() == 0
+
+
+@use_database
+def test_database_store_replays_and_expires() -> None:
+    """Test that the database store claims, replays, detects reuse and expires keys."""
+    now = [1000.0]
+    store = DatabaseIdempotencyStore(ttl_seconds=60, in_flight_seconds=5, clock=lambda: now[0])
+    stored = StoredResponse(201, b'{"pet": {}}', "application/json")
+
+    assert store.begin("k", "f") == (OWNER, None)
+    assert store.begin("k", "f") == (IN_FLIGHT, None)
+    store.complete("k", stored)
+    assert store.begin("k", "f") == (REPLAY, stored)
+    assert store.begin("k", "g") == (MISMATCH, None)
+
+    now[0] += 61
+    store.prune()
+    assert db.session.get(IdempotencyKey, "k") is None
+
+
+@use_database
+def test_database_store_takes_over_abandoned_claims() -> None:
+    """Test that a claim left by a request that never finished is taken over after in_flight_seconds."""
+    now = [1000.0]
+    store = DatabaseIdempotencyStore(in_flight_seconds=5, clock=lambda: now[0])
+    store.begin("k", "f")
+
+    assert store.wait("k", "f", timeout=0) == (IN_FLIGHT, None)
+    now[0] += 6
+    assert store.begin("k", "f") == (OWNER, None)
+    assert db.session.get(IdempotencyKey, "k", populate_existing=True).created_at == now[0]
+
+
+@use_database
+def test_database_store_only_one_request_takes_over_a_claim() -> None:
+    """Test that when two requests find the same abandoned claim, only the first takes it over."""
+    now = [1000.0]
+    store = DatabaseIdempotencyStore(in_flight_seconds=5, clock=lambda: now[0])
+    store.begin("k", "f")
+    now[0] += 6
+    stale = db.session.get(IdempotencyKey, "k")
+    db.session.expunge(stale)
+
+    now[0] += 1
+    assert store.begin("k", "f") == (OWNER, None)
+
+    # Another request read the same stale row before the first took it over.
+    real_get = db.session.get
+    reads = iter([stale])
+    with mock.patch.object(db.session, "get", side_effect=lambda *a, **kw: next(reads, None) or real_get(*a, **kw)):
+        assert store.begin("k", "f") == (IN_FLIGHT, None)
+
+    assert db.session.get(IdempotencyKey, "k", populate_existing=True).created_at == now[0]
+
+
+@use_database
+def test_post_with_database_store() -> None:
+    """Test that POST /pets replays from the database store."""
+    key = str(uuid.uuid4())
+    with mock.patch.dict(app.extensions, {"idempotency": DatabaseIdempotencyStore()}), \
+            app.test_client() as client:
+        first = post_pet(client, key)
+        retry = post_pet(client, key)
+
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.get_json() == first.get_json()
+    assert db.session.query(Pet).count() == 1
@@ -0,0 +1,57 @@
+import json
+
+from datetime import datetime
+
+import pytest
+
+from flask import Flask, jsonify, request
+from flask.json.provider import DefaultJSONProvider
+
+from utils.errors import InvalidConfigurationError
+from utils.json_provider import OrjsonProvider, init_json_provider
+
+orjson = pytest.importorskip("orjson")
+
+
+def make_app(choice: str) -> Flask:
+    app = Flask(__name__)
+    app.config['JSON_PROVIDER'] = choice
+    init_json_provider(app)
+
+    @app.route('/echo', methods=['POST'])
+    def echo():
+        return jsonify(received=request.json, when=datetime(2024, 1, 2, 3, 4, 5))
+
+    return app
+
+
+@pytest.mark.parametrize("choice, provider", [
+    ("auto", OrjsonProvider),
+    ("orjson", OrjsonProvider),
+    ("std", DefaultJSONProvider),
+])
+def test_provider_is_selected_by_config(choice, provider) -> None:
+    assert type(make_app(choice).json) is provider
+
+
+def test_unknown_provider_is_rejected() -> None:
+    with pytest.raises(InvalidConfigurationError):
+        make_app("simplejson")
+
+
+def test_orjson_matches_the_default_provider() -> None:
+    """Test that switching providers does not change what clients receive."""
+    payload = {"pets": [{"name": "Fido", "age": 5, "species": 1, "nick": "Füdo"}], "b": None, "a": 1.5}
+    bodies = []
+
+    for choice in ("orjson", "std"):
+        with make_app(choice).test_client() as client:
+            response = client.post("/echo", json=payload)
+            assert response.status_code == 200
+            assert response.mimetype == "application/json"
+            bodies.append(json.loads(response.data))
+
+    assert bodies[0] == bodies[1]
+    assert bodies[0]["received"] == payload
+    assert bodies[0]["when"] == "Tue, 02 Jan 2024 03:04:05 GMT"
+    assert list(bodies[0]) == sorted(bodies[0])
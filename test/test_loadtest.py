@@ -0,0 +1,48 @@
+import json
+import threading
+
+import pytest
+
+from werkzeug.serving import make_server
+
+from app import app
+from test_utilities import use_database
+from utils.loadtest import parse_mix
+
+
+def test_parse_mix() -> None:
+    """Test that weights are read and zero weights are left out."""
+    assert parse_mix("get_pet=3, create=1,oldest=0") == {"get_pet": 3, "create": 1}
+
+    for value in ("delete=1", "get_pet=lots", "get_pet=0"):
+        with pytest.raises(ValueError):
+            parse_mix(value)
+
+
+@use_database
+@pytest.mark.parametrize("pacing", [[], ["--rate", "50"]])
+def test_loadtest_command(pacing) -> None:
+    """
+    Test that the command loads a live server and reports every operation it sent.
+    One client at a time, since the server shares the test's single connection.
+    """
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+
+    try:
+        result = app.test_cli_runner().invoke(args=[
+            "loadtest", "--url", f"http://127.0.0.1:{server.server_port}",
+            "--mix", "get_pet=1,list_pets=1,oldest=1,create=1",
+            "--concurrency", "1", "--duration", "0.5", "--json", *pacing
+        ])
+    finally:
+        server.shutdown()
+        thread.join()
+
+    assert result.exit_code == 0, result.output
+    summary = json.loads(result.output)
+    assert summary["requests"] > 0
+    assert summary["error_rate"] == 0
+    assert set(summary["operations"]) == {"get_pet", "list_pets", "oldest", "create"}
+    assert summary["operations"]["get_pet"]["p99_ms"] >= summary["operations"]["get_pet"]["p50_ms"]
@@ -0,0 +1,124 @@
+import json
+import logging
+import os
+import queue
+import sys
+
+import pytest
+
+from app import app
+from utils import logging_config
+from utils.logging_config import (
+    JsonFormatter,
+    RequestContextFilter,
+    StructuredQueueHandler,
+    TracebackRateLimitFilter
+)
+
+
+class FakeClock:
+    """A clock that only moves when told to."""
+    def __init__(self) -> None:
+        self.now: float = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_error_record() -> logging.LogRecord:
+    """Make an ERROR record carrying a traceback raised from the same line every time."""
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        return logging.LogRecord("test", logging.ERROR, __file__, 1, "failed: %s", ("boom",), sys.exc_info())
+
+
+def test_json_formatter_keeps_extra_fields_and_traceback() -> None:
+    """Test that records are formatted as JSON with their extra fields."""
+    record = make_error_record()
+    record.request_id = "abc"
+
+    data = json.loads(JsonFormatter().format(record))
+
+    assert data["level"] == "ERROR"
+    assert data["message"] == "failed: boom"
+    assert data["request_id"] == "abc"
+    assert "ValueError: boom" in data["exc_info"]
+
+
+def test_queue_handler_leaves_traceback_for_the_listener() -> None:
+    """Test that prepare() merges the message but does not format the traceback."""
+    records = queue.SimpleQueue()
+    record = make_error_record()
+    record.route = "/pets"
+
+    StructuredQueueHandler(records).handle(record)
+    queued = records.get_nowait()
+
+    assert queued.msg == "failed: boom" and queued.args is None
+    assert queued.exc_info is not None and queued.exc_text is None
+    assert queued.route == "/pets"
+
+
+def test_repeated_tracebacks_are_rate_limited() -> None:
+    """Test that only `limit` copies of a traceback are kept per window."""
+    clock = FakeClock()
+    limiter = TracebackRateLimitFilter(limit=2, window_seconds=10, clock=clock)
+
+    records = [make_error_record() for _ in range(5)]
+    assert all(limiter.filter(record) for record in records)
+
+    assert [record.exc_info is not None for record in records] == [True, True, False, False, False]
+    assert [getattr(record, "traceback_suppressed", False) for record in records] == [False, False, True, True, True]
+    assert records[4].getMessage() == "failed: boom"
+
+    clock.now = 10
+    record = make_error_record()
+    limiter.filter(record)
+    assert record.exc_info is not None
+    assert record.tracebacks_dropped == 3
+    assert not hasattr(record, "traceback_suppressed")
+
+
+def test_request_ids() -> None:
+    """Test that a plain X-Request-ID is reused and anything else is replaced."""
+    with app.test_client() as client:
+        response = client.get("/metrics", headers={"X-Request-ID": "req-123"})
+        assert response.headers["X-Request-ID"] == "req-123"
+
+        response = client.get("/metrics", headers={"X-Request-ID": "bad id\"}"})
+        assert response.headers["X-Request-ID"] != "bad id\"}"
+        assert len(response.headers["X-Request-ID"]) == 32
+
+
+def test_request_context_filter() -> None:
+    """Test that records logged during a request carry its id and route."""
+    record = logging.makeLogRecord({"msg": "hello"})
+
+    with app.test_request_context("/pets/1", headers={"X-Request-ID": "req-9"}):
+        app.preprocess_request()
+        RequestContextFilter().filter(record)
+
+    assert record.request_id == "req-9"
+    assert record.route == "/pets/<int:id>"
+    assert record.method == "GET"
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_forked_child_still_logs() -> None:
+    """Test that records logged in a forked child are written, not left in a queue with no thread."""
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:  # the child
+        os.close(read_end)
+        logging_config._listener.handlers[0].setStream(os.fdopen(write_end, "w"))
+        logging.getLogger("fork-test").error("from the child")
+        logging_config.stop_logging()  # writes whatever is still queued
+        os._exit(0)
+
+    os.close(write_end)
+    with os.fdopen(read_end) as output:
+        written = output.read()
+    os.waitpid(pid, 0)
+
+    assert "from the child" in written
@@ -0,0 +1,102 @@
+import threading
+
+import pytest
+
+from flask import Flask
+
+from app import app
+from utils.errors import InvalidConfigurationError
+from utils.helpers import get_float_list_env
+from utils.metrics import MetricsRegistry, gauges, init_metrics
+
+
+def test_histogram_buckets_are_cumulative() -> None:
+    """Test that each bucket counts every observation at or below its bound."""
+    registry = MetricsRegistry(buckets=[0.1, 1])
+    for seconds in (0.05, 0.1, 0.5, 2):
+        registry.observe_request("/pets", "GET", 200, seconds)
+
+    text = registry.render()
+
+    assert 'http_requests_total{route="/pets",method="GET",status="200"} 4' in text
+    assert 'http_request_duration_seconds_bucket{route="/pets",method="GET",le="0.1"} 2' in text
+    assert 'http_request_duration_seconds_bucket{route="/pets",method="GET",le="1"} 3' in text
+    assert 'http_request_duration_seconds_bucket{route="/pets",method="GET",le="+Inf"} 4' in text
+    assert 'http_request_duration_seconds_count{route="/pets",method="GET"} 4' in text
+    assert 'http_request_duration_seconds_sum{route="/pets",method="GET"} 2.65' in text
+
+
+def test_registry_is_thread_safe() -> None:
+    """Test that no observations are lost when many threads record at once."""
+    registry = MetricsRegistry()
+
+    def record() -> None:
+        for _ in range(1000):
+            registry.observe_request("/pets", "GET", 200, 0.001)
+
+    threads = [threading.Thread(target=record) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert 'http_requests_total{route="/pets",method="GET",status="200"} 8000' in registry.render()
+
+
+def test_collectors_and_gauges() -> None:
+    """Test that collector lines are appended to the output, with totals typed as counters."""
+    registry = MetricsRegistry()
+    registry.register_collector(lambda: gauges("pet_cache", {"hits": 3, "ratio": 0.5}, counters=("hits",)))
+
+    text = registry.render()
+
+    assert "# TYPE pet_cache_hits counter\npet_cache_hits 3\n" in text
+    assert "# TYPE pet_cache_ratio gauge\npet_cache_ratio 0.5\n" in text
+
+
+def test_unhandled_exceptions_are_counted_as_500() -> None:
+    """Test that a request whose exception propagates past Flask is still counted."""
+    failing = Flask(__name__)
+    failing.config["PROPAGATE_EXCEPTIONS"] = True
+    init_metrics(failing)
+
+    @failing.route("/boom")
+    def boom():
+        raise RuntimeError("boom")
+
+    with failing.test_client() as client:
+        with pytest.raises(RuntimeError):
+            client.get("/boom")
+        text = client.get("/metrics").get_data(as_text=True)
+
+    assert 'http_requests_total{route="/boom",method="GET",status="500"} 1' in text
+
+
+def test_metrics_endpoint_labels_requests_by_route() -> None:
+    """Test that requests are counted under their URL rule, not their path."""
+    with app.test_client() as client:
+        client.get("/pets/123456789")
+        response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain; version=0.0.4")
+    text = response.get_data(as_text=True)
+    assert 'http_requests_total{route="/pets/<int:id>",method="GET",status="404"}' in text
+    assert "/pets/123456789" not in text
+    assert "# TYPE db_pool_checkouts counter" in text
+    assert "# TYPE db_pool_wait_seconds_max gauge" in text
+    assert "# TYPE pet_cache_hits counter" in text
+
+
+def test_get_float_list_env(monkeypatch) -> None:
+    """Test that bucket lists are parsed, sorted and validated."""
+    monkeypatch.delenv("METRICS_BUCKETS", raising=False)
+    assert get_float_list_env("METRICS_BUCKETS", None) is None
+
+    monkeypatch.setenv("METRICS_BUCKETS", "1, 0.1,0.5")
+    assert get_float_list_env("METRICS_BUCKETS", None) == [0.1, 0.5, 1.0]
+
+    for value in ("0.1,fast", "0,1"):
+        monkeypatch.setenv("METRICS_BUCKETS", value)
+        with pytest.raises(InvalidConfigurationError):
+            get_float_list_env("METRICS_BUCKETS", None)
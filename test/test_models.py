@@ -4,8 +4,8 @@ from unittest import mock
 import pytest
 
 from app import app
-from pets.models import Pet, connect_db
-from pets.pets import Dog
+from pets.models import Pet, connect_db, get_pet_cache, get_stats_cache
+from pets.pets import Bird, Cat, Dog
 from test_utilities import use_database
 from utils.errors import DatabaseNotConnectedError
 from utils.helpers import configure_app
@@ -246,3 +246,166 @@ def test_sub() -> None:
     pet2 = Pet(name="Fido", age=10, species=1)
     assert pet2 - pet1 == 5
     assert pet1 - pet2 == -5
+
+
+@use_database
+def test_get_pets_page(valid_pets) -> None:
+    """Test that pets are paged by id with a cursor to the next page."""
+    for animal in valid_pets:
+        Pet.create_pet(animal)
+
+    first_page, last_id = Pet.get_pets_page(2)
+    assert [p.name for p in first_page] == ["Fido", "Garfield"]
+    assert last_id == first_page[-1].id
+
+    second_page, last_id = Pet.get_pets_page(2, after=last_id)
+    assert [p.name for p in second_page] == ["Tweety"]
+    assert last_id is None
+
+
+@use_database
+def test_get_oldest_pets_breaks_ties_by_id() -> None:
+    """Test that the k oldest pets come back oldest first, ties ordered by id."""
+    for name, age in (("A", 3), ("B", 7), ("C", 7), ("D", 1), ("E", 5)):
+        Pet.create_pet(Dog(name, age))
+
+    assert [p.name for p in Pet.get_oldest_pets(3)] == ["B", "C", "E"]
+    assert [p.name for p in Pet.get_oldest_pets(10)] == ["B", "C", "E", "A", "D"]
+    assert Pet.get_oldest_pet().name == "B"
+
+
+def test_oldest_pets_index_exists() -> None:
+    """Test that the pets table has an index to serve the oldest pets query."""
+    assert "ix_pets_age_desc_id" in {index.name for index in Pet.__table__.indexes}
+
+
+@use_database
+def test_create_pets_in_bulk(valid_pets) -> None:
+    """Test that many pets can be created at once, in order."""
+    ids = Pet.create_pets(valid_pets * 3, chunk_size=2)
+
+    assert len(ids) == 9
+    assert ids == sorted(ids)
+    assert [Pet.get_one_pet(i).name for i in ids[:3]] == ["Fido", "Garfield", "Tweety"]
+    assert Pet.query.count() == 9
+
+
+@use_database
+def test_create_pets_in_bulk_is_all_or_nothing(valid_pets, invalid_pets) -> None:
+    """Test that no pets are written if any of them is invalid."""
+    with pytest.raises(TypeError):
+        Pet.create_pets(valid_pets + invalid_pets)
+
+    assert Pet.query.count() == 0
+
+
+@use_database
+def test_get_one_pet_dict_reads_through_cache(valid_pets) -> None:
+    """Test that pets and missing ids are cached, and creating a pet invalidates its id."""
+    pet_cache = get_pet_cache()
+    pet_cache.configure(max_entries=10, ttl_seconds=60)
+    try:
+        assert Pet.get_one_pet_dict(1) is None
+        assert pet_cache.get(1) == (True, None)
+
+        Pet.create_pet(valid_pets[0])
+        assert pet_cache.get(1) == (False, None)
+
+        assert Pet.get_one_pet_dict(1)["name"] == "Fido"
+        with mock.patch("pets.models.db") as mock_db:
+            assert Pet.get_one_pet_dict(1)["name"] == "Fido"
+            mock_db.session.get.assert_not_called()
+    finally:
+        pet_cache.configure(max_entries=0, ttl_seconds=60)
+
+
+@use_database
+def test_get_pet_rows_page(valid_pets) -> None:
+    """Test that pages of plain dictionaries hold only the requested fields."""
+    for animal in valid_pets:
+        Pet.create_pet(animal)
+
+    rows, last_id = Pet.get_pet_rows_page(2)
+    assert rows == [p.to_dict() for p in Pet.get_pets_page(2)[0]]
+    assert last_id == rows[-1]["id"]
+
+    rows, last_id = Pet.get_pet_rows_page(2, after=last_id, fields=("name", "age"))
+    assert rows == [{"name": "Tweety", "age": 1}]
+    assert last_id is None
+
+
+@use_database
+def test_iter_pet_batches_selects_fields(valid_pets) -> None:
+    """Test that streamed batches hold only the requested fields."""
+    Pet.create_pets(valid_pets)
+
+    batches = list(Pet.iter_pet_batches(batch_size=2, fields=("name",)))
+    assert batches == [[{"name": "Fido"}, {"name": "Garfield"}], [{"name": "Tweety"}]]
+
+
+@use_database
+def test_get_pet_rows_page_filters() -> None:
+    """Test that pages can be filtered by species and an inclusive age range."""
+    Pet.create_pets([Dog("A", 1), Cat("B", 3), Dog("C", 5), Dog("D", 9), Bird("E", 5)])
+
+    rows, _ = Pet.get_pet_rows_page(10, fields=("name",), species=1)
+    assert rows == [{"name": "A"}, {"name": "C"}, {"name": "D"}]
+
+    rows, _ = Pet.get_pet_rows_page(10, fields=("name",), species=1, min_age=2, max_age=5)
+    assert rows == [{"name": "C"}]
+
+    rows, _ = Pet.get_pet_rows_page(10, fields=("name",), min_age=5)
+    assert rows == [{"name": "C"}, {"name": "D"}, {"name": "E"}]
+
+
+def test_species_age_index_exists() -> None:
+    """Test that the pets table has an index to serve the list filters."""
+    assert "ix_pets_species_age" in {index.name for index in Pet.__table__.indexes}
+
+
+@use_database
+def test_get_stats() -> None:
+    """Test that counts, ages and the histogram are computed per species."""
+    Pet.create_pets([Dog("A", 1), Dog("B", 4), Cat("C", 6), Cat("D", 12), Bird("E", 5)])
+
+    stats = Pet.get_stats(bucket_width=5)
+
+    assert stats["total"] == 5
+    assert (stats["min_age"], stats["max_age"], stats["avg_age"]) == (1, 12, 5.6)
+    assert stats["species"] == {
+        "DOG": {"count": 2, "min_age": 1, "max_age": 4, "avg_age": 2.5},
+        "CAT": {"count": 2, "min_age": 6, "max_age": 12, "avg_age": 9.0},
+        "BIRD": {"count": 1, "min_age": 5, "max_age": 5, "avg_age": 5.0},
+    }
+    assert stats["age_histogram"] == [
+        {"min_age": 0, "max_age": 4, "count": 2},
+        {"min_age": 5, "max_age": 9, "count": 2},
+        {"min_age": 10, "max_age": 14, "count": 1},
+    ]
+
+
+@use_database
+def test_get_stats_on_empty_table() -> None:
+    """Test that stats work without any pets."""
+    stats = Pet.get_stats()
+
+    assert stats["total"] == 0
+    assert stats["avg_age"] is None
+    assert stats["species"] == {}
+    assert stats["age_histogram"] == []
+
+
+@use_database
+def test_get_stats_is_cached(valid_pets) -> None:
+    """Test that stats are served from the cache while it is enabled."""
+    stats_cache = get_stats_cache()
+    stats_cache.configure(max_entries=4, ttl_seconds=60)
+    try:
+        Pet.create_pets(valid_pets)
+        assert Pet.get_stats()["total"] == 3
+
+        Pet.create_pets(valid_pets)
+        assert Pet.get_stats()["total"] == 3
+        assert Pet.get_stats(bucket_width=2)["total"] == 6
+    finally:
+        stats_cache.configure(max_entries=0, ttl_seconds=0)
@@ -0,0 +1,56 @@
+import time
+
+import pytest
+
+from sqlalchemy import create_engine, event, exc
+
+from utils.pool import MeteredQueuePool, pool_metrics
+
+
+def test_metered_pool_records_checkouts_and_timeouts(tmp_path) -> None:
+    """Test that checkouts, checkins and timeouts are counted."""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=MeteredQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.01
+    )
+    pool_metrics.reset()
+
+    connection = engine.connect()
+    stats = pool_metrics.snapshot(engine.pool)
+    assert stats["checkouts"] == 1
+    assert stats["connects"] == 1
+    assert stats["checked_out"] == 1
+
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+
+    connection.close()
+    stats = pool_metrics.snapshot(engine.pool)
+    assert stats["timeouts"] == 1
+    assert stats["checkins"] == 1
+    assert stats["checked_out"] == 0
+    assert stats["wait_seconds_max"] >= 0.01
+
+    engine.dispose()
+
+
+def test_wait_does_not_include_opening_connections(tmp_path) -> None:
+    """Test that a slow connect is not counted as time spent waiting for the pool."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=MeteredQueuePool, pool_size=1)
+    pool_metrics.reset()
+
+    @event.listens_for(engine, "connect")
+    def slow_connect(*args) -> None:
+        time.sleep(0.05)
+
+    engine.connect().close()
+    stats = pool_metrics.snapshot(engine.pool)
+
+    assert stats["connects"] == 1
+    assert stats["checkouts"] == 1
+    assert stats["wait_seconds_max"] < 0.05
+
+    engine.dispose()
@@ -0,0 +1,54 @@
+import logging
+
+from flask import Response
+
+from animals.animal_factory import AnimalFactory
+from app import app
+from pets.models import Pet
+from test_utilities import use_database
+from utils.query_stats import add_query_headers, describe_parameters, request_query_stats
+
+
+def test_describe_parameters() -> None:
+    """Test that only the shape of the parameters is described, not the values."""
+    assert describe_parameters({"species": "dog", "age": 3}) == "{age, species}"
+    assert describe_parameters(("dog", 3)) == "2 positional"
+    assert describe_parameters([{"name": "a"}, {"name": "b"}], executemany=True) == "2 rows of {name}"
+    assert describe_parameters(None) == "none"
+
+
+def test_queries_are_counted_per_request(pooled_app) -> None:
+    """Test that the statements sent while handling a request are counted for it."""
+    with pooled_app.test_request_context("/pets"):
+        assert request_query_stats() == {"count": 0, "seconds": 0.0}
+
+        Pet.get_pet_rows_page(10, None)
+        Pet.get_pet_rows_page(10, None)
+
+        stats = request_query_stats()
+        assert stats["count"] == 2
+        assert stats["seconds"] > 0
+
+        response = add_query_headers(Response())
+        assert response.headers["X-DB-Query-Count"] == "2"
+        assert float(response.headers["X-DB-Time"]) > 0
+
+
+@use_database
+def test_slow_queries_are_logged(caplog) -> None:
+    """Test that statements over the threshold are logged without their values."""
+    query_stats = app.extensions["query_stats"]
+    threshold = query_stats.slow_threshold_seconds
+    query_stats.slow_threshold_seconds = 1e-9
+    before = query_stats.snapshot()["slow_queries"]
+
+    try:
+        with caplog.at_level(logging.WARNING, logger="utils.query_stats"):
+            Pet.create_pet(AnimalFactory().create_animal(name="Secret", age=3, species="dog"))
+    finally:
+        query_stats.slow_threshold_seconds = threshold
+
+    assert query_stats.snapshot()["slow_queries"] > before
+    assert "Slow query" in caplog.text
+    assert "INSERT INTO pets" in caplog.text
+    assert "Secret" not in caplog.text
@@ -0,0 +1,42 @@
+from utils.helpers import PET_SCHEMA
+from utils.schema import Field, Schema
+
+
+def test_schema_accepts_valid_payload() -> None:
+    """Test that a valid pet has no errors."""
+    assert PET_SCHEMA.validate({"name": "Fido", "age": 5, "species": "dog"}) == []
+
+
+def test_schema_reports_every_error() -> None:
+    """Test that all problems are reported at once, not just the first."""
+    errors = PET_SCHEMA.validate({"name": "x" * 51, "age": True, "color": "brown"})
+
+    assert {(e["field"], e["code"]) for e in errors} == {
+        ("name", "invalid"),
+        ("age", "type"),
+        ("species", "missing"),
+        ("color", "unknown"),
+    }
+
+
+def test_schema_checks_ranges() -> None:
+    """Test that numbers outside of the allowed range are rejected."""
+    schema = Schema(count=Field(int, min_value=0, max_value=10), note=Field(str, required=False))
+
+    assert schema.validate({"count": 10}) == []
+    assert schema.validate({"count": -1})[0]["code"] == "invalid"
+    assert schema.validate({"count": 11})[0]["code"] == "invalid"
+    assert schema.validate({"count": 1, "note": 3})[0]["field"] == "note"
+
+
+def test_schema_validates_many() -> None:
+    """Test that a list of payloads is validated in one call, in order."""
+    results = PET_SCHEMA.validate_many([
+        {"name": "Fido", "age": 5, "species": "dog"},
+        "not an object",
+        {"name": "Tom", "age": "5", "species": "cat"},
+    ])
+
+    assert results[0] == []
+    assert results[1][0]["field"] == "body"
+    assert results[2][0]["field"] == "age"
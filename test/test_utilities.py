@@ -1,16 +1,102 @@
+from contextlib import contextmanager
 from functools import wraps
-from typing import Callable
+from typing import Callable, Iterator
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session, scoped_session, sessionmaker
 
 from app import app
 from pets.models import db
 
 
+def enable_sqlite_savepoints(engine: Engine) -> None:
+    """
+    Let SAVEPOINT work with the pysqlite driver. It starts transactions
+    itself, and too late for SAVEPOINTs, so that is turned off and
+    SQLAlchemy emits BEGIN instead. Other databases are left alone.
+    See "Serializable isolation / Savepoints / Transactional DDL" in
+    SQLAlchemy's SQLite dialect docs.
+
+    Connections opened before this is called are closed, so every
+    connection from now on gets the fix.
+    """
+    if engine.dialect.name != "sqlite" or event.contains(engine, "begin", _emit_begin):
+        return
+
+    event.listen(engine, "connect", _disable_pysqlite_transactions)
+    event.listen(engine, "begin", _emit_begin)
+    engine.dispose()
+
+def _disable_pysqlite_transactions(dbapi_connection, connection_record) -> None:
+    dbapi_connection.isolation_level = None
+
+def _emit_begin(connection: Connection) -> None:
+    connection.exec_driver_sql("BEGIN")
+
+def reset_sequences(connection: Connection) -> None:
+    """
+    Restart the id sequences, which a rollback does not undo on Postgres
+    or MySQL, so every test's first pet gets id 1 as it does on SQLite.
+    Only safe while the tables are empty.
+    """
+    for table in db.metadata.sorted_tables:
+        column = table.autoincrement_column
+        if column is None:
+            continue
+
+        if connection.dialect.name == "postgresql":
+            connection.execute(
+                text("SELECT setval(pg_get_serial_sequence(:table, :column), 1, false)"),
+                {"table": table.name, "column": column.name}
+            )
+        elif connection.dialect.name in ("mysql", "mariadb"):
+            connection.exec_driver_sql(f"ALTER TABLE {table.name} AUTO_INCREMENT = 1")
+
+    connection.commit()
+
+def create_schema() -> None:
+    """Create the tables from scratch, once per test session."""
+    with app.app_context():
+        enable_sqlite_savepoints(db.engine)
+        db.drop_all()
+        db.create_all()
+
+@contextmanager
+def rolled_back_session() -> Iterator[scoped_session]:
+    """
+    Run the body against a transaction that is rolled back at the end,
+    so nothing a test writes is seen by the next one.
+
+    db.session is swapped for a session bound to one connection in an
+    open transaction. Its commits and rollbacks only release or roll
+    back SAVEPOINTs inside that transaction, so code under test can
+    commit as usual. Id sequences are restarted afterwards, so tests
+    can rely on ids starting at 1 on every database. Needs an app context.
+    """
+    connection: Connection = db.engine.connect()
+    transaction = connection.begin()
+    # A plain Session, since Flask-SQLAlchemy's picks the engine itself and ignores `bind`.
+    session: scoped_session = scoped_session(sessionmaker(
+        bind=connection, class_=Session, join_transaction_mode="create_savepoint"
+    ))
+
+    original: scoped_session = db.session
+    db.session = session
+    try:
+        yield session
+    finally:
+        db.session = original
+        session.remove()
+        transaction.rollback()
+        if connection.dialect.name != "sqlite":
+            reset_sequences(connection)
+        connection.close()
+
 def use_database(func: Callable) -> Callable:
-    """Decorator that clears the database before each test."""
+    """Decorator that runs the test in a transaction that is rolled back afterwards."""
     @wraps(func)
     def wrapper(*args, **kwargs):
-        with app.app_context():
-            db.drop_all()
-            db.create_all()
+        with app.app_context(), rolled_back_session():
             func(*args, **kwargs)
     return wrapper
@@ -0,0 +1,144 @@
+import time
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from unittest import mock
+
+import pytest
+
+from animals.other_animals import Lion
+from app import app
+from pets.models import Pet
+from pets.pets import Dog
+from pets.writer import GroupCommitWriter
+from test_utilities import use_database
+
+
+@use_database
+def test_concurrent_pets_share_a_commit() -> None:
+    """Test that pets from many threads are written in a few batches, each getting its own id."""
+    writer = GroupCommitWriter(app, max_batch=10, max_delay_seconds=0.05)
+
+    try:
+        with ThreadPoolExecutor(max_workers=25) as pool:
+            ids = list(pool.map(lambda i: writer.create_pet(Dog(f"Dog{i}", i), timeout=5), range(25)))
+    finally:
+        writer.stop(timeout=5)
+
+    assert sorted(ids) == list(range(1, 26))
+    for i, id in enumerate(ids):
+        assert Pet.get_one_pet(id).name == f"Dog{i}"
+
+    stats = writer.stats()
+    assert stats["pets"] == 25
+    assert stats["batches"] < 25
+    assert stats["largest_batch"] <= 10
+
+
+@use_database
+def test_batch_failure_reaches_every_request() -> None:
+    """Test that when no pet of a batch can be written, each of its requests gets the error."""
+    writer = GroupCommitWriter(app, max_batch=10, max_delay_seconds=0.05)
+
+    try:
+        with mock.patch("pets.writer.Pet.create_pets", side_effect=Exception("Mocked exception")):
+            futures = [writer.submit(Dog(f"Dog{i}", i)) for i in range(3)]
+            for future in futures:
+                with pytest.raises(Exception, match="Mocked exception"):
+                    future.result(timeout=5)
+    finally:
+        writer.stop(timeout=5)
+
+
+@use_database
+def test_one_bad_pet_fails_only_its_own_request() -> None:
+    """Test that when one pet breaks its batch, the others are still written."""
+    writer = GroupCommitWriter(app, max_batch=10, max_delay_seconds=0.05)
+    create_pets = Pet.create_pets
+
+    def fail_on_bad(pets):
+        if any(pet.name == "Bad" for pet in pets):
+            raise Exception("Mocked exception")
+        return create_pets(pets)
+
+    try:
+        with mock.patch("pets.writer.Pet.create_pets", side_effect=fail_on_bad):
+            futures = [writer.submit(Dog(name, 1)) for name in ("Al", "Bad", "Bo")]
+            with pytest.raises(Exception, match="Mocked exception"):
+                futures[1].result(timeout=5)
+            ids = [futures[0].result(timeout=5), futures[2].result(timeout=5)]
+    finally:
+        writer.stop(timeout=5)
+
+    assert [Pet.get_one_pet(id).name for id in ids] == ["Al", "Bo"]
+    assert writer.stats()["pets"] == 2
+
+
+def test_invalid_pets_are_rejected_before_queueing() -> None:
+    """Test that a pet that cannot be saved fails straight away."""
+    writer = GroupCommitWriter(app)
+
+    with pytest.raises(TypeError):
+        writer.submit(Lion("Simba", 5))
+
+    assert writer.stats()["queued"] == 0
+
+
+@use_database
+def test_create_pet_route_uses_group_commit(monkeypatch) -> None:
+    """Test that POST /pets goes through the writer when group commit is on."""
+    writer = GroupCommitWriter(app, max_batch=10, max_delay_seconds=0.001)
+    monkeypatch.setitem(app.extensions, "group_commit", writer)
+
+    try:
+        with app.test_client() as client:
+            response = client.post("/pets", json={"name": "Tom", "age": 5, "species": "dog"})
+    finally:
+        writer.stop(timeout=5)
+
+    assert response.status_code == 201
+    assert response.json["pet"] == {"id": 1, "name": "Tom", "age": 5, "species": 1}
+    assert writer.stats()["pets"] == 1
+    assert Pet.get_one_pet(1).name == "Tom"
+
+
+def test_create_pet_route_timeout_suggests_an_idempotency_key(monkeypatch) -> None:
+    """Test that a request whose batch is not committed in time gets a 503 saying how to retry safely."""
+    writer = mock.Mock(spec=GroupCommitWriter)
+    writer.submit.return_value = Future()  # never written
+    monkeypatch.setitem(app.extensions, "group_commit", writer)
+    monkeypatch.setitem(app.config, "GROUP_COMMIT_TIMEOUT_SECONDS", 0.01)
+
+    with app.test_client() as client:
+        response = client.post("/pets", json={"name": "Tom", "age": 5, "species": "dog"})
+
+    assert response.status_code == 503
+    assert "may still be saved" in response.json["error"]
+    assert "Idempotency-Key" in response.json["error"]
+
+
+@use_database
+def test_retry_after_timeout_gets_the_queued_pet(monkeypatch) -> None:
+    """Test that the Idempotency-Key stays claimed until a timed out pet is written, so a retry does not create another."""
+    writer = GroupCommitWriter(app, max_batch=10, max_delay_seconds=0.001)
+    monkeypatch.setitem(app.extensions, "group_commit", writer)
+    monkeypatch.setitem(app.config, "GROUP_COMMIT_TIMEOUT_SECONDS", 0.05)
+    create_pets = Pet.create_pets
+
+    def slow_create_pets(pets):
+        time.sleep(0.3)
+        return create_pets(pets)
+
+    headers = {"Idempotency-Key": "abc"}
+    body = {"name": "Tom", "age": 5, "species": "dog"}
+    try:
+        with mock.patch("pets.writer.Pet.create_pets", side_effect=slow_create_pets), app.test_client() as client:
+            first = client.post("/pets", json=body, headers=headers)
+            retry = client.post("/pets", json=body, headers=headers)
+    finally:
+        writer.stop(timeout=5)
+
+    assert first.status_code == 503
+    assert retry.status_code == 201
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json["pet"]["id"] == 1
+    assert writer.stats()["pets"] == 1
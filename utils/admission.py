@@ -0,0 +1,300 @@
+import logging
+import math
+import threading
+import time
+
+from collections import OrderedDict
+from http import HTTPStatus
+from logging import Logger
+from typing import Callable, Dict, List, Optional, Tuple
+
+from flask import Flask, Response, current_app, g, jsonify, request
+
+logger: Logger = logging.getLogger(__name__)
+
+# Requests with these methods count as reads. Everything else is a write.
+READ_METHODS: Tuple[str, ...] = ("GET", "HEAD", "OPTIONS")
+
+# Endpoints that are never limited, so the app can be watched while it is shedding load.
+EXEMPT_ENDPOINTS: Tuple[str, ...] = ("metrics", "static")
+
+
+class ConcurrencyLimiter:
+    """
+    Lets at most `limit` requests run at once. Up to `max_queue` more wait
+    for a slot, each for at most `timeout_seconds`. Anything beyond that is
+    turned away straight away, so a spike gets fast errors instead of a
+    growing queue of requests that will time out anyway.
+
+    Attributes:
+        limit - int: The most requests that run at once.
+        max_queue - int: The most requests that wait for a slot.
+        timeout_seconds - float: The longest a request waits for a slot.
+    """
+    def __init__(self, limit: int, max_queue: int = 0, timeout_seconds: float = 0.0) -> None:
+        self.limit: int = limit
+        self.max_queue: int = max_queue
+        self.timeout_seconds: float = timeout_seconds
+        self._condition: threading.Condition = threading.Condition()
+        self._active: int = 0
+        self._waiting: int = 0
+        self._admitted: int = 0
+        self._rejected: int = 0
+        self._timed_out: int = 0
+
+    def acquire(self) -> bool:
+        """
+        Take a slot, waiting for one if the queue has room.
+
+        @return bool: Whether a slot was taken. If so, release() must be called.
+        """
+        with self._condition:
+            if self._active < self.limit and self._waiting == 0:
+                return self._admit()
+
+            if self._waiting >= self.max_queue:
+                self._rejected += 1
+                return False
+
+            self._waiting += 1
+            try:
+                deadline: float = time.monotonic() + self.timeout_seconds
+                while self._active >= self.limit:
+                    remaining: float = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timed_out += 1
+                        # A release() may have woken this waiter just as it gave up.
+                        # Pass the wakeup on, so a free slot does not go unnoticed.
+                        self._condition.notify()
+                        return False
+                    self._condition.wait(remaining)
+            finally:
+                self._waiting -= 1
+
+            return self._admit()
+
+    def release(self) -> None:
+        with self._condition:
+            self._active -= 1
+            self._condition.notify()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the limiter's counters, for monitoring.
+        """
+        with self._condition:
+            return {
+                "limit": self.limit,
+                "active": self._active,
+                "waiting": self._waiting,
+                "admitted": self._admitted,
+                "rejected": self._rejected,
+                "timed_out": self._timed_out,
+            }
+
+    def _admit(self) -> bool:
+        # Called with the lock held.
+        self._active += 1
+        self._admitted += 1
+        return True
+
+
+class RateLimiter:
+    """
+    A token bucket per client. Each bucket holds up to `burst` tokens and
+    refills at `rate` tokens a second, and each request takes one.
+
+    Only the `max_clients` most recently seen clients are remembered, so a
+    flood of new client keys cannot use up memory. A forgotten client
+    starts again with a full bucket.
+
+    Attributes:
+        rate - float: Requests per second allowed per client, on average.
+        burst - float: Requests a client can send at once after being idle.
+        max_clients - int: The most clients remembered.
+    """
+    def __init__(
+            self,
+            rate: float,
+            burst: float,
+            max_clients: int = 10000,
+            clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.rate: float = rate
+        self.burst: float = burst
+        self.max_clients: int = max_clients
+        self._clock: Callable[[], float] = clock
+        self._buckets: OrderedDict[str, Tuple[float, float]] = OrderedDict()  # client -> (tokens, updated at)
+        self._lock: threading.Lock = threading.Lock()
+        self._limited: int = 0
+
+    def acquire(self, client: str) -> float:
+        """
+        Take a token from the client's bucket.
+
+        @param client - str: Identifies the client.
+
+        @return float: 0 if the request may go ahead, otherwise how many
+        seconds until the client has a token again.
+        """
+        with self._lock:
+            now: float = self._clock()
+            tokens, updated_at = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+
+            wait: float = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate
+                self._limited += 1
+
+            self._buckets[client] = (tokens, now)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+
+            return wait
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the limiter's counters, for monitoring.
+        """
+        with self._lock:
+            return {"clients": len(self._buckets), "limited": self._limited}
+
+
+class AdmissionController:
+    """
+    Decides whether each request may run: first the client's rate limit,
+    then a concurrency slot for reads or for writes. Either limit can be
+    left out by passing None.
+    """
+    def __init__(
+            self,
+            reads: Optional[ConcurrencyLimiter] = None,
+            writes: Optional[ConcurrencyLimiter] = None,
+            rate_limiter: Optional[RateLimiter] = None,
+            client_header: str = '',
+            retry_after_seconds: int = 1
+    ) -> None:
+        self.reads: Optional[ConcurrencyLimiter] = reads
+        self.writes: Optional[ConcurrencyLimiter] = writes
+        self.rate_limiter: Optional[RateLimiter] = rate_limiter
+        self.client_header: str = client_header
+        self.retry_after_seconds: int = retry_after_seconds
+
+    def client_key(self) -> str:
+        """
+        Identify the current request's client, by the configured header
+        if it was sent, otherwise by its address.
+
+        NOTE: The header is taken as given, so it must be set by a gateway
+        that overwrites whatever the client sent. Otherwise a client can
+        send a new value with every request to get a full bucket each time.
+        Behind proxies, the address is the last proxy's unless TRUSTED_PROXIES
+        is set, see create_app.
+        """
+        if self.client_header:
+            key: Optional[str] = request.headers.get(self.client_header)
+            if key:
+                return key
+
+        return request.remote_addr or "unknown"
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get every limiter's counters, for monitoring.
+        """
+        stats: Dict[str, int] = {}
+        for name, limiter in (("reads", self.reads), ("writes", self.writes), ("rate", self.rate_limiter)):
+            if limiter is not None:
+                stats.update({f"{name}_{key}": value for key, value in limiter.stats().items()})
+
+        return stats
+
+
+def retry_after(seconds: float) -> str:
+    """
+    Format a Retry-After header, which takes whole seconds.
+    """
+    return str(max(1, math.ceil(seconds)))
+
+def admit() -> Optional[Tuple[Response, int, Dict[str, str]]]:
+    """
+    before_request hook: turn the request away with a 429 if its client is
+    over its rate limit, or a 503 if its route class is saturated.
+    """
+    controller: AdmissionController = current_app.extensions['admission']
+    if request.endpoint in EXEMPT_ENDPOINTS:
+        return None
+
+    if controller.rate_limiter is not None:
+        wait: float = controller.rate_limiter.acquire(controller.client_key())
+        if wait > 0:
+            return jsonify(error="Too many requests, slow down"), HTTPStatus.TOO_MANY_REQUESTS, \
+                {"Retry-After": retry_after(wait)}
+
+    limiter: Optional[ConcurrencyLimiter] = \
+        controller.reads if request.method in READ_METHODS else controller.writes
+    if limiter is None:
+        return None
+
+    if not limiter.acquire():
+        # Not a warning: under a spike this is every other request. The counters are in /metrics.
+        logger.debug("utils/admission.py::admit: Shedding %s %s, the server is saturated",
+                     request.method, request.path)
+        return jsonify(error="The server is busy, try again shortly"), HTTPStatus.SERVICE_UNAVAILABLE, \
+            {"Retry-After": retry_after(controller.retry_after_seconds)}
+
+    g.admission_limiter = limiter
+    return None
+
+def release_admission(exc: Optional[BaseException] = None) -> None:
+    """
+    teardown_request hook: give back the slot admit() took, if any.
+    """
+    limiter: Optional[ConcurrencyLimiter] = g.pop('admission_limiter', None)
+    if limiter is not None:
+        limiter.release()
+
+def init_admission(app: Flask) -> Optional[AdmissionController]:
+    """
+    Set up admission control from app.config. Nothing is limited unless
+    ADMISSION_READ_CONCURRENCY, ADMISSION_WRITE_CONCURRENCY or
+    RATE_LIMIT_PER_SECOND is set above 0. The controller is kept in
+    app.extensions['admission'].
+
+    NOTE: Limits are per worker process.
+
+    @return Optional[AdmissionController]: The controller, or None when nothing is limited.
+    """
+    queue_size: int = app.config.get('ADMISSION_QUEUE_SIZE', 0)
+    queue_timeout: float = app.config.get('ADMISSION_QUEUE_TIMEOUT_MS', 100.0) / 1000
+
+    limiters: List[Optional[ConcurrencyLimiter]] = []
+    for setting in ('ADMISSION_READ_CONCURRENCY', 'ADMISSION_WRITE_CONCURRENCY'):
+        limit: int = app.config.get(setting, 0)
+        limiters.append(ConcurrencyLimiter(limit, queue_size, queue_timeout) if limit > 0 else None)
+    reads, writes = limiters
+
+    rate: float = app.config.get('RATE_LIMIT_PER_SECOND', 0.0)
+    rate_limiter: Optional[RateLimiter] = None
+    if rate > 0:
+        rate_limiter = RateLimiter(
+            rate, app.config.get('RATE_LIMIT_BURST', 0.0) or max(rate, 1.0), app.config.get('RATE_LIMIT_MAX_CLIENTS', 10000)
+        )
+
+    if reads is None and writes is None and rate_limiter is None:
+        return None
+
+    controller: AdmissionController = AdmissionController(
+        reads, writes, rate_limiter,
+        app.config.get('RATE_LIMIT_CLIENT_HEADER', ''),
+        app.config.get('ADMISSION_RETRY_AFTER_SECONDS', 1)
+    )
+    app.extensions['admission'] = controller
+
+    app.before_request(admit)
+    app.teardown_request(release_admission)
+
+    return controller
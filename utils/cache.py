@@ -0,0 +1,155 @@
+import threading
+import time
+
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class LRUCache:
+    """
+    A thread-safe, bounded cache with least-recently-used eviction
+    and a time-to-live on every entry.
+
+    None is a valid value to cache, so missing rows can be cached too
+    (negative caching). They expire after negative_ttl_seconds when it is
+    set, which can be kept shorter than ttl_seconds, since a row that is
+    created elsewhere cannot invalidate this cache. A max_entries of 0
+    disables the cache: nothing is stored and every lookup is a miss.
+
+    Attributes:
+        max_entries - int: The most entries to hold before evicting the least recently used.
+        ttl_seconds - float: How long an entry is served before it expires.
+        negative_ttl_seconds - Optional[float]: How long a None is served, or None for ttl_seconds.
+        hits, misses, evictions, expirations - int: Counters for monitoring.
+    """
+    def __init__(
+            self,
+            max_entries: int = 0,
+            ttl_seconds: float = 60.0,
+            clock: Callable[[], float] = time.monotonic,
+            negative_ttl_seconds: Optional[float] = None
+    ) -> None:
+        self._entries: OrderedDict[Hashable, Tuple[float, Any]] = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+        self._clock: Callable[[], float] = clock
+        self._generation: int = 0
+        self.max_entries: int = max_entries
+        self.ttl_seconds: float = ttl_seconds
+        self.negative_ttl_seconds: Optional[float] = negative_ttl_seconds
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.expirations: int = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @property
+    def generation(self) -> int:
+        """
+        A counter that changes whenever entries are invalidated. Read it before
+        loading a value and pass it to set(), so a value loaded before an
+        invalidation is not stored after it.
+        """
+        return self._generation
+
+    def configure(self, max_entries: int, ttl_seconds: float) -> None:
+        """
+        Change the size and time-to-live of the cache. This empties the cache.
+
+        @param max_entries - int: The most entries to hold. 0 disables the cache.
+        @param ttl_seconds - float: How long an entry is served before it expires.
+        """
+        with self._lock:
+            self.max_entries = max_entries
+            self.ttl_seconds = ttl_seconds
+            self._entries.clear()
+            self._generation += 1
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """
+        Look up a key.
+
+        @param key - Hashable: The key to look up.
+
+        @return Tuple[bool, Any]: Whether the key was found, and its value.
+        """
+        if not self.enabled:
+            return False, None
+
+        with self._lock:
+            entry: Optional[Tuple[float, Any]] = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return False, None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, value
+
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None) -> None:
+        """
+        Store a value, evicting the least recently used entry if the cache is full.
+
+        @param key - Hashable: The key to store the value under.
+        @param value - Any: The value to store. May be None.
+        @param generation - Optional[int]: The generation read before the value was
+        loaded. If anything was invalidated since, the value is not stored.
+        """
+        if not self.enabled:
+            return
+
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+
+            ttl_seconds: float = self.ttl_seconds
+            if value is None and self.negative_ttl_seconds is not None:
+                ttl_seconds = min(ttl_seconds, self.negative_ttl_seconds)
+
+            self._entries[key] = (self._clock() + ttl_seconds, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        """
+        Invalidate a key.
+
+        @param key - Hashable: The key to remove.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+            self._generation += 1
+
+    def clear(self) -> None:
+        """
+        Invalidate every key.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the cache's size and counters, for monitoring.
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -0,0 +1,155 @@
+import zlib
+
+from typing import Any, Iterable, Iterator, List, Optional, Union
+
+from flask import Flask, Response, current_app, request
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; it is not offered without zstandard
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:  # br is optional; it is not offered without brotli
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES: List[str] = ["application/json", "application/x-ndjson"]
+
+GZIP_LEVEL: int = 6
+ZSTD_LEVEL: int = 3
+BROTLI_QUALITY: int = 4
+
+
+class StreamEncoder:
+    """
+    One interface over the gzip, zstd and brotli compressors.
+
+    compress() returns everything needed to decode the data given so
+    far, so each chunk of a streamed response reaches the client right
+    away instead of waiting in the compressor's buffer.
+    """
+    def __init__(self, encoding: str) -> None:
+        self.encoding: str = encoding
+
+        if encoding == "gzip":
+            self._compressor: Any = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        elif encoding == "zstd":
+            self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+        elif encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            raise ValueError(f"Unsupported encoding: {encoding}")
+
+    def compress(self, data: bytes) -> bytes:
+        """
+        Compress a chunk and flush it.
+        """
+        if self.encoding == "gzip":
+            return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        if self.encoding == "zstd":
+            return self._compressor.compress(data) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        """
+        End the compressed stream.
+        """
+        if self.encoding == "br":
+            return self._compressor.finish()
+
+        return self._compressor.flush()
+
+
+def available_encodings() -> List[str]:
+    """
+    Get the encodings this server can produce, most preferred first.
+    """
+    encodings: List[str] = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+
+    return encodings
+
+def encode_stream(chunks: Iterable[Union[str, bytes]], encoder: StreamEncoder) -> Iterator[bytes]:
+    """
+    Compress a streamed response chunk by chunk, as it is produced.
+    """
+    for chunk in chunks:
+        data: bytes = chunk.encode() if isinstance(chunk, str) else chunk
+        if data:
+            yield encoder.compress(data)
+
+    yield encoder.finish()
+
+def compress_response(response: Response) -> Response:
+    """
+    Compress a JSON response with the best encoding the client accepts.
+
+    Buffered responses smaller than COMPRESSION_MIN_SIZE are left alone.
+    Streamed responses are always compressed, one chunk at a time.
+
+    Whenever the client accepts an encoding, a strong ETag is made weak,
+    since the bytes may be compressed. That includes responses too small
+    to compress and 304s, so a 304 always carries the same ETag as the 200
+    it stands for.
+    """
+    if not current_app.config.get('COMPRESSION_ENABLED', False):
+        return response
+
+    if response.status_code == 304:
+        # A 304 has no body or Content-Type to go by, so it is treated like the 200 it replaces.
+        if request.accept_encodings.best_match(available_encodings()) is not None:
+            response.vary.add('Accept-Encoding')
+            weaken_etag(response)
+        return response
+
+    if (
+        response.status_code < 200
+        or response.status_code in (204, 206)
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+        or 'Content-Encoding' in response.headers
+        or response.direct_passthrough
+    ):
+        return response
+
+    response.vary.add('Accept-Encoding')
+
+    encoding: Optional[str] = request.accept_encodings.best_match(available_encodings())
+    if encoding is None:
+        return response
+
+    weaken_etag(response)
+    encoder: StreamEncoder = StreamEncoder(encoding)
+
+    if response.is_streamed:
+        response.response = encode_stream(response.response, encoder)
+        response.headers.pop('Content-Length', None)
+    else:
+        data: bytes = response.get_data()
+        if len(data) < current_app.config.get('COMPRESSION_MIN_SIZE', 1024):
+            return response
+
+        response.set_data(encoder.compress(data) + encoder.finish())
+
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+def weaken_etag(response: Response) -> None:
+    """
+    Make a strong ETag weak, since the body's bytes depend on the encoding.
+    """
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+def init_compression(app: Flask) -> None:
+    """
+    Register response compression on the app. It does nothing unless
+    app.config['COMPRESSION_ENABLED'] is set.
+    """
+    app.after_request(compress_response)
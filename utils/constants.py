@@ -1,4 +1,4 @@
-from typing import Final
+from typing import Final, Tuple
 
 class Constants:
     DOG: Final[str] = "DOG"
@@ -6,3 +6,23 @@ class Constants:
     BIRD: Final[str] = "BIRD"
     SHARK: Final[str] = "SHARK"
     LION: Final[str] = "LION"
+
+    MAX_NAME_LENGTH: Final[int] = 50
+    MAX_SPECIES_LENGTH: Final[int] = 20
+    MAX_AGE: Final[int] = 2 ** 31 - 1  # ages are stored in a 32-bit INTEGER column
+    MAX_ID: Final[int] = 2 ** 63 - 1  # the largest id any database's INTEGER primary key can hold
+
+    PET_FIELDS: Final[Tuple[str, ...]] = ("id", "name", "age", "species")
+
+    DEFAULT_PAGE_SIZE: Final[int] = 100
+    MAX_PAGE_SIZE: Final[int] = 1000
+    STREAM_BATCH_SIZE: Final[int] = 1000
+    DEFAULT_AGE_BUCKET_WIDTH: Final[int] = 5
+    MAX_AGE_BUCKET_WIDTH: Final[int] = 1000
+    STATS_CACHE_MAX_ENTRIES: Final[int] = 64
+    BULK_INSERT_CHUNK_SIZE: Final[int] = 500
+    MAX_BULK_PETS: Final[int] = 10000
+    MAX_IDEMPOTENCY_KEY_LENGTH: Final[int] = 255
+
+    JSON_MIMETYPE: Final[str] = "application/json"
+    NDJSON_MIMETYPE: Final[str] = "application/x-ndjson"
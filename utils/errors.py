@@ -8,4 +8,10 @@ class EnvironmentNotSetError(Exception):
     pass
 
 class DatabaseNotConnectedError(Exception):
-    pass
\ No newline at end of file
+    pass
+
+class InvalidQueryParameterError(Exception):
+    pass
+
+class InvalidConfigurationError(Exception):
+    pass
@@ -1,16 +1,41 @@
+import base64
+import binascii
+import hashlib
+import math
 import os
 
 from logging import Logger
-from typing import Dict, List, Optional, Tuple, Union
+from typing import Any, Dict, List, Mapping, Optional, Set, Tuple, Type, Union
 
 from flask import Flask
+from sqlalchemy.engine import URL, make_url
 
+from animals.animal_types import AnimalType
+from utils.constants import Constants
 from utils.errors import (
     EnvironmentNotSetError,
+    InvalidConfigurationError,
+    InvalidQueryParameterError,
     InvalidRequestBodyError, 
     InvalidTypesError
 )
+from utils.pool import MeteredQueuePool
+from utils.schema import (
+    MISSING,
+    WRONG_TYPE,
+    Field,
+    FieldError,
+    Schema,
+    describe_errors
+)
+
+CURSOR_PREFIX: str = "id:"
 
+PET_SCHEMA: Schema = Schema(
+    name=Field(str, max_length=Constants.MAX_NAME_LENGTH),
+    age=Field(int, min_value=0, max_value=Constants.MAX_AGE),
+    species=Field(str, max_length=Constants.MAX_SPECIES_LENGTH),
+)
 
 def check_for_correct_types(name: str, age: int, species: str) -> bool:
     """
@@ -22,56 +47,42 @@ def check_for_correct_types(name: str, age: int, species: str) -> bool:
 
     @return bool: True if all types are correct, False otherwise.
     """
-    params_and_types: List[Tuple[str, Union[str, int]]] = [
-        (name, str),
-        (age, int),
-        (species, str)
-    ]
-
-    return all(
-        isinstance(param, param_type) 
-        for param, param_type in params_and_types
-    )
+    return type(name) is str and type(age) is int and type(species) is str
 
 def validate_json(
         data: Dict[str, Union[str, int]],
         logger: Logger
 ) -> None:
     """
-    Simple validation on incoming json data on POST requests.
-    Checks that each field exists and is the correct type.
+    Validate incoming json data on POST requests against PET_SCHEMA.
+    Every problem is reported at once: missing fields, wrong types,
+    names or species that are too long, negative ages and unknown fields.
 
     @param data - Dict[str, Union[str, int]]: The json data to validate.
     @param logger - Logger: The logger to use for logging errors.
 
     @return None
     """
-    name: Optional[str] = data.get('name')
-    age: Optional[int] = data.get('age')
-    species: Optional[str] = data.get('species')
+    errors: List[FieldError] = PET_SCHEMA.validate(data)
+    if not errors:
+        return
 
-    if any(n is None for n in (name, age, species)):
-        message: str = (
-            "helpers.py::validate_json - "
-            "One or more of the following values are missing: "
-            "name, age, species. Your provided values are: "
-            f"name={name}, age={age}, species={species}"
-        )
+    codes: Set[str] = {error["code"] for error in errors}
+    if MISSING in codes:
+        summary: str = "One or more of the following values are missing: name, age, species."
+        error_type: Type[Exception] = InvalidRequestBodyError
+    elif WRONG_TYPE in codes:
+        summary = "One or more of the following values are of the wrong type: name, age, species."
+        error_type = InvalidTypesError
+    else:
+        summary = "The request body is not a valid pet."
+        error_type = InvalidRequestBodyError
 
-        logger.error(message)
-        raise InvalidRequestBodyError(message)
+    message: str = f"helpers.py::validate_json - {summary} Problems: {describe_errors(errors)}"
 
-    if not check_for_correct_types(name, age, species):
-        message: str = (
-            "helpers.py::validate_json - "
-            "One or more of the following values are of the wrong type: "
-            "name, age, species. Your provided values are: "
-            f"name={name} of type {type(name)}, age={age} of type {type(age)}, "
-            f"species={species} of type {type(species)}."
-        )
-
-        logger.error(message)
-        raise InvalidTypesError(message)
+    # Bad input is the client's problem, so keep it out of the error logs.
+    logger.debug(message)
+    raise error_type(message)
     
 def configure_app(app: Flask) -> None:
     """
@@ -81,6 +92,157 @@ def configure_app(app: Flask) -> None:
     app.config['SQLALCHEMY_ECHO']: bool = False
     app.config['SECRET_KEY']: str = get_flask_secret()
     app.config['SQLALCHEMY_DATABASE_URI']: str = get_database_uri()
+    app.config['SQLALCHEMY_ENGINE_OPTIONS']: Dict[str, Any] = get_engine_options()
+    app.config['COMPRESSION_ENABLED']: bool = get_bool_env('COMPRESSION_ENABLED', False)
+    app.config['COMPRESSION_MIN_SIZE']: int = get_int_env('COMPRESSION_MIN_SIZE', 1024)
+    app.config['JSON_PROVIDER']: str = os.environ.get('JSON_PROVIDER', 'auto')
+    app.config['PET_CACHE_MAX_ENTRIES']: int = get_int_env('PET_CACHE_MAX_ENTRIES', 0)
+    app.config['PET_CACHE_TTL_SECONDS']: float = get_float_env('PET_CACHE_TTL_SECONDS', 30.0)
+    app.config['PET_CACHE_NEGATIVE_TTL_SECONDS']: float = get_float_env('PET_CACHE_NEGATIVE_TTL_SECONDS', 1.0)
+    app.config['STATS_CACHE_TTL_SECONDS']: float = get_float_env('STATS_CACHE_TTL_SECONDS', 0.0)
+    app.config['DB_WARMUP_CONNECTIONS']: int = get_int_env('DB_WARMUP_CONNECTIONS', 0)
+    app.config['GROUP_COMMIT_ENABLED']: bool = get_bool_env('GROUP_COMMIT_ENABLED', False)
+    app.config['GROUP_COMMIT_MAX_BATCH']: int = get_int_env('GROUP_COMMIT_MAX_BATCH', 100)
+    app.config['GROUP_COMMIT_MAX_DELAY_MS']: float = get_float_env('GROUP_COMMIT_MAX_DELAY_MS', 5.0)
+    app.config['GROUP_COMMIT_TIMEOUT_SECONDS']: float = get_float_env('GROUP_COMMIT_TIMEOUT_SECONDS', 10.0)
+    app.config['IDEMPOTENCY_STORE']: str = os.environ.get('IDEMPOTENCY_STORE', 'memory')
+    app.config['IDEMPOTENCY_TTL_SECONDS']: float = get_float_env('IDEMPOTENCY_TTL_SECONDS', 86400.0)
+    app.config['IDEMPOTENCY_MAX_ENTRIES']: int = get_int_env('IDEMPOTENCY_MAX_ENTRIES', 10000)
+    app.config['IDEMPOTENCY_WAIT_SECONDS']: float = get_float_env('IDEMPOTENCY_WAIT_SECONDS', 10.0)
+    app.config['ADMISSION_READ_CONCURRENCY']: int = get_int_env('ADMISSION_READ_CONCURRENCY', 0)
+    app.config['ADMISSION_WRITE_CONCURRENCY']: int = get_int_env('ADMISSION_WRITE_CONCURRENCY', 0)
+    app.config['ADMISSION_QUEUE_SIZE']: int = get_int_env('ADMISSION_QUEUE_SIZE', 0)
+    app.config['ADMISSION_QUEUE_TIMEOUT_MS']: float = get_float_env('ADMISSION_QUEUE_TIMEOUT_MS', 100.0)
+    app.config['ADMISSION_RETRY_AFTER_SECONDS']: int = get_int_env('ADMISSION_RETRY_AFTER_SECONDS', 1)
+    app.config['RATE_LIMIT_PER_SECOND']: float = get_float_env('RATE_LIMIT_PER_SECOND', 0.0)
+    app.config['RATE_LIMIT_BURST']: float = get_float_env('RATE_LIMIT_BURST', 0.0)
+    app.config['RATE_LIMIT_MAX_CLIENTS']: int = get_int_env('RATE_LIMIT_MAX_CLIENTS', 10000)
+    app.config['RATE_LIMIT_CLIENT_HEADER']: str = os.environ.get('RATE_LIMIT_CLIENT_HEADER', '')
+    app.config['TRUSTED_PROXIES']: int = get_int_env('TRUSTED_PROXIES', 0)
+    app.config['SLOW_QUERY_THRESHOLD_MS']: float = get_float_env('SLOW_QUERY_THRESHOLD_MS', 500.0)
+    app.config['DB_DEBUG_HEADERS']: bool = get_bool_env('DB_DEBUG_HEADERS', False)
+    app.config['LOG_LEVEL']: str = os.environ.get('LOG_LEVEL', 'INFO').upper()
+    app.config['LOG_FORMAT']: str = os.environ.get('LOG_FORMAT', 'json')
+    app.config['LOG_TRACEBACK_LIMIT']: int = get_int_env('LOG_TRACEBACK_LIMIT', 1)
+    app.config['LOG_TRACEBACK_WINDOW_SECONDS']: float = get_float_env('LOG_TRACEBACK_WINDOW_SECONDS', 60.0)
+    app.config['METRICS_BUCKETS']: Optional[List[float]] = get_float_list_env('METRICS_BUCKETS', None)
+
+def get_int_env(name: str, default: int) -> int:
+    """
+    Get an integer setting from the environment, or the default if it is not set.
+    If it is set but is not an integer, raise an InvalidConfigurationError.
+
+    @param name - str: The name of the environment variable.
+    @param default - int: The value to use when it is not set.
+
+    @return int: The setting's value.
+    """
+    value: Optional[str] = os.environ.get(name)
+    if value is None or value == "":
+        return default
+
+    try:
+        return int(value)
+    except ValueError:
+        raise InvalidConfigurationError(f"{name} must be an integer, got {value!r}.")
+
+def get_float_env(name: str, default: float) -> float:
+    """
+    Get a number setting from the environment, or the default if it is not set.
+    If it is set but is not a number, raise an InvalidConfigurationError.
+
+    @param name - str: The name of the environment variable.
+    @param default - float: The value to use when it is not set.
+
+    @return float: The setting's value.
+    """
+    value: Optional[str] = os.environ.get(name)
+    if value is None or value == "":
+        return default
+
+    try:
+        return float(value)
+    except ValueError:
+        raise InvalidConfigurationError(f"{name} must be a number, got {value!r}.")
+
+def get_float_list_env(name: str, default: Optional[List[float]]) -> Optional[List[float]]:
+    """
+    Get a comma-separated list of numbers from the environment, i.e. "0.01,0.1,1",
+    or the default if it is not set. If any of them is not a positive number,
+    raise an InvalidConfigurationError.
+
+    @param name - str: The name of the environment variable.
+    @param default - Optional[List[float]]: The value to use when it is not set.
+
+    @return Optional[List[float]]: The numbers, sorted.
+    """
+    value: Optional[str] = os.environ.get(name)
+    if value is None or value.strip() == "":
+        return default
+
+    try:
+        numbers: List[float] = sorted(float(part) for part in value.split(",") if part.strip())
+    except ValueError:
+        raise InvalidConfigurationError(f"{name} must be a comma-separated list of numbers, got {value!r}.")
+
+    if not numbers or numbers[0] <= 0:
+        raise InvalidConfigurationError(f"{name} must be a comma-separated list of positive numbers, got {value!r}.")
+
+    return numbers
+
+def get_bool_env(name: str, default: bool) -> bool:
+    """
+    Get a true/false setting from the environment, or the default if it is not set.
+    Accepts 1/0, true/false, yes/no and on/off. Anything else raises an
+    InvalidConfigurationError.
+
+    @param name - str: The name of the environment variable.
+    @param default - bool: The value to use when it is not set.
+
+    @return bool: The setting's value.
+    """
+    value: Optional[str] = os.environ.get(name)
+    if value is None or value == "":
+        return default
+
+    if value.lower() in ("1", "true", "yes", "on"):
+        return True
+    if value.lower() in ("0", "false", "no", "off"):
+        return False
+
+    raise InvalidConfigurationError(f"{name} must be true or false, got {value!r}.")
+
+def get_engine_options() -> Dict[str, Any]:
+    """
+    Build SQLALCHEMY_ENGINE_OPTIONS from the environment.
+
+    The pool always records checkout counts and wait times (see utils/pool.py).
+    The pool settings are only passed on when they are set, so SQLAlchemy's
+    defaults still apply otherwise:
+
+    SQLALCHEMY_POOL_SIZE - int: Connections kept open per worker.
+    SQLALCHEMY_MAX_OVERFLOW - int: Extra connections allowed above the pool size.
+    SQLALCHEMY_POOL_TIMEOUT - float: Seconds to wait for a free connection.
+    SQLALCHEMY_POOL_RECYCLE - int: Seconds after which a connection is reopened.
+    SQLALCHEMY_POOL_PRE_PING - bool: Test connections before use, to drop stale ones.
+
+    @return Dict[str, Any]: The engine options.
+    """
+    options: Dict[str, Any] = {"poolclass": MeteredQueuePool}
+
+    settings: List[Tuple[str, str, Any]] = [
+        ('SQLALCHEMY_POOL_SIZE', 'pool_size', get_int_env),
+        ('SQLALCHEMY_MAX_OVERFLOW', 'max_overflow', get_int_env),
+        ('SQLALCHEMY_POOL_TIMEOUT', 'pool_timeout', get_float_env),
+        ('SQLALCHEMY_POOL_RECYCLE', 'pool_recycle', get_int_env),
+        ('SQLALCHEMY_POOL_PRE_PING', 'pool_pre_ping', get_bool_env),
+    ]
+
+    for env_name, option, getter in settings:
+        if os.environ.get(env_name):
+            options[option] = getter(env_name, None)
+
+    return options
 
 def get_database_uri() -> str:
     """
@@ -96,6 +258,35 @@ def get_database_uri() -> str:
     
     return database_uri
 
+def get_async_database_uri(database_uri: str) -> str:
+    """
+    Get the database URI for the async app. SQLALCHEMY_ASYNC_DATABASE_URI
+    is used if it is set. Otherwise the sync URI is switched to the async
+    driver for its database: aiosqlite for SQLite, asyncpg for Postgres.
+    If there is no known async driver, raise an InvalidConfigurationError.
+
+    @param database_uri - str: The sync database URI.
+
+    @return str: The async database URI.
+    """
+    async_uri: Optional[str] = os.environ.get('SQLALCHEMY_ASYNC_DATABASE_URI')
+    if async_uri:
+        return async_uri
+
+    async_drivers: Dict[str, str] = {
+        "sqlite": "sqlite+aiosqlite",
+        "postgresql": "postgresql+asyncpg",
+    }
+
+    url: URL = make_url(database_uri)
+    if url.get_backend_name() not in async_drivers:
+        raise InvalidConfigurationError(
+            f"No async driver known for {url.get_backend_name()}. "
+            "Set SQLALCHEMY_ASYNC_DATABASE_URI."
+        )
+
+    return url.set(drivername=async_drivers[url.get_backend_name()]).render_as_string(hide_password=False)
+
 def get_flask_secret() -> str:
     """
     Get the flask secret key from the environment variable.
@@ -108,3 +299,176 @@ def get_flask_secret() -> str:
         raise EnvironmentNotSetError("SECRET_KEY is not set.")
 
     return secret_key
+
+def encode_cursor(last_id: int) -> str:
+    """
+    Encode the id of the last pet on a page into an opaque cursor
+    that clients pass back via ?after= to get the next page.
+
+    @param last_id - int: The id of the last pet on the current page.
+
+    @return str: The URL-safe cursor.
+    """
+    raw: bytes = f"{CURSOR_PREFIX}{last_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> int:
+    """
+    Decode a cursor created by encode_cursor back into a pet id.
+    If the cursor is malformed, raise an InvalidQueryParameterError.
+
+    @param cursor - str: The cursor sent by the client.
+
+    @return int: The id to continue after.
+    """
+    try:
+        padded: str = cursor + "=" * (-len(cursor) % 4)
+        raw: str = base64.urlsafe_b64decode(padded.encode()).decode()
+    except (binascii.Error, UnicodeError, ValueError):
+        raise InvalidQueryParameterError(f"Invalid cursor: {cursor}")
+
+    last_id: str = raw[len(CURSOR_PREFIX):]
+    if not raw.startswith(CURSOR_PREFIX) or not is_decimal(last_id) or int(last_id) > Constants.MAX_ID:
+        raise InvalidQueryParameterError(f"Invalid cursor: {cursor}")
+
+    return int(last_id)
+
+def is_decimal(value: str) -> bool:
+    """
+    Check that a string is made only of the ASCII digits 0-9. Unlike
+    str.isdigit(), this rejects digits int() cannot parse, i.e. "²".
+    """
+    return value.isascii() and value.isdecimal()
+
+def parse_page_args(args: Mapping[str, str]) -> Tuple[int, Optional[int]]:
+    """
+    Read the ?limit= and ?after= pagination parameters from a request.
+    If either one is invalid, raise an InvalidQueryParameterError.
+
+    @param args - Mapping[str, str]: The request's query parameters.
+
+    @return Tuple[int, Optional[int]]: The page size, and the id to
+    continue after (None for the first page).
+    """
+    limit: int = parse_positive_int(
+        args, 'limit', Constants.DEFAULT_PAGE_SIZE, Constants.MAX_PAGE_SIZE
+    )
+
+    raw_after: Optional[str] = args.get('after')
+    after: Optional[int] = decode_cursor(raw_after) if raw_after else None
+
+    return limit, after
+
+def parse_positive_int(
+        args: Mapping[str, str],
+        key: str,
+        default: int,
+        maximum: int
+) -> int:
+    """
+    Read a positive integer query parameter, falling back to a default
+    when it is not given. If it is invalid or larger than the maximum,
+    raise an InvalidQueryParameterError.
+
+    @param args - Mapping[str, str]: The request's query parameters.
+    @param key - str: The name of the parameter.
+    @param default - int: The value to use when the parameter is missing.
+    @param maximum - int: The largest allowed value.
+
+    @return int: The parsed value.
+    """
+    raw_value: Optional[str] = args.get(key)
+    if raw_value is None:
+        return default
+
+    if not is_decimal(raw_value) or not 1 <= int(raw_value) <= maximum:
+        raise InvalidQueryParameterError(
+            f"{key} must be an integer between 1 and {maximum}."
+        )
+
+    return int(raw_value)
+
+def make_etag(*parts: Any) -> str:
+    """
+    Build a strong ETag from the values a response depends on.
+    The parts are hashed as given, so the response body never
+    has to be serialized just to find out whether it changed.
+
+    @param parts - Any: Values with a stable repr, i.e. ids, counts, query strings.
+
+    @return str: The ETag, without quotes.
+    """
+    return hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+
+def parse_fields(args: Mapping[str, str]) -> Tuple[str, ...]:
+    """
+    Read the ?fields= parameter, a comma-separated list of pet fields
+    to return, i.e. "name,age". Returns every field when it is missing.
+    If it names an unknown field, raise an InvalidQueryParameterError.
+
+    @param args - Mapping[str, str]: The request's query parameters.
+
+    @return Tuple[str, ...]: The requested fields, in Constants.PET_FIELDS order.
+    """
+    raw_fields: Optional[str] = args.get('fields')
+    if raw_fields is None:
+        return Constants.PET_FIELDS
+
+    requested: Set[str] = {field.strip() for field in raw_fields.split(",") if field.strip()}
+    unknown: Set[str] = requested - set(Constants.PET_FIELDS)
+
+    if not requested or unknown:
+        raise InvalidQueryParameterError(
+            f"fields must be a comma-separated list of: {', '.join(Constants.PET_FIELDS)}."
+        )
+
+    return tuple(field for field in Constants.PET_FIELDS if field in requested)
+
+def parse_filters(args: Mapping[str, str]) -> Dict[str, int]:
+    """
+    Read the ?species=, ?min_age= and ?max_age= filters for the pet list.
+    Species are case-insensitive names, i.e. "dog". Ages are inclusive.
+    If a filter is invalid, raise an InvalidQueryParameterError.
+
+    @param args - Mapping[str, str]: The request's query parameters.
+
+    @return Dict[str, int]: The filters that were given, with species
+    converted to its AnimalType value. Ready to pass to Pet's list methods.
+    """
+    filters: Dict[str, int] = {}
+
+    species: Optional[str] = args.get('species')
+    if species is not None:
+        if species.upper() not in AnimalType.__members__:
+            raise InvalidQueryParameterError(
+                f"species must be one of: {', '.join(t.name.lower() for t in AnimalType)}."
+            )
+        filters['species'] = AnimalType[species.upper()].value
+
+    for key in ('min_age', 'max_age'):
+        value: Optional[str] = args.get(key)
+        if value is not None:
+            if not is_decimal(value) or int(value) > Constants.MAX_AGE:
+                raise InvalidQueryParameterError(f"{key} must be an integer between 0 and {Constants.MAX_AGE}.")
+            filters[key] = int(value)
+
+    if filters.get('min_age', 0) > filters.get('max_age', Constants.MAX_AGE):
+        raise InvalidQueryParameterError("min_age must not be greater than max_age.")
+
+    return filters
+
+def percentile(samples: List[float], pct: float) -> float:
+    """
+    Get the pct-th percentile of the samples (nearest rank).
+
+    @param samples - List[float]: The samples, in any order.
+    @param pct - float: The percentile, from 0 to 100.
+
+    @return float: The percentile, or 0.0 when there are no samples.
+    """
+    if not samples:
+        return 0.0
+
+    ordered: List[float] = sorted(samples)
+    rank: int = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
@@ -0,0 +1,78 @@
+from typing import Any, Union
+
+from flask import Flask, Response
+from flask.json.provider import DefaultJSONProvider
+
+from utils.errors import InvalidConfigurationError
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib json module is used without it
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    A Flask JSON provider that encodes and decodes with orjson,
+    which is several times faster than the stdlib json module.
+
+    Output matches the default provider where it matters: keys are sorted
+    when sort_keys is set, and dates and anything else orjson does not know
+    go through the same default() hook. Calls with extra json.dumps/json.loads
+    keyword arguments fall back to the stdlib.
+    """
+    def _options(self) -> int:
+        options: int = orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+
+        return options
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+
+        return orjson.dumps(obj, default=self.default, option=self._options()).decode()
+
+    def loads(self, s: Union[str, bytes], **kwargs: Any) -> Any:
+        if kwargs:
+            return super().loads(s, **kwargs)
+
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        # Pretty output is only for debugging, so leave it to the stdlib.
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+
+        obj: Any = self._prepare_response_obj(args, kwargs)
+        body: bytes = orjson.dumps(
+            obj, default=self.default, option=self._options() | orjson.OPT_APPEND_NEWLINE
+        )
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def init_json_provider(app: Flask) -> None:
+    """
+    Pick the app's JSON provider from app.config['JSON_PROVIDER']:
+
+    auto - orjson if it is installed, otherwise the stdlib (the default).
+    orjson - orjson. Raises an InvalidConfigurationError if it is not installed.
+    std - the stdlib json module.
+
+    The provider is used for jsonify, request.json and app.json.
+    """
+    choice: str = app.config.get('JSON_PROVIDER', 'auto').lower()
+
+    if choice not in ('auto', 'orjson', 'std'):
+        raise InvalidConfigurationError(
+            f"JSON_PROVIDER must be one of auto, orjson or std, got {choice!r}."
+        )
+
+    if choice == 'orjson' and orjson is None:
+        raise InvalidConfigurationError("JSON_PROVIDER is orjson, but orjson is not installed.")
+
+    if choice == 'std' or orjson is None:
+        app.json = DefaultJSONProvider(app)
+    else:
+        app.json = OrjsonProvider(app)
@@ -0,0 +1,264 @@
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import click
+
+from utils.helpers import percentile
+
+# The requests the load test can send, by the name used in --mix.
+OPERATIONS: Tuple[str, ...] = ("get_pet", "list_pets", "oldest", "create")
+
+DEFAULT_MIX: str = "get_pet=60,list_pets=20,oldest=10,create=10"
+
+# Pets created up front when the database has none for get_pet to read.
+SEED_PETS: int = 100
+
+
+class LoadResults:
+    """
+    Thread-safe latencies and error counts, per operation.
+    """
+    def __init__(self) -> None:
+        self._lock: threading.Lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = {operation: [] for operation in OPERATIONS}
+        self.errors: Dict[str, int] = {operation: 0 for operation in OPERATIONS}
+
+    def record(self, operation: str, seconds: float, ok: bool) -> None:
+        with self._lock:
+            self.latencies[operation].append(seconds)
+            if not ok:
+                self.errors[operation] += 1
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        """
+        Summarize the run.
+
+        @param elapsed - float: How long the run took, in seconds.
+
+        @return Dict[str, Any]: The totals, and requests, error rate and
+        latency percentiles (in milliseconds) for each operation that was sent.
+        """
+        operations: Dict[str, Dict[str, float]] = {}
+        with self._lock:
+            for operation, latencies in self.latencies.items():
+                if not latencies:
+                    continue
+                operations[operation] = {
+                    "requests": len(latencies),
+                    "error_rate": self.errors[operation] / len(latencies),
+                    "p50_ms": percentile(latencies, 50) * 1000,
+                    "p90_ms": percentile(latencies, 90) * 1000,
+                    "p99_ms": percentile(latencies, 99) * 1000,
+                    "max_ms": max(latencies) * 1000,
+                }
+
+            total: int = sum(len(latencies) for latencies in self.latencies.values())
+            errors: int = sum(self.errors.values())
+
+        return {
+            "seconds": elapsed,
+            "requests": total,
+            "rps": total / elapsed if elapsed > 0 else 0.0,
+            "error_rate": errors / total if total else 0.0,
+            "operations": operations,
+        }
+
+
+class LoadGenerator:
+    """
+    Sends a weighted mix of requests to a running copy of the app.
+
+    Attributes:
+        base_url - str: The app's address, i.e. "http://127.0.0.1:5000".
+        mix - Dict[str, int]: The weight of each operation.
+        ids - List[int]: Pet ids for get_pet to pick from.
+        timeout - float: Seconds to wait for each response.
+    """
+    def __init__(self, base_url: str, mix: Dict[str, int], ids: List[int], timeout: float = 10.0) -> None:
+        self.base_url: str = base_url.rstrip("/")
+        self.mix: Dict[str, int] = mix
+        self.ids: List[int] = ids
+        self.timeout: float = timeout
+        self.results: LoadResults = LoadResults()
+        self._operations: List[str] = list(mix)
+        self._weights: List[int] = list(mix.values())
+
+    def choose(self, rng: random.Random) -> str:
+        return rng.choices(self._operations, self._weights)[0]
+
+    def build(self, operation: str, rng: random.Random) -> urllib.request.Request:
+        """
+        Build the request for one operation.
+        """
+        if operation == "get_pet":
+            return urllib.request.Request(f"{self.base_url}/pets/{rng.choice(self.ids)}")
+        if operation == "list_pets":
+            return urllib.request.Request(f"{self.base_url}/pets?limit=100")
+        if operation == "oldest":
+            return urllib.request.Request(f"{self.base_url}/pets/oldest")
+
+        body: bytes = json.dumps(
+            {"name": f"Load {rng.randrange(10 ** 9)}", "age": rng.randint(0, 30), "species": "dog"}
+        ).encode()
+        return urllib.request.Request(
+            f"{self.base_url}/pets", data=body, headers={"Content-Type": "application/json"}
+        )
+
+    def send(self, operation: str, request: urllib.request.Request, started: float) -> None:
+        """
+        Send one request and record how long it took from `started`.
+        """
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+                ok: bool = response.status < 400
+        except (urllib.error.URLError, OSError):
+            # HTTPError (4xx/5xx) is a URLError too.
+            ok = False
+
+        self.results.record(operation, time.perf_counter() - started, ok)
+
+    def run_concurrency(self, concurrency: int, duration: float, seed: int = 0) -> Dict[str, Any]:
+        """
+        Closed loop: `concurrency` clients each send their next request
+        as soon as the previous one is answered, for `duration` seconds.
+        """
+        start: float = time.perf_counter()
+        deadline: float = start + duration
+
+        def client(number: int) -> None:
+            rng: random.Random = random.Random(seed + number)
+            while time.perf_counter() < deadline:
+                operation: str = self.choose(rng)
+                self.send(operation, self.build(operation, rng), time.perf_counter())
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(client, range(concurrency)))
+
+        return self.results.summary(time.perf_counter() - start)
+
+    def run_rate(self, rate: float, concurrency: int, duration: float, seed: int = 0) -> Dict[str, Any]:
+        """
+        Open loop: start `rate` requests per second on a fixed schedule,
+        whether or not earlier ones have been answered, for `duration` seconds.
+        Latency is measured from when a request was due to start, so time
+        spent queued behind busy threads counts, as it would for real users.
+        """
+        rng: random.Random = random.Random(seed)
+        start: float = time.perf_counter()
+        sent: int = 0
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            while sent < rate * duration:
+                due: float = start + sent / rate
+                delay: float = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+                operation: str = self.choose(rng)
+                pool.submit(self.send, operation, self.build(operation, rng), due)
+                sent += 1
+
+        return self.results.summary(time.perf_counter() - start)
+
+
+def parse_mix(value: str) -> Dict[str, int]:
+    """
+    Parse a request mix, i.e. "get_pet=60,create=10". Weights are relative.
+    If it is invalid, raise a ValueError.
+
+    @param value - str: Comma-separated operation=weight pairs.
+
+    @return Dict[str, int]: The weight of each operation, leaving out zero weights.
+    """
+    mix: Dict[str, int] = {}
+    for part in value.split(","):
+        operation, _, weight = part.strip().partition("=")
+        if operation not in OPERATIONS:
+            raise ValueError(f"Unknown operation {operation!r}. Use {', '.join(OPERATIONS)}.")
+        if not weight.isdigit():
+            raise ValueError(f"The weight of {operation} must be a non-negative integer.")
+        if int(weight) > 0:
+            mix[operation] = int(weight)
+
+    if not mix:
+        raise ValueError("At least one operation needs a weight above 0.")
+
+    return mix
+
+def fetch_ids(base_url: str, timeout: float, seed_pets: int = SEED_PETS) -> List[int]:
+    """
+    Get the ids of the first page of pets, creating some first if there are none.
+    """
+    base_url = base_url.rstrip("/")
+    with urllib.request.urlopen(f"{base_url}/pets?limit=1000&fields=id", timeout=timeout) as response:
+        ids: List[int] = [pet["id"] for pet in json.load(response)["pets"]]
+
+    for i in range(seed_pets if not ids else 0):
+        body: bytes = json.dumps({"name": f"Load seed {i}", "age": i % 20, "species": "cat"}).encode()
+        request = urllib.request.Request(
+            f"{base_url}/pets", data=body, headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            ids.append(json.load(response)["pet"]["id"])
+
+    return ids
+
+def format_summary(summary: Dict[str, Any]) -> str:
+    lines: List[str] = [
+        f"{summary['requests']} requests in {summary['seconds']:.1f}s: "
+        f"{summary['rps']:.1f} req/s, {summary['error_rate']:.2%} errors",
+        f"{'operation':<12}{'requests':>10}{'errors':>9}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}",
+    ]
+    for operation, stats in summary["operations"].items():
+        lines.append(
+            f"{operation:<12}{stats['requests']:>10}{stats['error_rate']:>9.2%}{stats['p50_ms']:>10.2f}"
+            f"{stats['p90_ms']:>10.2f}{stats['p99_ms']:>10.2f}{stats['max_ms']:>10.2f}"
+        )
+
+    return "\n".join(lines)
+
+
+@click.command("loadtest")
+@click.option("--url", default="http://127.0.0.1:5000", show_default=True, help="The running app to load.")
+@click.option("--mix", default=DEFAULT_MIX, show_default=True,
+              help=f"Relative weights of {', '.join(OPERATIONS)}.")
+@click.option("--concurrency", default=10, show_default=True, help="Threads sending requests.")
+@click.option("--rate", type=float, default=None,
+              help="Requests per second to start. Without it, each thread sends back to back.")
+@click.option("--duration", type=float, default=30.0, show_default=True, help="Seconds to run for.")
+@click.option("--timeout", type=float, default=10.0, show_default=True, help="Seconds to wait for a response.")
+@click.option("--seed", type=int, default=0, show_default=True, help="Seed for the request mix.")
+@click.option("--json", "as_json", is_flag=True, help="Print the results as JSON.")
+def loadtest(url: str, mix: str, concurrency: int, rate: Optional[float], duration: float,
+             timeout: float, seed: int, as_json: bool) -> None:
+    """
+    Send a mix of pets requests to a running copy of the app and report
+    the throughput, error rates and latency percentiles it achieved.
+    """
+    try:
+        weights: Dict[str, int] = parse_mix(mix)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--mix")
+
+    if concurrency < 1:
+        raise click.BadParameter("must be at least 1.", param_hint="--concurrency")
+    if rate is not None and rate <= 0:
+        raise click.BadParameter("must be above 0.", param_hint="--rate")
+
+    ids: List[int] = fetch_ids(url, timeout) if "get_pet" in weights else []
+    generator: LoadGenerator = LoadGenerator(url, weights, ids, timeout)
+
+    if rate is None:
+        summary: Dict[str, Any] = generator.run_concurrency(concurrency, duration, seed)
+    else:
+        summary = generator.run_rate(rate, concurrency, duration, seed)
+
+    click.echo(json.dumps(summary, indent=2) if as_json else format_summary(summary))
@@ -0,0 +1,259 @@
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import threading
+import time
+import uuid
+
+from logging import LogRecord
+from logging.handlers import QueueHandler, QueueListener
+from types import TracebackType
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from flask import Flask, Response, g, has_request_context, request
+
+from utils.errors import InvalidConfigurationError
+
+TEXT_FORMAT: str = '%(levelname)s - %(asctime)s: %(message)s '
+
+REQUEST_ID_HEADER: str = 'X-Request-ID'
+
+# Incoming request ids are echoed back and logged, so only short, plain ones are kept.
+REQUEST_ID_PATTERN: re.Pattern = re.compile(r"[A-Za-z0-9._:-]{1,128}")
+
+# The attributes every LogRecord has. Anything else was passed in `extra`.
+STANDARD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_listener: Optional[QueueListener] = None
+_handler: Optional[QueueHandler] = None
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Add the request id, route and method of the current request to each
+    record. It has to run on the request's thread, so it is attached to
+    the QueueHandler, not to the handlers behind the listener.
+    """
+    def filter(self, record: LogRecord) -> bool:
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            record.route = request.url_rule.rule if request.url_rule is not None else None
+            record.method = request.method
+        return True
+
+
+class TracebackRateLimitFilter(logging.Filter):
+    """
+    Let through at most `limit` copies of the same traceback every
+    `window_seconds`. Past that, the record is still logged but without
+    its traceback, so an error storm costs one line per error instead of
+    one formatted traceback. Such records get `traceback_suppressed`
+    set to True. The first traceback of the next window carries the
+    number that were dropped in `tracebacks_dropped`.
+
+    Two tracebacks are the same when they have the same exception type
+    and pass through the same lines of code.
+
+    NOTE: The record is changed in place, so handlers that see it
+    after this filter do not get the traceback either.
+    """
+    MAX_KEYS: int = 1000
+
+    def __init__(self, limit: int = 1, window_seconds: float = 60.0, clock=time.monotonic) -> None:
+        super().__init__()
+        self.limit: int = limit
+        self.window_seconds: float = window_seconds
+        self._clock = clock
+        self._lock: threading.Lock = threading.Lock()
+        # key -> [window start, tracebacks logged, tracebacks dropped]
+        self._seen: Dict[Tuple, list] = {}
+
+    def filter(self, record: LogRecord) -> bool:
+        if self.limit <= 0 or not record.exc_info or record.exc_info[2] is None:
+            return True
+
+        key: Tuple = traceback_key(record.exc_info[0], record.exc_info[2])
+        now: float = self._clock()
+
+        with self._lock:
+            entry: Optional[list] = self._seen.get(key)
+            if entry is None or now - entry[0] >= self.window_seconds:
+                if len(self._seen) >= self.MAX_KEYS:
+                    self._seen.clear()
+                dropped: int = entry[2] if entry is not None else 0
+                self._seen[key] = [now, 1, 0]
+                if dropped:
+                    record.tracebacks_dropped = dropped
+                return True
+
+            if entry[1] < self.limit:
+                entry[1] += 1
+                return True
+
+            entry[2] += 1
+
+        record.exc_info = None
+        record.exc_text = None
+        record.traceback_suppressed = True
+        return True
+
+
+class StructuredQueueHandler(QueueHandler):
+    """
+    A QueueHandler that only merges the message on the calling thread.
+    The stock prepare() formats the whole record, traceback included,
+    before queueing it, which is the slow part we want off the request
+    thread. Here the exception is left on the record for the listener's
+    formatter, and extra fields like request_id survive as attributes.
+    """
+    def prepare(self, record: LogRecord) -> LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Format each record as one line of JSON, with the time, level, logger,
+    message, any fields passed in `extra` (request_id, route, ...), and
+    the traceback as a string when there is one.
+    """
+    def format(self, record: LogRecord) -> str:
+        data: Dict[str, Any] = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+
+        for name, value in vars(record).items():
+            if name not in STANDARD_ATTRIBUTES and value is not None:
+                data[name] = value
+
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+
+        return json.dumps(data, default=str)
+
+
+def traceback_key(exc_type: Optional[type], tb: Optional[TracebackType]) -> Tuple:
+    """
+    Identify a traceback by its exception type and the code it passed through.
+
+    @param exc_type - Optional[type]: The exception's class.
+    @param tb - Optional[TracebackType]: The traceback.
+
+    @return Tuple: A hashable key.
+    """
+    frames = []
+    while tb is not None:
+        frames.append((tb.tb_frame.f_code.co_filename, tb.tb_lineno))
+        tb = tb.tb_next
+
+    return (exc_type, tuple(frames))
+
+def configure_logging(config: Mapping[str, Any]) -> QueueListener:
+    """
+    Send every log record through a queue to a background thread that
+    writes it to stdout, so logging never blocks a request on I/O.
+    Calling it again replaces the previous setup. Processes forked
+    afterwards, i.e. pre-forked server workers, start their own thread.
+
+    LOG_LEVEL - str: The root logger's level. Defaults to INFO.
+    LOG_FORMAT - str: "json" for one JSON object per line (the default) or "text".
+    LOG_TRACEBACK_LIMIT - int: Copies of the same traceback logged per window. 0 logs them all.
+    LOG_TRACEBACK_WINDOW_SECONDS - float: The length of that window.
+
+    @param config - Mapping[str, Any]: The app's config.
+
+    @return QueueListener: The running listener.
+    """
+    global _listener, _handler
+
+    log_format: str = config.get('LOG_FORMAT', 'json')
+    if log_format not in ('json', 'text'):
+        raise InvalidConfigurationError(f"LOG_FORMAT must be json or text, got {log_format!r}.")
+
+    output: logging.Handler = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if log_format == 'json' else logging.Formatter(TEXT_FORMAT))
+
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    handler: QueueHandler = StructuredQueueHandler(records)
+    handler.addFilter(RequestContextFilter())
+    handler.addFilter(TracebackRateLimitFilter(
+        config.get('LOG_TRACEBACK_LIMIT', 1),
+        config.get('LOG_TRACEBACK_WINDOW_SECONDS', 60.0)
+    ))
+
+    root: logging.Logger = logging.getLogger()
+    if _listener is not None:
+        _listener.stop()
+    for old in [h for h in root.handlers if isinstance(h, StructuredQueueHandler)]:
+        root.removeHandler(old)
+
+    root.addHandler(handler)
+    root.setLevel(config.get('LOG_LEVEL', 'INFO'))
+
+    _handler = handler
+    _listener = QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+
+    return _listener
+
+def _restart_listener_after_fork() -> None:
+    """
+    Threads do not survive os.fork(), so in the child the listener's
+    thread is gone and records would be queued forever. Give the child
+    a new queue, so it does not write the parent's queued records a
+    second time, and a new thread.
+    """
+    global _listener
+    if _listener is None or _handler is None:
+        return
+
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    _handler.queue = records
+    _listener = QueueListener(records, *_listener.handlers, respect_handler_level=_listener.respect_handler_level)
+    _listener.start()
+
+os.register_at_fork(after_in_child=_restart_listener_after_fork)
+
+def stop_logging() -> None:
+    """
+    Write out any queued records and stop the listener.
+    """
+    global _listener, _handler
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+        _handler = None
+
+atexit.register(stop_logging)
+
+def assign_request_id() -> None:
+    incoming: Optional[str] = request.headers.get(REQUEST_ID_HEADER)
+    if incoming is not None and REQUEST_ID_PATTERN.fullmatch(incoming):
+        g.request_id = incoming
+    else:
+        g.request_id = uuid.uuid4().hex
+
+def add_request_id_header(response: Response) -> Response:
+    if 'request_id' in g:
+        response.headers[REQUEST_ID_HEADER] = g.request_id
+    return response
+
+def init_request_ids(app: Flask) -> None:
+    """
+    Give every request an id, taken from its X-Request-ID header or made up,
+    so its log records can be found together. The id is sent back in the
+    response's X-Request-ID header.
+    """
+    app.before_request(assign_request_id)
+    app.after_request(add_request_id_header)
@@ -0,0 +1,192 @@
+import threading
+import time
+
+from bisect import bisect_left
+from http import HTTPStatus
+from typing import Callable, Collection, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+from flask import Flask, Response, current_app, g, request
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROMETHEUS_CONTENT_TYPE: str = "text/plain; version=0.0.4; charset=utf-8"
+
+Collector = Callable[[], Iterable[str]]
+
+
+class Histogram:
+    """
+    A fixed-bucket latency histogram. Not thread-safe on its own;
+    MetricsRegistry guards it with its lock.
+    """
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets: Tuple[float, ...] = tuple(buckets)
+        self.counts: List[int] = [0] * (len(self.buckets) + 1)  # the last one is +Inf
+        self.sum: float = 0.0
+        self.count: int = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """
+        Get (upper bound, count of observations <= bound) pairs, ending with +Inf.
+        """
+        pairs: List[Tuple[str, int]] = []
+        running: int = 0
+        for bound, count in zip([*map(format_number, self.buckets), "+Inf"], self.counts):
+            running += count
+            pairs.append((bound, running))
+
+        return pairs
+
+
+class MetricsRegistry:
+    """
+    Thread-safe per-route request counts and latency histograms,
+    rendered in the Prometheus text format.
+
+    Routes are labelled by their URL rule, i.e. "/pets/<int:id>", not the
+    raw path, so the number of series stays fixed.
+    """
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets))
+        self._lock: threading.Lock = threading.Lock()
+        self._requests: Dict[Tuple[str, str, int], int] = {}
+        self._latency: Dict[Tuple[str, str], Histogram] = {}
+        self._collectors: List[Collector] = []
+
+    def observe_request(self, route: str, method: str, status: int, seconds: float) -> None:
+        """
+        Record one finished request.
+
+        @param route - str: The URL rule that matched.
+        @param method - str: The HTTP method.
+        @param status - int: The response status code.
+        @param seconds - float: How long the request took.
+        """
+        with self._lock:
+            key: Tuple[str, str, int] = (route, method, status)
+            self._requests[key] = self._requests.get(key, 0) + 1
+
+            histogram = self._latency.get((route, method))
+            if histogram is None:
+                histogram = self._latency[(route, method)] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def register_collector(self, collector: Collector) -> None:
+        """
+        Add a function whose lines are appended to every render(),
+        for metrics that live elsewhere, i.e. cache and pool stats.
+        """
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format.
+        """
+        lines: List[str] = [
+            "# HELP http_requests_total Requests handled, by route, method and status.",
+            "# TYPE http_requests_total counter",
+        ]
+
+        with self._lock:
+            for (route, method, status), count in sorted(self._requests.items()):
+                lines.append(
+                    f'http_requests_total{{route="{escape(route)}",method="{method}",status="{status}"}} {count}'
+                )
+
+            lines.append("# HELP http_request_duration_seconds Request latency, by route and method.")
+            lines.append("# TYPE http_request_duration_seconds histogram")
+            for (route, method), histogram in sorted(self._latency.items()):
+                labels: str = f'route="{escape(route)}",method="{method}"'
+                for bound, count in histogram.cumulative():
+                    lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f"http_request_duration_seconds_sum{{{labels}}} {format_number(histogram.sum)}")
+                lines.append(f"http_request_duration_seconds_count{{{labels}}} {histogram.count}")
+
+        for collector in self._collectors:
+            lines.extend(collector())
+
+        return "\n".join(lines) + "\n"
+
+
+def escape(value: str) -> str:
+    """
+    Escape a Prometheus label value.
+    """
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_number(value: float) -> str:
+    """
+    Format a number the way Prometheus expects, i.e. 1.0 -> "1", 0.25 -> "0.25".
+    """
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+def gauges(
+        prefix: str,
+        stats: Mapping[str, Union[int, float]],
+        counters: Collection[str] = ()
+) -> List[str]:
+    """
+    Turn a dictionary of numbers into Prometheus gauge lines,
+    i.e. gauges("pet_cache", {"size": 3}) -> ["# TYPE pet_cache_size gauge", "pet_cache_size 3"].
+    The names in `counters` only ever go up, so they are typed as counters
+    instead, which lets Prometheus' rate() handle a worker restarting.
+    """
+    lines: List[str] = []
+    for name, value in stats.items():
+        lines.append(f"# TYPE {prefix}_{name} {'counter' if name in counters else 'gauge'}")
+        lines.append(f"{prefix}_{name} {format_number(value)}")
+
+    return lines
+
+def get_metrics(app: Flask) -> MetricsRegistry:
+    """
+    Get the app's metrics registry, set up by init_metrics.
+    """
+    return app.extensions['metrics']
+
+def start_timer() -> None:
+    g.metrics_start = time.perf_counter()
+
+def record_request(response: Response) -> Response:
+    _observe(response.status_code)
+    return response
+
+def record_failed_request(error: Optional[BaseException]) -> None:
+    # Requests whose exception was never turned into a response, i.e. with
+    # PROPAGATE_EXCEPTIONS on, skip after_request; they are counted as 500s here.
+    _observe(HTTPStatus.INTERNAL_SERVER_ERROR)
+
+def _observe(status: int) -> None:
+    start: Optional[float] = g.pop('metrics_start', None)
+    if start is not None:
+        route: str = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        get_metrics(current_app).observe_request(route, request.method, status, time.perf_counter() - start)
+
+def metrics_endpoint() -> Response:
+    """
+    Serve every metric in the Prometheus text format.
+    """
+    return Response(get_metrics(current_app).render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+def init_metrics(app: Flask) -> MetricsRegistry:
+    """
+    Time every request and serve the results at GET /metrics.
+    Histogram buckets come from app.config['METRICS_BUCKETS'].
+
+    NOTE: For streamed responses the time is measured until the
+    response starts, not until the last chunk is sent.
+    """
+    registry: MetricsRegistry = MetricsRegistry(app.config.get('METRICS_BUCKETS') or DEFAULT_BUCKETS)
+    app.extensions['metrics'] = registry
+
+    app.before_request(start_timer)
+    app.after_request(record_request)
+    app.teardown_request(record_failed_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_endpoint, methods=['GET'])
+
+    return registry
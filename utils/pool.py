@@ -0,0 +1,140 @@
+import threading
+import time
+
+from typing import Any, Dict, Optional, Union
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import Pool, PoolProxiedConnection, QueuePool
+from sqlalchemy.util.queue import Queue
+
+
+class PoolMetrics:
+    """
+    Thread-safe counters for the database connection pool.
+
+    Attributes:
+        checkouts - int: Connections handed out by the pool.
+        checkins - int: Connections returned to the pool.
+        connects - int: New DBAPI connections opened.
+        invalidations - int: Connections thrown away, i.e. after a failover.
+        timeouts - int: Checkouts that gave up waiting for a free connection.
+        wait_seconds_total - float: Total time checkouts spent waiting for a
+        connection to be returned to the pool. Time spent opening new
+        connections is counted by connects, not here.
+        wait_seconds_max - float: The longest single wait.
+    """
+    def __init__(self) -> None:
+        self._lock: threading.Lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Set every counter back to zero.
+        """
+        with self._lock:
+            self.checkouts: int = 0
+            self.checkins: int = 0
+            self.connects: int = 0
+            self.invalidations: int = 0
+            self.timeouts: int = 0
+            self.wait_seconds_total: float = 0.0
+            self.wait_seconds_max: float = 0.0
+
+    def increment(self, counter: str) -> None:
+        """
+        Add one to a counter.
+
+        @param counter - str: The name of the counter, i.e. "checkins".
+        """
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def record_wait(self, seconds: float) -> None:
+        """
+        Record how long a checkout waited for a connection to be returned to the pool.
+
+        @param seconds - float: The time spent waiting.
+        """
+        with self._lock:
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def snapshot(self, pool: Pool) -> Dict[str, Union[int, float]]:
+        """
+        Get the counters together with the pool's live status.
+
+        @param pool - Pool: The pool to read the live status from.
+
+        @return Dict[str, Union[int, float]]: The counters, plus size, checked_in,
+        checked_out and overflow when the pool is a QueuePool.
+        """
+        stats: Dict[str, Any] = {}
+        if isinstance(pool, QueuePool):
+            stats = {
+                "size": pool.size(),
+                "checked_in": pool.checkedin(),
+                "checked_out": pool.checkedout(),
+                "overflow": pool.overflow(),
+            }
+
+        with self._lock:
+            stats.update({
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": self.wait_seconds_total,
+                "wait_seconds_max": self.wait_seconds_max,
+            })
+
+        return stats
+
+
+pool_metrics: PoolMetrics = PoolMetrics()
+
+
+class _MeteredQueue(Queue):
+    """
+    The queue of idle connections inside a QueuePool, timing how long
+    each checkout waits on it. Only this wait is timed, so opening a new
+    connection (i.e. a slow TLS handshake) does not show up as pool contention.
+    """
+    def get(self, block: bool = True, timeout: Optional[float] = None) -> Any:
+        start: float = time.perf_counter()
+        try:
+            return super().get(block, timeout)
+        finally:
+            pool_metrics.record_wait(time.perf_counter() - start)
+
+
+class MeteredQueuePool(QueuePool):
+    """
+    A QueuePool that counts checkouts and timeouts, and records how long
+    every checkout waits for a free connection, in pool_metrics. It is
+    otherwise the same as the pool SQLAlchemy uses by default.
+    """
+    _queue_class = _MeteredQueue
+
+    def connect(self) -> PoolProxiedConnection:
+        try:
+            connection: PoolProxiedConnection = super().connect()
+        except exc.TimeoutError:
+            pool_metrics.increment("timeouts")
+            raise
+
+        pool_metrics.increment("checkouts")
+        return connection
+
+
+@event.listens_for(MeteredQueuePool, "checkin")
+def _on_checkin(*args: Any) -> None:
+    pool_metrics.increment("checkins")
+
+@event.listens_for(MeteredQueuePool, "connect")
+def _on_connect(*args: Any) -> None:
+    pool_metrics.increment("connects")
+
+@event.listens_for(MeteredQueuePool, "invalidate")
+def _on_invalidate(*args: Any) -> None:
+    pool_metrics.increment("invalidations")
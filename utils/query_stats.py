@@ -0,0 +1,155 @@
+import logging
+import threading
+import time
+import weakref
+
+from logging import Logger
+from typing import Any, Dict, Optional, Union
+
+from flask import Flask, Response, g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger: Logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    """
+    Thread-safe totals for the SQL statements sent by one app's engine in this worker.
+    The counts for the current request are kept in flask.g instead,
+    see request_query_stats.
+
+    Attributes:
+        queries - int: Statements executed.
+        slow_queries - int: Statements that took longer than slow_threshold_seconds.
+        seconds_total - float: Total time spent executing statements.
+        slow_threshold_seconds - float: When a statement is logged as slow. 0 turns the log off.
+    """
+    def __init__(self, slow_threshold_seconds: float = 0.0) -> None:
+        self._lock: threading.Lock = threading.Lock()
+        self.slow_threshold_seconds: float = slow_threshold_seconds
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Set every counter back to zero.
+        """
+        with self._lock:
+            self.queries: int = 0
+            self.slow_queries: int = 0
+            self.seconds_total: float = 0.0
+
+    def record(self, statement: str, parameters: Any, executemany: bool, seconds: float) -> None:
+        """
+        Record one finished statement, for the worker and the current request,
+        and log it if it was slow.
+
+        @param statement - str: The SQL that was sent.
+        @param parameters - Any: The parameters it was sent with.
+        @param executemany - bool: Whether it was sent with executemany().
+        @param seconds - float: How long it took.
+        """
+        slow: bool = 0 < self.slow_threshold_seconds <= seconds
+
+        with self._lock:
+            self.queries += 1
+            self.seconds_total += seconds
+            if slow:
+                self.slow_queries += 1
+
+        if has_request_context():
+            g.db_query_count = g.get('db_query_count', 0) + 1
+            g.db_seconds = g.get('db_seconds', 0.0) + seconds
+
+        if slow:
+            # Only the shape of the parameters is logged, never their values.
+            logger.warning(
+                "Slow query (%.1f ms): %s; parameters: %s",
+                seconds * 1000, statement, describe_parameters(parameters, executemany)
+            )
+
+    def snapshot(self) -> Dict[str, Union[int, float]]:
+        """
+        Get the counters, for monitoring.
+        """
+        with self._lock:
+            return {
+                "queries": self.queries,
+                "slow_queries": self.slow_queries,
+                "seconds_total": self.seconds_total,
+            }
+
+
+# The QueryStats each instrumented engine records into.
+_engine_stats: "weakref.WeakKeyDictionary[Engine, QueryStats]" = weakref.WeakKeyDictionary()
+
+
+def describe_parameters(parameters: Any, executemany: bool = False) -> str:
+    """
+    Describe the parameters of a statement without their values,
+    i.e. "{age, species}" or "500 rows of {age, name, species}".
+
+    @param parameters - Any: The parameters the statement was sent with.
+    @param executemany - bool: Whether there is one set of parameters per row.
+
+    @return str: The description.
+    """
+    if executemany and isinstance(parameters, (list, tuple)):
+        first: str = describe_parameters(parameters[0]) if parameters else "nothing"
+        return f"{len(parameters)} rows of {first}"
+
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(sorted(parameters)) + "}"
+
+    if isinstance(parameters, (list, tuple)):
+        return f"{len(parameters)} positional"
+
+    return "none"
+
+def _before_cursor_execute(conn: Any, cursor: Any, statement: str, parameters: Any,
+                           context: Any, executemany: bool) -> None:
+    # A connection runs one statement at a time, so one slot is enough.
+    conn.info['query_start'] = time.perf_counter()
+
+def _after_cursor_execute(conn: Any, cursor: Any, statement: str, parameters: Any,
+                          context: Any, executemany: bool) -> None:
+    start: Optional[float] = conn.info.pop('query_start', None)
+    stats: Optional[QueryStats] = _engine_stats.get(conn.engine)
+    if start is not None and stats is not None:
+        stats.record(statement, parameters, executemany, time.perf_counter() - start)
+
+def instrument_engine(engine: Engine, stats: QueryStats) -> None:
+    """
+    Count and time every statement the engine sends, in `stats`.
+    Calling it again for the same engine switches it to the new `stats`.
+
+    @param engine - Engine: The engine to listen to.
+    @param stats - QueryStats: Where to record the statements.
+    """
+    _engine_stats[engine] = stats
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+def request_query_stats() -> Dict[str, Union[int, float]]:
+    """
+    Get the number of statements sent for the current request and the time they took.
+    """
+    return {"count": g.get('db_query_count', 0), "seconds": g.get('db_seconds', 0.0)}
+
+def add_query_headers(response: Response) -> Response:
+    stats: Dict[str, Union[int, float]] = request_query_stats()
+    response.headers['X-DB-Query-Count'] = str(stats["count"])
+    response.headers['X-DB-Time'] = f"{stats['seconds'] * 1000:.3f}"
+    return response
+
+def init_query_headers(app: Flask) -> None:
+    """
+    Add X-DB-Query-Count and X-DB-Time (in milliseconds) to every response
+    when app.config['DB_DEBUG_HEADERS'] is set.
+
+    NOTE: Statements run while a response is streamed happen after
+    the headers are sent, so they are not counted.
+    """
+    if app.config.get('DB_DEBUG_HEADERS', False):
+        app.after_request(add_query_headers)
@@ -0,0 +1,125 @@
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+
+FieldError = Dict[str, str]
+FieldCheck = Callable[[Any], Optional[Tuple[str, str]]]
+
+MISSING: str = "missing"
+WRONG_TYPE: str = "type"
+INVALID: str = "invalid"
+UNKNOWN: str = "unknown"
+
+
+class Field:
+    """
+    Declarative description of one field of a JSON object.
+
+    Attributes:
+        types - Tuple[type, ...]: The exact types allowed. bool is not accepted for int.
+        required - bool: Whether the field must be present (and not null).
+        max_length - Optional[int]: The longest allowed length, for strings.
+        min_value, max_value - Optional[int]: The allowed range, for numbers.
+    """
+    def __init__(
+            self,
+            *types: type,
+            required: bool = True,
+            max_length: Optional[int] = None,
+            min_value: Optional[int] = None,
+            max_value: Optional[int] = None
+    ) -> None:
+        self.types: Tuple[type, ...] = types
+        self.required: bool = required
+        self.max_length: Optional[int] = max_length
+        self.min_value: Optional[int] = min_value
+        self.max_value: Optional[int] = max_value
+
+    def compile(self) -> FieldCheck:
+        """
+        Turn the field into a single function that checks a present value
+        and returns (code, message) for the first problem, or None.
+        """
+        types: FrozenSet[type] = frozenset(self.types)
+        type_names: str = " or ".join(t.__name__ for t in self.types)
+        max_length: Optional[int] = self.max_length
+        min_value: Optional[int] = self.min_value
+        max_value: Optional[int] = self.max_value
+
+        def check(value: Any) -> Optional[Tuple[str, str]]:
+            if type(value) not in types:
+                return WRONG_TYPE, f"must be of type {type_names}"
+            if max_length is not None and len(value) > max_length:
+                return INVALID, f"must be at most {max_length} characters"
+            if min_value is not None and value < min_value:
+                return INVALID, f"must be at least {min_value}"
+            if max_value is not None and value > max_value:
+                return INVALID, f"must be at most {max_value}"
+            return None
+
+        return check
+
+
+class Schema:
+    """
+    A set of Fields compiled once into a validator for JSON objects.
+
+    Validation reports every problem at once instead of stopping at the
+    first, and rejects fields the schema does not know about. Each problem
+    is a dictionary with the "field", a "code" (missing, type, invalid or
+    unknown) and a readable "message".
+    """
+    def __init__(self, **fields: Field) -> None:
+        self.fields: Dict[str, Field] = fields
+        self._known: FrozenSet[str] = frozenset(fields)
+        self._checks: Tuple[Tuple[str, bool, FieldCheck], ...] = tuple(
+            (name, field.required, field.compile()) for name, field in fields.items()
+        )
+
+    def validate(self, payload: Any) -> List[FieldError]:
+        """
+        Validate one payload.
+
+        @param payload - Any: The decoded JSON to validate.
+
+        @return List[FieldError]: Every problem found. Empty if the payload is valid.
+        """
+        if type(payload) is not dict:
+            return [{"field": "body", "code": WRONG_TYPE, "message": "must be a JSON object"}]
+
+        errors: List[FieldError] = []
+
+        for name, required, check in self._checks:
+            value: Any = payload.get(name)
+            if value is None:
+                if required:
+                    errors.append({"field": name, "code": MISSING, "message": "is required"})
+                continue
+
+            problem: Optional[Tuple[str, str]] = check(value)
+            if problem is not None:
+                errors.append({"field": name, "code": problem[0], "message": problem[1]})
+
+        if not self._known.issuperset(payload):
+            for name in payload.keys() - self._known:
+                errors.append({"field": name, "code": UNKNOWN, "message": "is not allowed"})
+
+        return errors
+
+    def validate_many(self, payloads: Iterable[Any]) -> List[List[FieldError]]:
+        """
+        Validate a list of payloads in one pass.
+
+        @param payloads - Iterable[Any]: The decoded JSON objects to validate.
+
+        @return List[List[FieldError]]: The problems for each payload, in order.
+        """
+        validate: Callable[[Any], List[FieldError]] = self.validate
+        return [validate(payload) for payload in payloads]
+
+
+def describe_errors(errors: List[FieldError]) -> str:
+    """
+    Join a list of field errors into one readable sentence,
+    i.e. "age must be of type int; color is not allowed".
+    """
+    return "; ".join(f"{error['field']} {error['message']}" for error in errors)